@@ -1,29 +1,529 @@
 import random
 import json
 import os
+import sys
 import datetime
+import re
+import time
+import atexit
+import bisect
+import contextlib
+import functools
+import unicodedata
+from collections import OrderedDict, deque
 import colorama
 from colorama import Fore, Style
 from difflib import SequenceMatcher
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
 
-# Inicializar colorama para formateo de texto en consola
-colorama.init()
+# Palabras vacías del español (lista Snowball en la que se basa stopwords.words('spanish') de NLTK).
+# Se incluyen aquí para no cargar NLTK ni depender de sus datos descargados al arrancar.
+STOPWORDS_ES = frozenset("""
+de la que el en y a los del se las por un para con no una su al lo como más pero sus le ya o este sí
+porque esta entre cuando muy sin sobre también me hasta hay donde quien desde todo nos durante todos
+uno les ni contra otros ese eso ante ellos e esto mí antes algunos qué unos yo otro otras otra él tanto
+esa estos mucho quienes nada muchos cual poco ella estar estas algunas algo nosotros mi mis tú te ti tu
+tus ellas nosotras vosotros vosotras os mío mía míos mías tuyo tuya tuyos tuyas suyo suya suyos suyas
+nuestro nuestra nuestros nuestras vuestro vuestra vuestros vuestras esos esas estoy estás está estamos
+estáis están esté estés estemos estéis estén estaré estarás estará estaremos estaréis estarán estaría
+estarías estaríamos estaríais estarían estaba estabas estábamos estabais estaban estuve estuviste estuvo
+estuvimos estuvisteis estuvieron estuviera estuvieras estuviéramos estuvierais estuvieran estuviese
+estuvieses estuviésemos estuvieseis estuviesen estando estado estada estados estadas estad he has ha
+hemos habéis han haya hayas hayamos hayáis hayan habré habrás habrá habremos habréis habrán habría
+habrías habríamos habríais habrían había habías habíamos habíais habían hube hubiste hubo hubimos
+hubisteis hubieron hubiera hubieras hubiéramos hubierais hubieran hubiese hubieses hubiésemos hubieseis
+hubiesen habiendo habido habida habidos habidas soy eres es somos sois son sea seas seamos seáis sean
+seré serás será seremos seréis serán sería serías seríamos seríais serían era eras éramos erais eran
+fui fuiste fue fuimos fuisteis fueron fuera fueras fuéramos fuerais fueran fuese fueses fuésemos
+fueseis fuesen sintiendo sentido sentida sentidos sentidas siente sentid tengo tienes tiene tenemos tenéis tienen tenga tengas tengamos tengáis
+tengan tendré tendrás tendrá tendremos tendréis tendrán tendría tendrías tendríamos tendríais tendrían
+tenía tenías teníamos teníais tenían tuve tuviste tuvo tuvimos tuvisteis tuvieron tuviera tuvieras
+tuviéramos tuvierais tuvieran tuviese tuvieses tuviésemos tuvieseis tuviesen teniendo tenido tenida
+tenidos tenidas tened
+""".split())
 
-# # Descargar recursos de NLTK necesarios (ejecutar la primera vez)
-# try:
-#     nltk.data.find('tokenizers/punkt')
-#     nltk.data.find('corpora/stopwords')
-# except LookupError:
-#     nltk.download('punkt')
-#     nltk.download('stopwords')
+# Palabras y signos de puntuación sueltos, parecido a word_tokenize de NLTK
+PATRON_TOKENS = re.compile(r"\w+|[^\w\s]")
+
+# Palabras en minúsculas, sin signos de puntuación
+PATRON_PALABRAS = re.compile(r"\w+")
+
+def tokenizar_palabras(texto):
+    """Divide el texto en palabras en minúsculas"""
+    return PATRON_PALABRAS.findall(texto.lower())
+
+def quitar_tildes(texto):
+    """Quita tildes y diéresis ("órgano" -> "organo")"""
+    return "".join(caracter for caracter in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(caracter))
+
+_colores_iniciados = False
+
+def iniciar_colores():
+    """Inicializa colorama para formatear texto en consola (solo hace falta en modo interactivo)"""
+    global _colores_iniciados
+    if not _colores_iniciados:
+        colorama.init()
+        _colores_iniciados = True
+
+class Instrumentacion:
+    """Temporizadores por etapa enviados a sumideros y perfilador opcional de las respuestas
+
+    instrumentar(objeto) sustituye en ese objeto los métodos de su ETAPAS_INSTRUMENTADAS por versiones
+    medidas; los objetos sin instrumentar no pagan ningún coste.
+    """
+    def __init__(self, sumideros=None, perfilador=None, etapas_perfiladas=("responder_pregunta", "responder_lote")):
+        self.sumideros = list(sumideros or [])
+        self.perfilador = perfilador
+        self.etapas_perfiladas = set(etapas_perfiladas)
+
+    def instrumentar(self, objeto):
+        """Mide los métodos del objeto indicados en su ETAPAS_INSTRUMENTADAS (método -> etapa)"""
+        for metodo, etapa in getattr(objeto, "ETAPAS_INSTRUMENTADAS", {}).items():
+            setattr(objeto, metodo, self._envolver(getattr(objeto, metodo), etapa))
+        return objeto
+
+    def _envolver(self, funcion, etapa):
+        """Versión de funcion que envía su duración a los sumideros (y cuenta sus errores)"""
+        sumideros = self.sumideros
+        perfilador = self.perfilador if etapa in self.etapas_perfiladas else None
+
+        @functools.wraps(funcion)
+        def medida(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                if perfilador is None:
+                    return funcion(*args, **kwargs)
+                with perfilador:
+                    return funcion(*args, **kwargs)
+            except Exception:
+                self.contar(f"{etapa}_errores")
+                raise
+            finally:
+                duracion = time.perf_counter() - inicio
+                for sumidero in sumideros:
+                    sumidero.tiempo(etapa, duracion)
+        return medida
+
+    def contar(self, nombre, cantidad=1):
+        """Suma cantidad al contador indicado en todos los sumideros"""
+        for sumidero in self.sumideros:
+            sumidero.contar(nombre, cantidad)
+
+class SumideroLog:
+    """Escribe cada etapa en el log "orguebot" (solo las que tardan al menos umbral_ms)"""
+    def __init__(self, umbral_ms=0.0, nivel=None, registro=None):
+        import logging
+        self.umbral = umbral_ms / 1000
+        self.nivel = nivel if nivel is not None else logging.INFO
+        self.registro = registro if registro is not None else logging.getLogger("orguebot")
+
+    def tiempo(self, etapa, segundos):
+        if segundos >= self.umbral:
+            self.registro.log(self.nivel, "etapa=%s ms=%.3f", etapa, segundos * 1000)
+
+    def contar(self, nombre, cantidad):
+        self.registro.log(self.nivel, "contador=%s +%d", nombre, cantidad)
+
+class SumideroHistograma:
+    """Histogramas en memoria de la duración de cada etapa y totales de los contadores"""
+    # Límites superiores de los intervalos en segundos (de 10 µs a 10 s)
+    LIMITES = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+               0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self):
+        import threading
+        # Las escrituras de memoria del servidor se miden desde el hilo escritor
+        self.cerrojo = threading.Lock()
+        self.histogramas = {}
+        self.sumas = {}
+        self.contadores = {}
+
+    def tiempo(self, etapa, segundos):
+        with self.cerrojo:
+            cubetas = self.histogramas.get(etapa)
+            if cubetas is None:
+                cubetas = self.histogramas[etapa] = [0] * (len(self.LIMITES) + 1)
+                self.sumas[etapa] = 0.0
+            cubetas[bisect.bisect_left(self.LIMITES, segundos)] += 1
+            self.sumas[etapa] += segundos
+
+    def contar(self, nombre, cantidad):
+        with self.cerrojo:
+            self.contadores[nombre] = self.contadores.get(nombre, 0) + cantidad
+
+    def percentil(self, etapa, percentil):
+        """Estimación del percentil (segundos): límite superior del intervalo que lo contiene"""
+        cubetas = self.histogramas.get(etapa)
+        if not cubetas:
+            return None
+        objetivo = sum(cubetas) * percentil / 100
+        acumulado = 0
+        for limite, cantidad in zip(self.LIMITES + (float("inf"),), cubetas):
+            acumulado += cantidad
+            if acumulado >= objetivo:
+                return limite
+        return float("inf")
+
+    def resumen(self):
+        """Llamadas, tiempo total y percentiles aproximados de cada etapa, y los contadores"""
+        with self.cerrojo:
+            etapas = {
+                etapa: {
+                    "llamadas": sum(cubetas),
+                    "total_ms": self.sumas[etapa] * 1000,
+                    "p50_ms": self.percentil(etapa, 50) * 1000,
+                    "p99_ms": self.percentil(etapa, 99) * 1000,
+                }
+                for etapa, cubetas in self.histogramas.items()
+            }
+            return {"etapas": etapas, "contadores": dict(self.contadores)}
+
+class SumideroPrometheus(SumideroHistograma):
+    """Histogramas en memoria que se vuelcan en el formato de texto de Prometheus"""
+    def texto(self):
+        """Métricas en formato de exposición de texto de Prometheus"""
+        lineas = [
+            "# HELP orguebot_etapa_segundos Duración de cada etapa de OrgueBot",
+            "# TYPE orguebot_etapa_segundos histogram",
+        ]
+        with self.cerrojo:
+            for etapa, cubetas in sorted(self.histogramas.items()):
+                acumulado = 0
+                for limite, cantidad in zip(self.LIMITES + (float("inf"),), cubetas):
+                    acumulado += cantidad
+                    le = "+Inf" if limite == float("inf") else repr(limite)
+                    lineas.append(f'orguebot_etapa_segundos_bucket{{etapa="{etapa}",le="{le}"}} {acumulado}')
+                lineas.append(f'orguebot_etapa_segundos_sum{{etapa="{etapa}"}} {self.sumas[etapa]!r}')
+                lineas.append(f'orguebot_etapa_segundos_count{{etapa="{etapa}"}} {acumulado}')
+            lineas.append("# HELP orguebot_eventos_total Contadores de eventos de OrgueBot")
+            lineas.append("# TYPE orguebot_eventos_total counter")
+            for nombre, total in sorted(self.contadores.items()):
+                lineas.append(f'orguebot_eventos_total{{evento="{nombre}"}} {total}')
+        return "\n".join(lineas) + "\n"
+
+    def volcar(self, ruta):
+        """Escribe las métricas en un archivo (reemplazándolo de golpe, apto para el textfile collector)"""
+        temporal = ruta + ".tmp"
+        with open(temporal, 'w', encoding='utf-8') as archivo:
+            archivo.write(self.texto())
+        os.replace(temporal, ruta)
+
+class PerfiladorCProfile:
+    """Perfil determinista con cProfile, activo solo mientras se responde"""
+    def __init__(self):
+        import cProfile
+        self.perfil = cProfile.Profile()
+        self._profundidad = 0
+
+    def __enter__(self):
+        self._profundidad += 1
+        if self._profundidad == 1:
+            self.perfil.enable()
+        return self
+
+    def __exit__(self, *excepcion):
+        self._profundidad -= 1
+        if self._profundidad == 0:
+            self.perfil.disable()
+        return False
+
+    def informe(self, n=25):
+        """Las n funciones con más tiempo acumulado"""
+        import io
+        import pstats
+        salida = io.StringIO()
+        pstats.Stats(self.perfil, stream=salida).sort_stats("cumulative").print_stats(n)
+        return salida.getvalue()
+
+class PerfiladorMuestreo:
+    """Perfil por muestreo: un hilo toma la pila del hilo que está respondiendo cada intervalo segundos
+
+    Mientras no se responde nada el hilo espera a que empiece una respuesta, sin despertarse.
+    """
+    def __init__(self, intervalo=0.001):
+        import threading
+        self.intervalo = intervalo
+        self.muestras = {}
+        self.total_muestras = 0
+        self._hilo_objetivo = None
+        self._profundidad = 0
+        self._detener = threading.Event()
+        self._respondiendo = threading.Event()
+        self._hilo = threading.Thread(target=self._muestrear, name="orguebot-muestreo", daemon=True)
+        self._hilo.start()
+
+    def __enter__(self):
+        import threading
+        self._profundidad += 1
+        if self._profundidad == 1:
+            self._hilo_objetivo = threading.get_ident()
+            self._respondiendo.set()
+        return self
+
+    def __exit__(self, *excepcion):
+        self._profundidad -= 1
+        if self._profundidad == 0:
+            self._respondiendo.clear()
+            self._hilo_objetivo = None
+        return False
+
+    def _muestrear(self):
+        """Cuenta cada función presente en la pila muestreada (tiempo inclusivo)"""
+        while True:
+            self._respondiendo.wait()
+            if self._detener.wait(self.intervalo):
+                return
+            objetivo = self._hilo_objetivo
+            if objetivo is None:
+                continue
+            marco = sys._current_frames().get(objetivo)
+            vistas = set()
+            while marco is not None:
+                codigo = marco.f_code
+                funcion = f"{os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno}({codigo.co_name})"
+                if funcion not in vistas:
+                    vistas.add(funcion)
+                    self.muestras[funcion] = self.muestras.get(funcion, 0) + 1
+                marco = marco.f_back
+            if vistas:
+                self.total_muestras += 1
+
+    def detener(self):
+        """Para el hilo de muestreo"""
+        self._detener.set()
+        self._respondiendo.set()
+        self._hilo.join()
+
+    def informe(self, n=25):
+        """Las n funciones que aparecen en más muestras"""
+        lineas = [f"{self.total_muestras} muestras cada {self.intervalo * 1000:g} ms"]
+        for funcion, cantidad in sorted(self.muestras.items(), key=lambda elemento: -elemento[1])[:n]:
+            lineas.append(f"{cantidad / max(self.total_muestras, 1):7.1%}  {funcion}")
+        return "\n".join(lineas)
+
+# Perfiladores disponibles desde la línea de comandos
+PERFILADORES = {
+    "cprofile": PerfiladorCProfile,
+    "muestreo": PerfiladorMuestreo,
+}
+
+class IndiceFrecuencias:
+    """Cubetas de frecuencia enlazadas: las n más frecuentes se leen en O(n), sin recorrer las cubetas enteras
+
+    Cada cubeta guarda ordenadas las posiciones de registro de sus preguntas, así que a igual frecuencia gana
+    la registrada antes, como en el sorted estable de la memoria original y en el ORDER BY frecuencia DESC,
+    rowid de la memoria SQLite. Un incremento mueve la pregunta a la cubeta siguiente con búsquedas binarias.
+    """
+    def __init__(self, frecuencias=None):
+        self.frecuencia = {}  # pregunta -> frecuencia
+        self.orden = {}       # pregunta -> posición en que se registró por primera vez
+        self.preguntas = []   # posición de registro -> pregunta
+        self.cubetas = {}     # frecuencia -> posiciones de registro de las preguntas con esa frecuencia, ordenadas
+        self.anterior = {}    # frecuencia -> frecuencia no vacía inmediatamente menor
+        self.siguiente = {}   # frecuencia -> frecuencia no vacía inmediatamente mayor
+        self.minima = None
+        self.maxima = None
+        if frecuencias:
+            self._construir(frecuencias)
+
+    def _construir(self, frecuencias):
+        """Carga de golpe un dict pregunta -> frecuencia; su orden es el orden de registro"""
+        for pregunta, frecuencia in frecuencias.items():
+            self.frecuencia[pregunta] = frecuencia
+            self.orden[pregunta] = len(self.preguntas)
+            self.cubetas.setdefault(frecuencia, []).append(len(self.preguntas))
+            self.preguntas.append(pregunta)
+        previa = None
+        for frecuencia in sorted(self.cubetas):
+            self.anterior[frecuencia] = previa
+            if previa is not None:
+                self.siguiente[previa] = frecuencia
+            previa = frecuencia
+        if previa is not None:
+            self.siguiente[previa] = None
+            self.minima = min(self.cubetas)
+            self.maxima = previa
+
+    def _enlazar_despues(self, frecuencia, previa):
+        """Crea la cubeta `frecuencia` justo después de `previa` (None para ponerla al principio)"""
+        posterior = self.minima if previa is None else self.siguiente[previa]
+        self.cubetas[frecuencia] = []
+        self.anterior[frecuencia] = previa
+        self.siguiente[frecuencia] = posterior
+        if previa is None:
+            self.minima = frecuencia
+        else:
+            self.siguiente[previa] = frecuencia
+        if posterior is None:
+            self.maxima = frecuencia
+        else:
+            self.anterior[posterior] = frecuencia
+
+    def _desenlazar(self, frecuencia):
+        """Elimina una cubeta vacía de la lista enlazada"""
+        previa = self.anterior.pop(frecuencia)
+        posterior = self.siguiente.pop(frecuencia)
+        del self.cubetas[frecuencia]
+        if previa is None:
+            self.minima = posterior
+        else:
+            self.siguiente[previa] = posterior
+        if posterior is None:
+            self.maxima = previa
+        else:
+            self.anterior[posterior] = previa
+
+    def incrementar(self, pregunta):
+        """Suma una aparición a la pregunta moviéndola a la cubeta siguiente, en su posición de registro"""
+        actual = self.frecuencia.get(pregunta, 0)
+        if actual:
+            posicion = self.orden[pregunta]
+        else:
+            posicion = self.orden[pregunta] = len(self.preguntas)
+            self.preguntas.append(pregunta)
+        nueva = actual + 1
+        if nueva not in self.cubetas:
+            self._enlazar_despues(nueva, actual or None)
+        # Una pregunta nueva es la última registrada: se añade al final de su cubeta
+        bisect.insort(self.cubetas[nueva], posicion)
+        if actual:
+            cubeta = self.cubetas[actual]
+            del cubeta[bisect.bisect_left(cubeta, posicion)]
+            if not cubeta:
+                self._desenlazar(actual)
+        self.frecuencia[pregunta] = nueva
+
+    def mas_frecuentes(self, n):
+        """Devuelve las n preguntas con mayor frecuencia (a igualdad, la registrada antes)"""
+        resultado = []
+        frecuencia = self.maxima
+        while frecuencia is not None and len(resultado) < n:
+            resultado.extend(self.preguntas[posicion] for posicion in self.cubetas[frecuencia][:n - len(resultado)])
+            frecuencia = self.anterior[frecuencia]
+        return resultado
+
+def normalizar_pregunta(pregunta):
+    """Forma canónica de una pregunta para unir duplicados: minúsculas, espacios simples y sin signos en los extremos"""
+    return " ".join(pregunta.lower().split()).strip("¿?¡!.,;: ")
+
+class ArchivoConversaciones:
+    """Conversaciones retiradas de la memoria, en segmentos comprimidos por día (conversaciones-AAAA-MM-DD.jsonl.gz)"""
+    PREFIJO = "conversaciones-"
+    EXTENSION = ".jsonl.gz"
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+
+    def archivar(self, conversaciones):
+        """Añade las conversaciones al segmento de su día (cada escritura es un miembro gzip más del archivo)"""
+        import gzip
+        por_dia = {}
+        for conversacion in conversaciones:
+            por_dia.setdefault(conversacion["fecha"][:10], []).append(conversacion)
+        os.makedirs(self.directorio, exist_ok=True)
+        for dia, del_dia in por_dia.items():
+            ruta = os.path.join(self.directorio, f"{self.PREFIJO}{dia}{self.EXTENSION}")
+            with open(ruta, 'ab') as archivo:
+                with gzip.GzipFile(fileobj=archivo, mode='wb') as comprimido:
+                    comprimido.write("".join(json.dumps(c, ensure_ascii=False) + "\n" for c in del_dia).encode('utf-8'))
+                archivo.flush()
+                os.fsync(archivo.fileno())
+
+    def segmentos(self, desde=None, hasta=None):
+        """Rutas de los segmentos entre dos días (AAAA-MM-DD, ambos incluidos), del más antiguo al más reciente"""
+        try:
+            nombres = os.listdir(self.directorio)
+        except FileNotFoundError:
+            return []
+        rutas = []
+        for nombre in sorted(nombres):
+            if not (nombre.startswith(self.PREFIJO) and nombre.endswith(self.EXTENSION)):
+                continue
+            dia = nombre[len(self.PREFIJO):-len(self.EXTENSION)]
+            if (desde is None or dia >= desde[:10]) and (hasta is None or dia <= hasta[:10]):
+                rutas.append(os.path.join(self.directorio, nombre))
+        return rutas
+
+    def leer(self, desde=None, hasta=None):
+        """Recorre sin cargarlas todas en memoria las conversaciones archivadas entre dos fechas"""
+        import gzip
+        for ruta in self.segmentos(desde, hasta):
+            with gzip.open(ruta, 'rt', encoding='utf-8') as segmento:
+                for linea in segmento:
+                    conversacion = json.loads(linea)
+                    fecha = conversacion["fecha"]
+                    if (desde is None or fecha >= desde) and (hasta is None or fecha[:len(hasta)] <= hasta):
+                        yield conversacion
+
+class PoliticaRetencion:
+    """Límites de la memoria: cuántas conversaciones y de qué antigüedad se conservan, tamaño del archivo y preguntas frecuentes
+
+    Las conversaciones que sobran se mueven (las más antiguas primero) a un ArchivoConversaciones. Cada
+    `compactar_cada` preguntas registradas se unen las preguntas_frecuentes duplicadas y se descarta la cola larga.
+    """
+    def __init__(self, max_conversaciones=None, max_dias=None, max_bytes=None, directorio_archivo=None,
+                 compactar_cada=1000, min_frecuencia=1, max_preguntas=None):
+        self.max_conversaciones = max_conversaciones
+        self.max_dias = max_dias
+        self.max_bytes = max_bytes
+        # Por defecto, junto al archivo de memoria (<memoria>.archivo)
+        self.directorio_archivo = directorio_archivo
+        self.compactar_cada = compactar_cada
+        self.min_frecuencia = min_frecuencia
+        self.max_preguntas = max_preguntas
+
+    def fecha_limite(self, ahora=None):
+        """Fecha (con el formato de las conversaciones) a partir de la cual se conservan, o None sin límite de edad"""
+        if self.max_dias is None:
+            return None
+        ahora = ahora or datetime.datetime.now()
+        return (ahora - datetime.timedelta(days=self.max_dias)).strftime("%Y-%m-%d %H:%M:%S")
+
+    def conversaciones_a_archivar(self, conversaciones, ahora=None):
+        """Cuántas de las conversaciones (de la más antigua a la más reciente) sobran por edad o por número"""
+        sobrantes = 0
+        if self.max_conversaciones is not None:
+            sobrantes = max(0, len(conversaciones) - self.max_conversaciones)
+        limite = self.fecha_limite(ahora)
+        if limite is not None:
+            while sobrantes < len(conversaciones) and conversaciones[sobrantes]["fecha"] < limite:
+                sobrantes += 1
+        return sobrantes
+
+    def compactar_preguntas(self, preguntas_frecuentes):
+        """Une las preguntas que solo se diferencian en mayúsculas, espacios o signos y recorta la cola larga"""
+        grupos = {}
+        for pregunta, datos in preguntas_frecuentes.items():
+            grupos.setdefault(normalizar_pregunta(pregunta), []).append((pregunta, datos))
+        compactadas = []
+        for variantes in grupos.values():
+            # Se conserva la forma más frecuente (la primera a igualdad) y su categoría
+            pregunta, datos = max(variantes, key=lambda variante: variante[1]["frecuencia"])
+            frecuencia = sum(datos_variante["frecuencia"] for _, datos_variante in variantes)
+            if frecuencia >= self.min_frecuencia:
+                compactadas.append((pregunta, {"categoria": datos["categoria"], "frecuencia": frecuencia}))
+        if self.max_preguntas is not None and len(compactadas) > self.max_preguntas:
+            conservadas = sorted(range(len(compactadas)), key=lambda i: -compactadas[i][1]["frecuencia"])[:self.max_preguntas]
+            compactadas = [compactadas[i] for i in sorted(conservadas)]
+        return dict(compactadas)
 
 class OrgueBotMemoria:
     """Clase para gestionar la memoria del chatbot"""
-    def __init__(self, ruta_archivo="memoria_orguebot.json"):
+    # Métodos que mide Instrumentacion.instrumentar y la etapa a la que corresponden
+    ETAPAS_INSTRUMENTADAS = {
+        "registrar_pregunta": "memoria_registrar",
+        "guardar_memoria": "memoria_guardar",
+    }
+
+    def __init__(self, ruta_archivo="memoria_orguebot.json", retencion=None):
         self.ruta_archivo = ruta_archivo
+        # Política de retención opcional (sin ella la memoria crece sin límite)
+        self.retencion = retencion
+        self.archivo = ArchivoConversaciones(retencion.directorio_archivo or ruta_archivo + ".archivo") if retencion else None
+        self._preguntas_desde_compactacion = 0
         self.memoria = self._cargar_memoria()
+        self._reconstruir_indices()
+        self._lote_activo = 0
+        self._cambios_lote = False
         
     def _cargar_memoria(self):
         """Carga la memoria desde el archivo JSON o crea una nueva si no existe"""
@@ -40,365 +540,2000 @@ class OrgueBotMemoria:
     def guardar_memoria(self):
         """Guarda la memoria en el archivo JSON"""
         try:
+            contenido = self._serializar()
             with open(self.ruta_archivo, 'w', encoding='utf-8') as archivo:
-                json.dump(self.memoria, archivo, ensure_ascii=False, indent=2)
+                archivo.write(contenido)
         except Exception as e:
             print(f"Error al guardar memoria: {e}")
     
+    def _serializar(self):
+        """Aplica la política de retención y devuelve la memoria en JSON, sin pasar del tamaño máximo si lo hay"""
+        self.aplicar_retencion()
+        contenido = json.dumps(self.memoria, ensure_ascii=False, indent=2)
+        if self.retencion is not None and self.retencion.max_bytes is not None:
+            tamano = len(contenido.encode('utf-8'))
+            if tamano > self.retencion.max_bytes and self._archivar_por_tamano(tamano):
+                contenido = json.dumps(self.memoria, ensure_ascii=False, indent=2)
+        return contenido
+    
+    def aplicar_retencion(self, compactar=False):
+        """Archiva las conversaciones que sobran según la política y compacta las preguntas frecuentes cuando toca"""
+        if self.retencion is None:
+            return
+        self._archivar(self.retencion.conversaciones_a_archivar(self.memoria["conversaciones"]))
+        if compactar or self._preguntas_desde_compactacion >= self.retencion.compactar_cada:
+            self.compactar_preguntas()
+    
+    def compactar_preguntas(self):
+        """Une las preguntas frecuentes duplicadas y descarta la cola larga según la política"""
+        politica = self.retencion or PoliticaRetencion()
+        self.memoria["preguntas_frecuentes"] = politica.compactar_preguntas(self.memoria["preguntas_frecuentes"])
+        self._reconstruir_indices()
+        self._preguntas_desde_compactacion = 0
+    
+    def _archivar(self, n):
+        """Mueve las n conversaciones más antiguas al archivo; si no se pueden escribir se conservan"""
+        if not n:
+            return False
+        try:
+            self.archivo.archivar(self.memoria["conversaciones"][:n])
+        except Exception as e:
+            print(f"Error al archivar conversaciones: {e}")
+            return False
+        del self.memoria["conversaciones"][:n]
+        return True
+    
+    def _archivar_por_tamano(self, tamano):
+        """Archiva las conversaciones más antiguas hasta dejar el archivo en el 90 % del tamaño máximo"""
+        # El margen evita tener que archivar otra vez en el guardado siguiente
+        sobrante = tamano - int(self.retencion.max_bytes * 0.9)
+        conversaciones = self.memoria["conversaciones"]
+        n = 0
+        while n < len(conversaciones) and sobrante > 0:
+            sobrante -= len(json.dumps(conversaciones[n], ensure_ascii=False, indent=2).encode('utf-8'))
+            n += 1
+        return self._archivar(n)
+    
     def registrar_conversacion(self, conversacion):
         """Registra una conversación completa"""
-        self.memoria["conversaciones"].append({
+        self._registrar_evento({
+            "tipo": "conversacion",
             "fecha": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             "intercambios": conversacion
         })
-        self.guardar_memoria()
     
     def registrar_pregunta(self, pregunta, categoria):
         """Registra una pregunta frecuente y su categoría"""
-        if pregunta.lower() in self.memoria["preguntas_frecuentes"]:
-            self.memoria["preguntas_frecuentes"][pregunta.lower()]["frecuencia"] += 1
-        else:
-            self.memoria["preguntas_frecuentes"][pregunta.lower()] = {
-                "categoria": categoria,
-                "frecuencia": 1
-            }
-        self.guardar_memoria()
+        self._registrar_evento({"tipo": "pregunta", "pregunta": pregunta.lower(), "categoria": categoria})
     
-    def obtener_sugerencias(self, n=3):
-        """Devuelve las n preguntas más frecuentes"""
-        ordenadas = sorted(
-            self.memoria["preguntas_frecuentes"].items(),
-            key=lambda x: x[1]["frecuencia"],
-            reverse=True
-        )
-        return [pregunta for pregunta, _ in ordenadas[:n]]
+    def obtener_sugerencias(self, n=3, categoria=None):
+        """Devuelve las n preguntas más frecuentes, opcionalmente solo de una categoría"""
+        if categoria is not None:
+            indice = self.indices_categoria.get(categoria)
+            return indice.mas_frecuentes(n) if indice else []
+        return self.indice_frecuencias.mas_frecuentes(n)
+    
+    def _reconstruir_indices(self):
+        """Construye los índices de frecuencia a partir de preguntas_frecuentes"""
+        self.indice_frecuencias = IndiceFrecuencias({
+            pregunta: datos["frecuencia"] for pregunta, datos in self.memoria["preguntas_frecuentes"].items()
+        })
+        por_categoria = {}
+        for pregunta, datos in self.memoria["preguntas_frecuentes"].items():
+            por_categoria.setdefault(datos["categoria"], {})[pregunta] = datos["frecuencia"]
+        self.indices_categoria = {categoria: IndiceFrecuencias(frecuencias) for categoria, frecuencias in por_categoria.items()}
+    
+    def huevos_encontrados(self):
+        """Devuelve los nombres de los huevos de pascua encontrados"""
+        return list(self.memoria["huevos_pascua_encontrados"])
     
     def registrar_easter_egg(self, nombre):
         """Registra un huevo de pascua encontrado"""
         if nombre not in self.memoria["huevos_pascua_encontrados"]:
-            self.memoria["huevos_pascua_encontrados"].append(nombre)
-            self.guardar_memoria()
+            self._registrar_evento({"tipo": "easter_egg", "nombre": nombre})
             return True
         return False
+    
+    @contextlib.contextmanager
+    def en_lote(self):
+        """Agrupa varios registros y guarda la memoria una sola vez al terminar"""
+        self._lote_activo += 1
+        try:
+            yield self
+        finally:
+            self._lote_activo -= 1
+            if not self._lote_activo and self._cambios_lote:
+                self._cambios_lote = False
+                self._guardar_lote()
+    
+    def _guardar_lote(self):
+        """Persiste los cambios acumulados durante un lote"""
+        self.guardar_memoria()
+    
+    def _registrar_evento(self, evento):
+        """Aplica un cambio a la memoria y lo guarda"""
+        self._aplicar_evento(evento)
+        if self._lote_activo:
+            self._cambios_lote = True
+        else:
+            self.guardar_memoria()
+    
+    def _aplicar_evento(self, evento):
+        """Aplica un cambio (conversación, pregunta o easter egg) a la memoria en RAM"""
+        if evento["tipo"] == "conversacion":
+            self.memoria["conversaciones"].append({
+                "fecha": evento["fecha"],
+                "intercambios": evento["intercambios"]
+            })
+        elif evento["tipo"] == "pregunta":
+            pregunta = evento["pregunta"]
+            if pregunta in self.memoria["preguntas_frecuentes"]:
+                self.memoria["preguntas_frecuentes"][pregunta]["frecuencia"] += 1
+            else:
+                self.memoria["preguntas_frecuentes"][pregunta] = {
+                    "categoria": evento["categoria"],
+                    "frecuencia": 1
+                }
+            self.indice_frecuencias.incrementar(pregunta)
+            self._preguntas_desde_compactacion += 1
+            categoria = self.memoria["preguntas_frecuentes"][pregunta]["categoria"]
+            self.indices_categoria.setdefault(categoria, IndiceFrecuencias()).incrementar(pregunta)
+        elif evento["tipo"] == "easter_egg":
+            if evento["nombre"] not in self.memoria["huevos_pascua_encontrados"]:
+                self.memoria["huevos_pascua_encontrados"].append(evento["nombre"])
 
-class OrgueBot:
-    """Clase principal del chatbot especializado en órganos musicales"""
+# Diarios con eventos sin escribir: un único manejador de atexit los vacía al salir
+_diarios_pendientes = set()
+
+def _vaciar_diarios_pendientes():
+    """Vacía los diarios que aún tienen eventos pendientes"""
+    for memoria in list(_diarios_pendientes):
+        memoria.cerrar()
+
+atexit.register(_vaciar_diarios_pendientes)
+
+class OrgueBotMemoriaDiario(OrgueBotMemoria):
+    """Memoria que añade cada cambio a un diario JSON Lines y lo compacta periódicamente en el archivo JSON"""
+    ETAPAS_INSTRUMENTADAS = dict(OrgueBotMemoria.ETAPAS_INSTRUMENTADAS, vaciar="memoria_diario")
+
+    def __init__(self, ruta_archivo="memoria_orguebot.json", max_pendientes=50, intervalo_vaciado=5.0, eventos_por_compactacion=1000,
+                 retencion=None):
+        self.ruta_diario = ruta_archivo + ".diario"
+        self.max_pendientes = max_pendientes
+        self.intervalo_vaciado = intervalo_vaciado
+        self.eventos_por_compactacion = eventos_por_compactacion
+        self.pendientes = []
+        self.eventos_en_diario = 0
+        self.ultimo_vaciado = time.monotonic()
+        # El temporizador vacía los pendientes aunque no lleguen más eventos; el cerrojo lo coordina con quien registra
+        import threading
+        self._cerrojo = threading.RLock()
+        self._temporizador = None
+        super().__init__(ruta_archivo, retencion)
+        self.memoria.setdefault("secuencia_diario", 0)
+        self._reproducir_diario()
+    
+    def _reproducir_diario(self):
+        """Aplica los eventos del diario posteriores a la última instantánea (recuperación tras un fallo)"""
+        if not os.path.exists(self.ruta_diario):
+            return
+        try:
+            longitud_valida = 0
+            with open(self.ruta_diario, 'rb') as diario:
+                for linea in diario:
+                    if not linea.endswith(b"\n"):
+                        # Última línea a medio escribir por una caída: se descarta
+                        break
+                    longitud_valida += len(linea)
+                    try:
+                        evento = json.loads(linea.decode('utf-8'))
+                        secuencia = evento["secuencia"]
+                    except (ValueError, TypeError, KeyError) as e:
+                        # Una línea dañada no impide recuperar los eventos que la siguen
+                        print(f"Aviso: se ignora una línea dañada del diario de memoria: {e}")
+                        continue
+                    self.eventos_en_diario += 1
+                    if secuencia > self.memoria["secuencia_diario"]:
+                        self._aplicar_evento(evento)
+                        self.memoria["secuencia_diario"] = secuencia
+            if longitud_valida != os.path.getsize(self.ruta_diario):
+                os.truncate(self.ruta_diario, longitud_valida)
+        except Exception as e:
+            print(f"Error al reproducir el diario de memoria: {e}")
+    
+    def _registrar_evento(self, evento):
+        """Aplica el cambio en RAM y lo deja pendiente de escribir en el diario"""
+        with self._cerrojo:
+            self.memoria["secuencia_diario"] += 1
+            evento["secuencia"] = self.memoria["secuencia_diario"]
+            self._aplicar_evento(evento)
+            self.pendientes.append(evento)
+            _diarios_pendientes.add(self)
+            if self._lote_activo:
+                self._cambios_lote = True
+            elif len(self.pendientes) >= self.max_pendientes or time.monotonic() - self.ultimo_vaciado >= self.intervalo_vaciado:
+                self.vaciar()
+            elif self._temporizador is None:
+                self._programar_vaciado()
+    
+    def _programar_vaciado(self):
+        """Vacía los pendientes cuando pase intervalo_vaciado desde el último vaciado, lleguen o no más eventos"""
+        import threading
+        espera = max(0.0, self.ultimo_vaciado + self.intervalo_vaciado - time.monotonic())
+        self._temporizador = threading.Timer(espera, self._vaciar_por_tiempo)
+        self._temporizador.daemon = True
+        self._temporizador.start()
+    
+    def _vaciar_por_tiempo(self):
+        """Llamado por el temporizador; dentro de un lote se espera a que termine, que ya vacía"""
+        with self._cerrojo:
+            self._temporizador = None
+            if self.pendientes and not self._lote_activo:
+                self.vaciar()
+    
+    def _guardar_lote(self):
+        """Al terminar un lote se escriben sus eventos en el diario de una vez"""
+        self.vaciar()
+    
+    def vaciar(self):
+        """Escribe los eventos pendientes al final del diario y compacta si el diario es demasiado largo"""
+        with self._cerrojo:
+            self.ultimo_vaciado = time.monotonic()
+            if self._temporizador is not None:
+                self._temporizador.cancel()
+                self._temporizador = None
+            if self.pendientes:
+                try:
+                    with open(self.ruta_diario, 'a', encoding='utf-8') as diario:
+                        diario.write("".join(json.dumps(evento, ensure_ascii=False) + "\n" for evento in self.pendientes))
+                        diario.flush()
+                        os.fsync(diario.fileno())
+                    self.eventos_en_diario += len(self.pendientes)
+                    self._pendientes_escritos()
+                except Exception as e:
+                    print(f"Error al escribir el diario de memoria: {e}")
+                    return
+            if self.eventos_en_diario >= self.eventos_por_compactacion:
+                self.guardar_memoria()
+    
+    def guardar_memoria(self):
+        """Compacta la memoria: aplica la retención, escribe una instantánea completa y vacía el diario"""
+        with self._cerrojo:
+            try:
+                contenido = self._serializar()
+                ruta_temporal = self.ruta_archivo + ".tmp"
+                with open(ruta_temporal, 'w', encoding='utf-8') as archivo:
+                    archivo.write(contenido)
+                    archivo.flush()
+                    os.fsync(archivo.fileno())
+                os.replace(ruta_temporal, self.ruta_archivo)
+                # Los pendientes ya están en la instantánea; si algo falla antes, se conservan para el próximo intento
+                self._pendientes_escritos()
+                # Si se cae aquí, los eventos del diario ya están en la instantánea y se ignoran por su secuencia
+                open(self.ruta_diario, 'w', encoding='utf-8').close()
+                self.eventos_en_diario = 0
+            except Exception as e:
+                print(f"Error al guardar memoria: {e}")
+    
+    def _pendientes_escritos(self):
+        """Olvida los eventos pendientes una vez que están en disco"""
+        self.pendientes = []
+        _diarios_pendientes.discard(self)
+    
+    def cerrar(self):
+        """Vacía los eventos pendientes (se llama automáticamente al salir si quedan)"""
+        if self.pendientes:
+            self.vaciar()
+
+class OrgueBotMemoriaSQLite:
+    """Memoria del chatbot guardada en SQLite con tablas indexadas (misma interfaz que OrgueBotMemoria)"""
+    ETAPAS_INSTRUMENTADAS = OrgueBotMemoria.ETAPAS_INSTRUMENTADAS
+    ESQUEMA = """
+        CREATE TABLE IF NOT EXISTS conversaciones (
+            id INTEGER PRIMARY KEY,
+            fecha TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_conversaciones_fecha ON conversaciones(fecha);
+        CREATE TABLE IF NOT EXISTS intercambios (
+            conversacion_id INTEGER NOT NULL REFERENCES conversaciones(id),
+            orden INTEGER NOT NULL,
+            rol TEXT NOT NULL,
+            mensaje TEXT NOT NULL,
+            PRIMARY KEY (conversacion_id, orden)
+        );
+        CREATE TABLE IF NOT EXISTS preguntas_frecuentes (
+            pregunta TEXT PRIMARY KEY,
+            categoria TEXT,
+            frecuencia INTEGER NOT NULL DEFAULT 1
+        );
+        CREATE INDEX IF NOT EXISTS idx_preguntas_frecuencia ON preguntas_frecuentes(frecuencia DESC);
+        CREATE INDEX IF NOT EXISTS idx_preguntas_categoria ON preguntas_frecuentes(categoria, frecuencia DESC);
+        CREATE TABLE IF NOT EXISTS huevos_pascua_encontrados (
+            nombre TEXT PRIMARY KEY
+        );
+        CREATE TABLE IF NOT EXISTS feedback (
+            clave TEXT PRIMARY KEY,
+            valor TEXT NOT NULL
+        );
+    """
+    # Sentencias fijas: sqlite3 reutiliza su versión preparada en cada llamada
+    SQL_CONVERSACION = "INSERT INTO conversaciones (fecha) VALUES (?)"
+    SQL_INTERCAMBIO = "INSERT INTO intercambios (conversacion_id, orden, rol, mensaje) VALUES (?, ?, ?, ?)"
+    SQL_PREGUNTA = """
+        INSERT INTO preguntas_frecuentes (pregunta, categoria, frecuencia) VALUES (?, ?, ?)
+        ON CONFLICT(pregunta) DO UPDATE SET frecuencia = frecuencia + excluded.frecuencia
+    """
+    # Al importar, la frecuencia del JSON sustituye a la guardada: importar dos veces no la duplica
+    SQL_IMPORTAR_PREGUNTA = """
+        INSERT INTO preguntas_frecuentes (pregunta, categoria, frecuencia) VALUES (?, ?, ?)
+        ON CONFLICT(pregunta) DO UPDATE SET frecuencia = excluded.frecuencia
+    """
+    # A igual frecuencia se conserva el orden de inserción, como el sorted estable de OrgueBotMemoria
+    SQL_SUGERENCIAS = "SELECT pregunta FROM preguntas_frecuentes ORDER BY frecuencia DESC, rowid LIMIT ?"
+    SQL_SUGERENCIAS_CATEGORIA = "SELECT pregunta FROM preguntas_frecuentes WHERE categoria = ? ORDER BY frecuencia DESC, rowid LIMIT ?"
+    SQL_EASTER_EGG = "INSERT OR IGNORE INTO huevos_pascua_encontrados (nombre) VALUES (?)"
+    SQL_FEEDBACK = "INSERT OR REPLACE INTO feedback (clave, valor) VALUES (?, ?)"
+    # Conversaciones que se archivan y borran en cada transacción
+    TAM_BLOQUE_ARCHIVO = 1000
+
+    def __init__(self, ruta_archivo="memoria_orguebot.db", retencion=None):
+        self.ruta_archivo = ruta_archivo
+        self.retencion = retencion
+        self.archivo = ArchivoConversaciones(retencion.directorio_archivo or ruta_archivo + ".archivo") if retencion else None
+        self._preguntas_desde_compactacion = 0
+        # Puede usarse desde el hilo de la tarea escritora del servidor (un único hilo a la vez)
+        import sqlite3
+        self.conexion = sqlite3.connect(ruta_archivo, cached_statements=32, check_same_thread=False)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute("PRAGMA synchronous=NORMAL")
+        self.conexion.executescript(self.ESQUEMA)
+        self._lote_activo = 0
+
+    def guardar_memoria(self):
+        """Confirma los cambios pendientes (cada registro ya se confirma por sí solo) y aplica la retención"""
+        self.conexion.commit()
+        self.aplicar_retencion()
+
+    @contextlib.contextmanager
+    def en_lote(self):
+        """Agrupa varios registros en una sola transacción"""
+        self._lote_activo += 1
+        try:
+            yield self
+        except BaseException:
+            if self._lote_activo == 1:
+                self.conexion.rollback()
+            raise
+        else:
+            if self._lote_activo == 1:
+                self.conexion.commit()
+        finally:
+            self._lote_activo -= 1
+        # Fuera de la transacción: lo archivado no puede deshacerse con un rollback
+        if not self._lote_activo:
+            self.aplicar_retencion()
+
+    def _transaccion(self):
+        """Transacción de un registro, o nada si ya estamos dentro de un lote"""
+        return contextlib.nullcontext() if self._lote_activo else self.conexion
+
+    def registrar_conversacion(self, conversacion):
+        """Registra una conversación completa"""
+        fecha = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._transaccion():
+            self._insertar_conversacion(fecha, conversacion)
+        if not self._lote_activo:
+            self.aplicar_retencion()
+
+    def _insertar_conversacion(self, fecha, intercambios):
+        """Inserta una conversación y sus intercambios dentro de la transacción en curso"""
+        conversacion_id = self.conexion.execute(self.SQL_CONVERSACION, (fecha,)).lastrowid
+        self.conexion.executemany(self.SQL_INTERCAMBIO, [
+            (conversacion_id, orden, intercambio["rol"], intercambio["mensaje"])
+            for orden, intercambio in enumerate(intercambios)
+        ])
+
+    def registrar_pregunta(self, pregunta, categoria):
+        """Registra una pregunta frecuente y su categoría"""
+        with self._transaccion():
+            self.conexion.execute(self.SQL_PREGUNTA, (pregunta.lower(), categoria, 1))
+        self._preguntas_desde_compactacion += 1
+        if (self.retencion is not None and not self._lote_activo
+                and self._preguntas_desde_compactacion >= self.retencion.compactar_cada):
+            self.compactar_preguntas()
+
+    def obtener_sugerencias(self, n=3, categoria=None):
+        """Devuelve las n preguntas más frecuentes usando el índice por frecuencia"""
+        if categoria is not None:
+            return [fila[0] for fila in self.conexion.execute(self.SQL_SUGERENCIAS_CATEGORIA, (categoria, n))]
+        return [fila[0] for fila in self.conexion.execute(self.SQL_SUGERENCIAS, (n,))]
+
+    def huevos_encontrados(self):
+        """Devuelve los nombres de los huevos de pascua encontrados"""
+        return [fila[0] for fila in self.conexion.execute("SELECT nombre FROM huevos_pascua_encontrados ORDER BY rowid")]
+
+    def registrar_easter_egg(self, nombre):
+        """Registra un huevo de pascua encontrado"""
+        with self._transaccion():
+            return self.conexion.execute(self.SQL_EASTER_EGG, (nombre,)).rowcount == 1
+
+    def aplicar_retencion(self, compactar=False):
+        """Archiva las conversaciones que sobran según la política y compacta las preguntas frecuentes cuando toca"""
+        if self.retencion is None:
+            return
+        corte = 0
+        if self.retencion.max_conversaciones is not None:
+            fila = self.conexion.execute("SELECT id FROM conversaciones ORDER BY id DESC LIMIT 1 OFFSET ?",
+                                         (self.retencion.max_conversaciones,)).fetchone()
+            if fila:
+                corte = fila[0]
+        limite = self.retencion.fecha_limite()
+        if limite is not None:
+            fila = self.conexion.execute("SELECT MAX(id) FROM conversaciones WHERE fecha < ?", (limite,)).fetchone()
+            corte = max(corte, fila[0] or 0)
+        if self.retencion.max_bytes is not None:
+            corte = max(corte, self._corte_por_tamano(corte))
+        if corte:
+            self._archivar_hasta(corte)
+        if compactar or self._preguntas_desde_compactacion >= self.retencion.compactar_cada:
+            self.compactar_preguntas()
+
+    def _corte_por_tamano(self, corte):
+        """Última conversación a archivar para dejar la base en el 90 % del tamaño máximo (0 si cabe)"""
+        tamano_pagina = self.conexion.execute("PRAGMA page_size").fetchone()[0]
+        paginas = self.conexion.execute("PRAGMA page_count").fetchone()[0] - self.conexion.execute("PRAGMA freelist_count").fetchone()[0]
+        ocupado = paginas * tamano_pagina
+        if ocupado <= self.retencion.max_bytes:
+            return 0
+        # Se supone que el espacio se reparte por igual entre las conversaciones; las páginas liberadas se reutilizan
+        total = self.conexion.execute("SELECT COUNT(*) FROM conversaciones WHERE id > ?", (corte,)).fetchone()[0]
+        sobrantes = -(-total * (ocupado - int(self.retencion.max_bytes * 0.9)) // ocupado)
+        if not sobrantes:
+            return 0
+        fila = self.conexion.execute("SELECT id FROM conversaciones WHERE id > ? ORDER BY id LIMIT 1 OFFSET ?",
+                                     (corte, min(sobrantes, total) - 1)).fetchone()
+        return fila[0] if fila else 0
+
+    def _archivar_hasta(self, corte):
+        """Mueve al archivo y borra las conversaciones con id hasta `corte`, por bloques"""
+        while True:
+            filas = self.conexion.execute("SELECT id, fecha FROM conversaciones WHERE id <= ? ORDER BY id LIMIT ?",
+                                          (corte, self.TAM_BLOQUE_ARCHIVO)).fetchall()
+            if not filas:
+                return
+            ultimo = filas[-1][0]
+            intercambios = {}
+            for conversacion_id, rol, mensaje in self.conexion.execute(
+                    "SELECT conversacion_id, rol, mensaje FROM intercambios WHERE conversacion_id <= ? "
+                    "ORDER BY conversacion_id, orden", (ultimo,)):
+                intercambios.setdefault(conversacion_id, []).append({"rol": rol, "mensaje": mensaje})
+            try:
+                self.archivo.archivar([
+                    {"fecha": fecha, "intercambios": intercambios.get(conversacion_id, [])}
+                    for conversacion_id, fecha in filas
+                ])
+            except Exception as e:
+                print(f"Error al archivar conversaciones: {e}")
+                return
+            with self.conexion:
+                self.conexion.execute("DELETE FROM intercambios WHERE conversacion_id <= ?", (ultimo,))
+                self.conexion.execute("DELETE FROM conversaciones WHERE id <= ?", (ultimo,))
+
+    def compactar_preguntas(self):
+        """Une las preguntas frecuentes duplicadas y descarta la cola larga según la política"""
+        politica = self.retencion or PoliticaRetencion()
+        preguntas = {
+            pregunta: {"categoria": categoria, "frecuencia": frecuencia}
+            for pregunta, categoria, frecuencia in self.conexion.execute(
+                "SELECT pregunta, categoria, frecuencia FROM preguntas_frecuentes ORDER BY rowid")
+        }
+        compactadas = politica.compactar_preguntas(preguntas)
+        with self.conexion:
+            self.conexion.execute("DELETE FROM preguntas_frecuentes")
+            self.conexion.executemany(self.SQL_PREGUNTA, [
+                (pregunta, datos["categoria"], datos["frecuencia"]) for pregunta, datos in compactadas.items()
+            ])
+        self._preguntas_desde_compactacion = 0
+
+    def importar(self, memoria):
+        """Importa un diccionario con el formato de memoria_orguebot.json en una sola transacción
+
+        Es idempotente: las conversaciones ya importadas se saltan y las frecuencias se sustituyen.
+        """
+        with self.conexion:
+            for conversacion in memoria.get("conversaciones", []):
+                if not self._conversacion_existe(conversacion["fecha"], conversacion["intercambios"]):
+                    self._insertar_conversacion(conversacion["fecha"], conversacion["intercambios"])
+            self.conexion.executemany(self.SQL_IMPORTAR_PREGUNTA, [
+                (pregunta, datos["categoria"], datos["frecuencia"])
+                for pregunta, datos in memoria.get("preguntas_frecuentes", {}).items()
+            ])
+            self.conexion.executemany(self.SQL_EASTER_EGG, [
+                (nombre,) for nombre in memoria.get("huevos_pascua_encontrados", [])
+            ])
+            self.conexion.executemany(self.SQL_FEEDBACK, [
+                (clave, json.dumps(valor, ensure_ascii=False))
+                for clave, valor in memoria.get("feedback", {}).items()
+            ])
+
+    def _conversacion_existe(self, fecha, intercambios):
+        """Indica si ya hay una conversación con la misma fecha y los mismos intercambios"""
+        buscados = [(intercambio["rol"], intercambio["mensaje"]) for intercambio in intercambios]
+        for (conversacion_id,) in self.conexion.execute("SELECT id FROM conversaciones WHERE fecha = ?", (fecha,)).fetchall():
+            guardados = self.conexion.execute(
+                "SELECT rol, mensaje FROM intercambios WHERE conversacion_id = ? ORDER BY orden", (conversacion_id,)).fetchall()
+            if guardados == buscados:
+                return True
+        return False
+
+    def cerrar(self):
+        """Cierra la conexión con la base de datos"""
+        self.conexion.close()
+
+def migrar_json_a_sqlite(ruta_json="memoria_orguebot.json", ruta_sqlite="memoria_orguebot.db"):
+    """Importa la memoria guardada en JSON a una base de datos SQLite"""
+    with open(ruta_json, 'r', encoding='utf-8') as archivo:
+        memoria = json.load(archivo)
+    memoria_sqlite = OrgueBotMemoriaSQLite(ruta_sqlite)
+    try:
+        memoria_sqlite.importar(memoria)
+    finally:
+        memoria_sqlite.cerrar()
+    return memoria
+
+class AutomataPatrones:
+    """Autómata de Aho–Corasick: encuentra en una sola pasada todas las apariciones de muchos patrones"""
+    def __init__(self, patrones):
+        self.patrones = list(patrones)
+        # Trie de los patrones: transiciones por carácter y patrones que terminan en cada estado
+        transiciones = [{}]
+        salidas = [()]
+        for indice, patron in enumerate(self.patrones):
+            estado = 0
+            for caracter in patron:
+                destino = transiciones[estado].get(caracter)
+                if destino is None:
+                    destino = len(transiciones)
+                    transiciones[estado][caracter] = destino
+                    transiciones.append({})
+                    salidas.append(())
+                estado = destino
+            salidas[estado] += (indice,)
+
+        # Recorrido en anchura: se completan las transiciones con las del estado de fallo (autómata determinista),
+        # así buscar solo hace una consulta por carácter; cada estado hereda las salidas de su estado de fallo
+        fallo = [0] * len(transiciones)
+        pendientes = list(transiciones[0].values())
+        while pendientes:
+            siguientes = []
+            for estado in pendientes:
+                propias = transiciones[estado]
+                for caracter, destino in list(propias.items()):
+                    fallo[destino] = transiciones[fallo[estado]].get(caracter, 0)
+                    salidas[destino] += salidas[fallo[destino]]
+                    siguientes.append(destino)
+                for caracter, destino in transiciones[fallo[estado]].items():
+                    propias.setdefault(caracter, destino)
+            pendientes = siguientes
+        self.transiciones = transiciones
+        self.salidas = salidas
+        self._consultas = [transicion.get for transicion in transiciones]
+
+    def estado(self):
+        """Patrones, transiciones y salidas ya calculadas, para guardarlas en el archivo compilado"""
+        return {"patrones": self.patrones, "transiciones": self.transiciones, "salidas": self.salidas}
+
+    @classmethod
+    def desde_estado(cls, estado):
+        """Reconstruye el autómata a partir de estado() sin volver a calcular los estados de fallo"""
+        automata = cls.__new__(cls)
+        automata.__dict__.update(estado)
+        automata._consultas = [transicion.get for transicion in automata.transiciones]
+        return automata
+
+    def buscar(self, texto):
+        """Devuelve (inicio, índice del patrón) de cada aparición, incluidas las solapadas"""
+        consultas, salidas, patrones = self._consultas, self.salidas, self.patrones
+        encontrados = []
+        estado = 0
+        for posicion, caracter in enumerate(texto):
+            estado = consultas[estado](caracter, 0)
+            if salidas[estado]:
+                for indice in salidas[estado]:
+                    encontrados.append((posicion + 1 - len(patrones[indice]), indice))
+        return encontrados
+
+# Palabras que, dentro de un mensaje, terminan la conversación o piden ayuda
+PALABRAS_DESPEDIDA = ("adiós", "chao", "hasta luego", "salir", "terminar", "cerrar", "bye", "me voy", "hasta pronto")
+PALABRAS_AYUDA = ("ayuda", "help")
+
+class Coincidencias:
+    """Lo que EscanerMensajes encontró en un mensaje"""
+    __slots__ = ("huevo", "despedida", "ayuda", "claves", "entidades")
+
+    def __init__(self, huevo, despedida, ayuda, claves, entidades):
+        # Primer easter egg (en el orden de la base de conocimientos) cuya clave aparece, o None
+        self.huevo = huevo
+        self.despedida = despedida
+        self.ayuda = ayuda
+        # (inicio, palabra clave) de las palabras clave de categoría, para IndiceCategorias.puntuar
+        self.claves = claves
+        # Entidades (compositores, órganos famosos...) mencionadas como palabras completas, en orden de aparición
+        self.entidades = entidades
+
+def es_palabra_completa(texto, inicio, fin):
+    """Si texto[inicio:fin] no forma parte de una palabra más larga ("sion" en "versión")"""
+    return not ((inicio > 0 and texto[inicio - 1].isalnum()) or (fin < len(texto) and texto[fin].isalnum()))
+
+class EscanerMensajes:
+    """Un único autómata con las claves de los easter eggs, las despedidas, la ayuda, las palabras clave de categoría
+    y los nombres de las entidades"""
+    def __init__(self, easter_eggs, palabras_clave, palabras_despedida=PALABRAS_DESPEDIDA, palabras_ayuda=PALABRAS_AYUDA,
+                 entidades=None):
+        self.huevos = list(easter_eggs)
+        # patrón -> [orden del primer easter egg, despedida, ayuda, palabra clave, entidad]
+        etiquetas = {}
+        def etiqueta(patron):
+            return etiquetas.setdefault(patron, [None, False, False, None, None])
+        for orden, egg in enumerate(easter_eggs.values()):
+            if etiqueta(egg["clave"])[0] is None:
+                etiqueta(egg["clave"])[0] = orden
+        for palabra in palabras_despedida:
+            etiqueta(palabra)[1] = True
+        for palabra in palabras_ayuda:
+            etiqueta(palabra)[2] = True
+        for palabra in palabras_clave:
+            etiqueta(palabra)[3] = palabra
+        # entidades: forma escrita -> entidad (IndiceEntidades.formas)
+        for forma, entidad in (entidades or {}).items():
+            etiqueta(forma)[4] = entidad
+        self.automata = AutomataPatrones(etiquetas)
+        self.etiquetas = [tuple(valor) for valor in etiquetas.values()]
+
+    def estado(self):
+        """Autómata y etiquetas ya calculados, para guardarlos en el archivo compilado"""
+        return {"huevos": self.huevos, "automata": self.automata.estado(), "etiquetas": self.etiquetas}
+
+    @classmethod
+    def desde_estado(cls, estado):
+        """Reconstruye el escáner a partir de estado()"""
+        escaner = cls.__new__(cls)
+        escaner.huevos = estado["huevos"]
+        escaner.automata = AutomataPatrones.desde_estado(estado["automata"])
+        escaner.etiquetas = estado["etiquetas"]
+        return escaner
+
+    def escanear(self, texto):
+        """Una pasada sobre el texto (ya en minúsculas) que devuelve todas las coincidencias"""
+        huevo = None
+        despedida = ayuda = False
+        claves = []
+        entidades = []
+        etiquetas = self.etiquetas
+        patrones = self.automata.patrones
+        for inicio, indice in self.automata.buscar(texto):
+            orden, es_despedida, es_ayuda, palabra, entidad = etiquetas[indice]
+            if orden is not None and (huevo is None or orden < huevo):
+                huevo = orden
+            despedida = despedida or es_despedida
+            ayuda = ayuda or es_ayuda
+            if palabra is not None:
+                claves.append((inicio, palabra))
+            if entidad is not None and entidad not in entidades and es_palabra_completa(texto, inicio, inicio + len(patrones[indice])):
+                entidades.append(entidad)
+        return Coincidencias(None if huevo is None else self.huevos[huevo], despedida, ayuda, claves, entidades)
+
+class IndiceCategorias:
+    """Índice invertido de palabras clave para categorizar preguntas sin recorrer todas las listas"""
+    PESO_EXACTA = 0.5
+    PESO_PARCIAL = 0.3
+    PESO_ALTA_RELEVANCIA = 1.0
+    MAX_TOKENS_ANALIZADOS = 10000
+    # Preguntas que puntuar_lote multiplica de una vez (limita la memoria de la matriz de rasgos)
+    TAM_BLOQUE_LOTE = 1024
+
+    def __init__(self, categorias_palabras, palabras_alta_relevancia):
+        self.categorias = list(categorias_palabras)
+        # palabra clave -> lista de (categoria, peso), una entrada por cada aparición en las listas
+        self.claves_exactas = {}
+        # palabra clave -> lista de categorías para las coincidencias parciales
+        self.claves_parciales = {}
+        # subcadena de una palabra clave -> palabras clave que la contienen
+        self.fragmentos = {}
+
+        for categoria, palabras in categorias_palabras.items():
+            for palabra in palabras:
+                self.claves_exactas.setdefault(palabra, []).append((categoria, self.PESO_EXACTA))
+                self.claves_parciales.setdefault(palabra, []).append(categoria)
+        for categoria, palabras in palabras_alta_relevancia.items():
+            for palabra in palabras:
+                self.claves_exactas.setdefault(palabra, []).append((categoria, self.PESO_ALTA_RELEVANCIA))
+
+        for palabra in self.claves_parciales:
+            for inicio in range(len(palabra)):
+                for fin in range(inicio + 1, len(palabra) + 1):
+                    self.fragmentos.setdefault(palabra[inicio:fin], set()).add(palabra)
+
+        self._automata = None
+        # Categorías parciales de cada token ya visto (el vocabulario de las preguntas es reducido)
+        self._tokens_analizados = {}
+        self._pesos_claves = None
+
+    def estado(self):
+        """Estructuras ya calculadas del índice, para guardarlas en el archivo compilado"""
+        return {
+            "categorias": self.categorias,
+            "claves_exactas": self.claves_exactas,
+            "claves_parciales": self.claves_parciales,
+            "fragmentos": self.fragmentos,
+        }
+
+    @classmethod
+    def desde_estado(cls, estado):
+        """Reconstruye el índice a partir de estado() sin volver a calcular los fragmentos"""
+        indice = cls.__new__(cls)
+        indice.__dict__.update(estado)
+        indice._automata = None
+        indice._tokens_analizados = {}
+        indice._pesos_claves = None
+        return indice
+
+    def buscar_claves(self, pregunta_procesada):
+        """Devuelve (inicio, palabra clave) de cada palabra clave que aparece en la pregunta"""
+        if self._automata is None:
+            self._automata = AutomataPatrones(self.claves_exactas)
+        patrones = self._automata.patrones
+        return [(inicio, patrones[indice]) for inicio, indice in self._automata.buscar(pregunta_procesada)]
+
+    def _categorias_parciales(self, token, candidatas):
+        """Categorías de las coincidencias parciales del token: palabras clave que lo contienen o que contiene
+
+        candidatas son las palabras clave encontradas en la pregunta entera: las contenidas en el token están entre ellas.
+        """
+        categorias_parciales = self._tokens_analizados.get(token)
+        if categorias_parciales is not None:
+            return categorias_parciales
+        contenidas = {palabra for palabra in candidatas if palabra in token}
+        relacionadas = self.fragmentos.get(token, set()) | (contenidas & self.claves_parciales.keys())
+        categorias_parciales = tuple(categoria for palabra in relacionadas for categoria in self.claves_parciales[palabra])
+        if len(self._tokens_analizados) >= self.MAX_TOKENS_ANALIZADOS:
+            self._tokens_analizados.clear()
+        self._tokens_analizados[token] = categorias_parciales
+        return categorias_parciales
+
+    def puntuar(self, pregunta_procesada, claves_encontradas=None):
+        """Calcula la puntuación de cada categoría para una pregunta ya en minúsculas
+
+        claves_encontradas son los (inicio, palabra clave) de buscar_claves o de EscanerMensajes, si ya se buscaron.
+        """
+        if claves_encontradas is None:
+            claves_encontradas = self.buscar_claves(pregunta_procesada)
+        exactas = dict.fromkeys(self.categorias, 0)
+        parciales = dict.fromkeys(self.categorias, 0)
+        altas = dict.fromkeys(self.categorias, 0)
+
+        encontradas = {palabra for _, palabra in claves_encontradas}
+
+        # Coincidencias parciales: cuentan una vez por cada palabra de la pregunta
+        for token in pregunta_procesada.split():
+            if len(token) >= 4:  # Evitar coincidencias con palabras muy cortas
+                for categoria in self._categorias_parciales(token, encontradas):
+                    parciales[categoria] += 1
+
+        # Palabras clave contenidas en la pregunta (cada una cuenta una sola vez)
+        for palabra in encontradas:
+            for categoria, peso in self.claves_exactas[palabra]:
+                if peso == self.PESO_EXACTA:
+                    exactas[categoria] += 1
+                else:
+                    altas[categoria] += 1
+
+        # Se acumula en el mismo orden que el recorrido lineal para obtener exactamente los mismos flotantes
+        puntuaciones = {}
+        for categoria in self.categorias:
+            puntuacion = 0
+            for _ in range(exactas[categoria]):
+                puntuacion += self.PESO_EXACTA
+            for _ in range(parciales[categoria]):
+                puntuacion += self.PESO_PARCIAL
+            for _ in range(altas[categoria]):
+                puntuacion += self.PESO_ALTA_RELEVANCIA
+            puntuaciones[categoria] = puntuacion
+        return puntuaciones
+
+    def _preparar_pesos_claves(self, np):
+        """Matriz (palabras clave x 3 categorías): coincidencias exactas, parciales (vacías) y de alta relevancia"""
+        columnas = {categoria: i for i, categoria in enumerate(self.categorias)}
+        n = len(self.categorias)
+        self._filas_claves = {palabra: fila for fila, palabra in enumerate(self.claves_exactas)}
+        self._pesos_claves = np.zeros((len(self._filas_claves), 3 * n))
+        for palabra, fila in self._filas_claves.items():
+            for categoria, peso in self.claves_exactas[palabra]:
+                self._pesos_claves[fila, columnas[categoria] + (0 if peso == self.PESO_EXACTA else 2 * n)] += 1
+        self._columnas_categorias = columnas
+
+    def puntuar_lote(self, preguntas_procesadas, claves_por_pregunta):
+        """Puntuaciones (preguntas x categorías) de muchas preguntas, las mismas que puntuar (requiere numpy)
+
+        Cada pregunta es una fila de rasgos (sus palabras clave y sus coincidencias parciales); un producto de matrices
+        por bloque da cuántas coincidencias de cada tipo tiene cada categoría.
+        """
+        import numpy as np
+        if self._pesos_claves is None:
+            self._preparar_pesos_claves(np)
+        n = len(self.categorias)
+        puntuaciones = np.zeros((len(preguntas_procesadas), n))
+        for inicio in range(0, len(preguntas_procesadas), self.TAM_BLOQUE_LOTE):
+            bloque = slice(inicio, inicio + self.TAM_BLOQUE_LOTE)
+            cuentas = self._contar_coincidencias(np, preguntas_procesadas[bloque], claves_por_pregunta[bloque])
+            # Se suma peso a peso, como en puntuar, para obtener exactamente los mismos flotantes
+            for parte, peso in enumerate((self.PESO_EXACTA, self.PESO_PARCIAL, self.PESO_ALTA_RELEVANCIA)):
+                cuentas_parte = cuentas[:, parte * n:(parte + 1) * n]
+                for veces in range(int(cuentas_parte.max(initial=0))):
+                    np.add(puntuaciones[bloque], peso, out=puntuaciones[bloque], where=cuentas_parte > veces)
+        return puntuaciones
+
+    def _contar_coincidencias(self, np, preguntas_procesadas, claves_por_pregunta):
+        """Matriz de rasgos del bloque por la de pesos: coincidencias de cada tipo y categoría de cada pregunta"""
+        n = len(self.categorias)
+        filas_claves = self._filas_claves
+        # Las coincidencias parciales se agrupan por las categorías que dan: hay muchas menos que tokens
+        rasgos_parciales = {}
+        filas, columnas = [], []
+        for fila, (pregunta, claves) in enumerate(zip(preguntas_procesadas, claves_por_pregunta)):
+            encontradas = {palabra for _, palabra in claves}
+            for palabra in encontradas:
+                filas.append(fila)
+                columnas.append(filas_claves[palabra])
+            for token in pregunta.split():
+                if len(token) >= 4:
+                    categorias_parciales = self._categorias_parciales(token, encontradas)
+                    if categorias_parciales:
+                        filas.append(fila)
+                        columnas.append(len(filas_claves) + rasgos_parciales.setdefault(categorias_parciales, len(rasgos_parciales)))
+        pesos_parciales = np.zeros((len(rasgos_parciales), 3 * n))
+        for categorias_parciales, fila in rasgos_parciales.items():
+            for categoria in categorias_parciales:
+                pesos_parciales[fila, n + self._columnas_categorias[categoria]] += 1
+        rasgos = np.zeros((len(preguntas_procesadas), len(filas_claves) + len(rasgos_parciales)))
+        np.add.at(rasgos, (np.array(filas, dtype=np.intp), np.array(columnas, dtype=np.intp)), 1)
+        return rasgos @ np.vstack((self._pesos_claves, pesos_parciales))
+
+    def puntuar_categoria(self, claves_encontradas, categoria):
+        """Puntuación de una sola categoría por sus palabras clave exactas, o None si alguna apunta solo a otras"""
+        puntuacion = 0
+        for palabra in {palabra for _, palabra in claves_encontradas}:
+            pesos = [peso for categoria_clave, peso in self.claves_exactas[palabra] if categoria_clave == categoria]
+            if not pesos:
+                return None
+            puntuacion += sum(pesos)
+        return puntuacion
+
+class IndiceDifuso:
+    """Índice de borrados (al estilo SymSpell) para reconocer palabras clave mal escritas, como "compocitor"
+
+    Cada palabra clave se guarda bajo todas sus variantes con hasta 1 o 2 letras borradas; una palabra de la
+    pregunta solo se compara con las palabras clave que comparten alguna variante con ella. Las palabras
+    conocidas (también escritas sin tildes) nunca se corrigen, y a una palabra clave escrita sin tildes
+    ("tecnica") se le ponen sin más. Tampoco es una errata otra forma de la misma palabra: si solo cambia
+    la terminación ("famosas" y "famosos", "restaurada" y "restaurar") es una palabra distinta bien escrita.
+    """
+    # Las palabras más cortas se confunden con demasiada facilidad ("autos" y "autor")
+    LONGITUD_MINIMA_CLAVE = 5
+    LONGITUD_MINIMA = 6
+    # Un error por cada 6 letras de la palabra clave: "importantes" no admite dos ("impactantes")
+    LETRAS_POR_ERROR = 6
+    # Terminaciones de género, número y conjugación (sin tildes)
+    TERMINACIONES = ("ados", "adas", "idos", "idas", "ado", "ada", "ido", "ida", "an", "en", "ar", "er", "ir", "io",
+                     "os", "as", "es", "o", "a", "e", "i", "s", "n", "r")
+    MAX_PALABRAS_ANALIZADAS = 10000
+
+    def __init__(self, palabras_clave, palabras_conocidas=()):
+        # Palabra clave -> orden, para desempatar siempre igual
+        self.palabras_clave = {}
+        self.borrados = {}
+        # Palabra clave sin tildes -> palabra clave
+        self.claves_sin_tildes = {}
+        for palabra in palabras_clave:
+            if " " in palabra or palabra in self.palabras_clave:
+                continue
+            if quitar_tildes(palabra) != palabra:
+                self.claves_sin_tildes.setdefault(quitar_tildes(palabra), palabra)
+            if len(palabra) < self.LONGITUD_MINIMA_CLAVE:
+                continue
+            self.palabras_clave[palabra] = len(self.palabras_clave)
+            for variante in self._variantes(palabra, self.distancia_maxima(palabra)):
+                self.borrados.setdefault(variante, []).append(palabra)
+        # Palabras bien escritas, con y sin tildes, que no deben "corregirse" hacia una palabra clave parecida
+        palabras_conocidas = frozenset(palabras_conocidas)
+        sin_tildes = {quitar_tildes(palabra) for palabra in palabras_conocidas} - self.claves_sin_tildes.keys()
+        self.palabras_conocidas = palabras_conocidas | sin_tildes | self.palabras_clave.keys()
+        self._reiniciar_analizadas()
+
+    def estado(self):
+        """Palabras clave, borrados y palabras conocidas, para guardarlos en el archivo compilado"""
+        return {
+            "palabras_clave": self.palabras_clave,
+            "borrados": self.borrados,
+            "claves_sin_tildes": self.claves_sin_tildes,
+            "palabras_conocidas": self.palabras_conocidas,
+        }
+
+    @classmethod
+    def desde_estado(cls, estado):
+        """Reconstruye el índice a partir de estado() sin volver a calcular las variantes"""
+        indice = cls.__new__(cls)
+        indice.__dict__.update(estado)
+        indice._reiniciar_analizadas()
+        return indice
+
+    def _reiniciar_analizadas(self):
+        """Vacía las palabras ya analizadas: las que no necesitan corrección y las corregidas"""
+        self._correctas = set(self.palabras_conocidas)
+        self._correcciones = {}
+
+    @classmethod
+    def distancia_maxima(cls, palabra):
+        """Errores tolerados según la longitud de la palabra clave (al menos uno)"""
+        return max(1, len(palabra) // cls.LETRAS_POR_ERROR)
+
+    @classmethod
+    def raices(cls, palabra):
+        """La palabra sin tildes con y sin cada terminación posible: dos formas de una palabra comparten alguna"""
+        palabra = quitar_tildes(palabra)
+        raices = {palabra}
+        for terminacion in cls.TERMINACIONES:
+            if palabra.endswith(terminacion) and len(palabra) - len(terminacion) >= 3:
+                raices.add(palabra[:-len(terminacion)])
+        return raices
+
+    @staticmethod
+    def _variantes(palabra, borrados):
+        """La palabra y todas las formas que se obtienen borrando hasta `borrados` letras"""
+        variantes = {palabra}
+        nivel = {palabra}
+        for _ in range(borrados):
+            nivel = {forma[:i] + forma[i + 1:] for forma in nivel for i in range(len(forma))}
+            variantes |= nivel
+        return variantes
+
+    @staticmethod
+    def distancia(a, b):
+        """Distancia de edición con transposiciones de letras contiguas (Damerau-Levenshtein restringida)"""
+        anterior_previa = None
+        anterior = list(range(len(b) + 1))
+        for i in range(1, len(a) + 1):
+            actual = [i] + [0] * len(b)
+            for j in range(1, len(b) + 1):
+                coste = 0 if a[i - 1] == b[j - 1] else 1
+                actual[j] = min(anterior[j] + 1, actual[j - 1] + 1, anterior[j - 1] + coste)
+                if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                    actual[j] = min(actual[j], anterior_previa[j - 2] + 1)
+            anterior_previa, anterior = anterior, actual
+        return anterior[len(b)]
+
+    def _buscar_correccion(self, palabra):
+        """Palabra clave más cercana dentro de la distancia tolerada, o None"""
+        forma = quitar_tildes(palabra)
+        if forma in self.claves_sin_tildes:
+            return self.claves_sin_tildes[forma]
+        if len(palabra) < self.LONGITUD_MINIMA or not palabra.isalpha() or forma in self.palabras_conocidas:
+            return None
+        # Una palabra clave a distancia 2 tiene al menos 12 letras, así que la palabra al menos 10
+        candidatas = set()
+        for variante in self._variantes(palabra, 2 if len(palabra) >= 2 * self.LETRAS_POR_ERROR - 2 else 1):
+            candidatas.update(self.borrados.get(variante, ()))
+        mejor = None
+        mejor_distancia = None
+        raices = self.raices(palabra)
+        for candidata in candidatas:
+            # Si una contiene a la otra ya cuenta como coincidencia parcial; si comparten raíz es otra forma de la clave
+            if candidata in palabra or palabra in candidata or not raices.isdisjoint(self.raices(candidata)):
+                continue
+            distancia = self.distancia(palabra, candidata)
+            if distancia > self.distancia_maxima(candidata):
+                continue
+            if mejor is None or (distancia, self.palabras_clave[candidata]) < (mejor_distancia, self.palabras_clave[mejor]):
+                mejor, mejor_distancia = candidata, distancia
+        return mejor
+
+    def corregir(self, palabra):
+        """Palabra clave más cercana a una palabra mal escrita, o None si está bien escrita o no se parece a ninguna"""
+        if palabra in self._correctas:
+            return None
+        correccion = self._correcciones.get(palabra)
+        if correccion is None:
+            correccion = self._buscar_correccion(palabra)
+            if len(self._correctas) + len(self._correcciones) >= len(self.palabras_conocidas) + self.MAX_PALABRAS_ANALIZADAS:
+                self._reiniciar_analizadas()
+            if correccion is None:
+                self._correctas.add(palabra)
+            else:
+                self._correcciones[palabra] = correccion
+        return correccion
+
+    def _sustituir(self, coincidencia):
+        return self.corregir(coincidencia.group()) or coincidencia.group()
+
+    def _sustituir_tildes(self, coincidencia):
+        palabra = coincidencia.group()
+        correccion = self.corregir(palabra)
+        return correccion if correccion is not None and quitar_tildes(correccion) == quitar_tildes(palabra) else palabra
+
+    def corregir_texto(self, texto, erratas=True):
+        """Sustituye las palabras mal escritas por su palabra clave; devuelve el mismo texto si no hay ninguna
+
+        Con erratas=False solo se ponen las tildes que faltan ("tecnica" -> "técnica").
+        """
+        texto_lower = texto.lower()
+        correctas = self._correctas
+        for palabra in PATRON_PALABRAS.findall(texto_lower):
+            if palabra not in correctas and self.corregir(palabra) is not None:
+                return PATRON_PALABRAS.sub(self._sustituir if erratas else self._sustituir_tildes, texto_lower)
+        return texto
+
+class IndiceEntidades:
+    """Entidades de la base de conocimientos (compositores, órganos famosos...) y las respuestas que las mencionan"""
+    def __init__(self, entidades, conocimientos, minusculas):
+        # entidad -> categoría a la que pertenece; forma escrita -> entidad
+        self.categorias = {}
+        self.formas = {}
+        for categoria, por_entidad in entidades.items():
+            for entidad, formas in por_entidad.items():
+                self.categorias[entidad] = categoria
+                for forma in [entidad] + formas:
+                    self.formas[forma] = entidad
+        self.automata = AutomataPatrones(self.formas)
+        # respuesta -> entidades que menciona (la primera es de la que trata); entidad -> (categoría, respuesta)
+        self.por_respuesta = {}
+        self.menciones = {}
+        for categoria, respuestas in conocimientos.items():
+            for respuesta in respuestas:
+                encontradas = tuple(self.buscar(minusculas[respuesta]))
+                self.por_respuesta[respuesta] = encontradas
+                for entidad in encontradas:
+                    self.menciones.setdefault(entidad, []).append((categoria, respuesta))
+
+    def estado(self):
+        """Entidades, autómata y menciones ya calculados, para guardarlos en el archivo compilado"""
+        return {
+            "categorias": self.categorias,
+            "formas": self.formas,
+            "automata": self.automata.estado(),
+            "por_respuesta": self.por_respuesta,
+            "menciones": self.menciones,
+        }
+
+    @classmethod
+    def desde_estado(cls, estado):
+        """Reconstruye el índice a partir de estado() sin volver a buscar las entidades en las respuestas"""
+        indice = cls.__new__(cls)
+        indice.__dict__.update(estado)
+        indice.automata = AutomataPatrones.desde_estado(estado["automata"])
+        return indice
+
+    def buscar(self, texto):
+        """Entidades mencionadas en un texto en minúsculas, sin repetir y en orden de aparición"""
+        encontradas = []
+        patrones = self.automata.patrones
+        for inicio, indice in self.automata.buscar(texto):
+            forma = patrones[indice]
+            if not es_palabra_completa(texto, inicio, inicio + len(forma)):
+                continue
+            entidad = self.formas[forma]
+            if entidad not in encontradas:
+                encontradas.append(entidad)
+        return encontradas
+
+    def respuestas_sobre(self, entidad, categoria_preferida=None):
+        """(categoría, respuesta) que mencionan la entidad: primero las de la categoría preferida, luego las de la
+        propia entidad, y dentro de cada grupo las que tratan de ella"""
+        propia = self.categorias[entidad]
+        def orden(mencion):
+            categoria, respuesta = mencion
+            return (categoria != categoria_preferida, categoria != propia, self.por_respuesta[respuesta][0] != entidad)
+        return sorted(self.menciones.get(entidad, ()), key=orden)
+
+class MotorSecuencia:
+    """Motor de respuestas que compara la pregunta con cada respuesta usando SequenceMatcher"""
+    umbral = 0.2
+
+    def __init__(self, conocimientos, palabras_clave_categoria, reglas_refuerzo, precalculado=None):
+        self.conocimientos = conocimientos
+        self.palabras_clave_categoria = palabras_clave_categoria
+        self.reglas_refuerzo = reglas_refuerzo
+        precalculado = precalculado or precalcular_respuestas(conocimientos)
+        self.minusculas = precalculado["minusculas"]
+
+    def _calcular_similitud(self, texto1, texto2):
+        """Calcula la similitud entre dos textos ya en minúsculas"""
+        return SequenceMatcher(None, texto1, texto2).ratio()
+
+    def buscar(self, pregunta, categoria):
+        """Devuelve la respuesta con mayor similitud de la categoría y su puntuación"""
+        mejor_similitud = 0
+        mejor_respuesta = None
+
+        pregunta_lower = pregunta.lower()
+        for respuesta in self.conocimientos[categoria]:
+            respuesta_lower = self.minusculas[respuesta]
+            # Calcular similitud directa
+            similitud = self._calcular_similitud(pregunta_lower, respuesta_lower)
+
+            # Aumentar similitud si contiene palabras clave relevantes
+            for palabra in self.palabras_clave_categoria.get(categoria, []):
+                if palabra in pregunta_lower and palabra in respuesta_lower:
+                    similitud += 0.15
+
+            # Refuerzos para preguntas concretas de la categoría
+            for categoria_regla, palabras_pregunta, palabras_respuesta in self.reglas_refuerzo:
+                if categoria == categoria_regla and any(p in pregunta_lower for p in palabras_pregunta):
+                    if any(p in respuesta_lower for p in palabras_respuesta):
+                        similitud += 0.3
+
+            if similitud > mejor_similitud:
+                mejor_similitud = similitud
+                mejor_respuesta = respuesta
+
+        return mejor_respuesta, mejor_similitud
+
+    def buscar_lote(self, preguntas, categorias):
+        """Busca la mejor respuesta de cada pregunta en su categoría"""
+        return [self.buscar(pregunta, categoria) for pregunta, categoria in zip(preguntas, categorias)]
+
+class RefuerzosVectoriales:
+    """Refuerzos por palabras clave y reglas como máscaras sobre las respuestas, para los motores con numpy"""
+    def _preparar_refuerzos(self, minusculas):
+        """Máscaras (una por palabra clave o regla de refuerzo) de las respuestas de cada categoría"""
+        np = self.np
+        self.mascaras_clave = {}
+        self.mascaras_reglas = {}
+        for categoria, respuestas in self.conocimientos.items():
+            respuestas_lower = [minusculas[respuesta] for respuesta in respuestas]
+            self.mascaras_clave[categoria] = [
+                (palabra, np.array([palabra in respuesta for respuesta in respuestas_lower], dtype=np.float64))
+                for palabra in self.palabras_clave_categoria.get(categoria, [])
+            ]
+            self.mascaras_reglas[categoria] = [
+                (palabras_pregunta, np.array([any(p in respuesta for p in palabras_respuesta) for respuesta in respuestas_lower], dtype=np.float64))
+                for categoria_regla, palabras_pregunta, palabras_respuesta in self.reglas_refuerzo
+                if categoria_regla == categoria
+            ]
+
+    def _sumar_refuerzos(self, similitudes, preguntas, categoria):
+        """Suma a la matriz (preguntas x respuestas) los refuerzos por palabra clave como características adicionales"""
+        preguntas_lower = [pregunta.lower() for pregunta in preguntas]
+        for palabra, mascara in self.mascaras_clave[categoria]:
+            contiene = self.np.array([palabra in pregunta for pregunta in preguntas_lower], dtype=self.np.float64)
+            if contiene.any():
+                similitudes += 0.15 * self.np.outer(contiene, mascara)
+        for palabras_pregunta, mascara in self.mascaras_reglas[categoria]:
+            contiene = self.np.array([any(p in pregunta for p in palabras_pregunta) for pregunta in preguntas_lower], dtype=self.np.float64)
+            if contiene.any():
+                similitudes += 0.3 * self.np.outer(contiene, mascara)
+        return similitudes
+
+    def buscar(self, pregunta, categoria):
+        """Devuelve la respuesta con mayor similitud de la categoría y su puntuación"""
+        return self.buscar_lote([pregunta], [categoria])[0]
+
+    def buscar_lote(self, preguntas, categorias):
+        """Busca la mejor respuesta de muchas preguntas con un producto de matrices por categoría"""
+        resultados = [None] * len(preguntas)
+        por_categoria = {}
+        for posicion, categoria in enumerate(categorias):
+            por_categoria.setdefault(categoria, []).append(posicion)
+
+        for categoria, posiciones in por_categoria.items():
+            respuestas = self.conocimientos[categoria]
+            if not respuestas:
+                for posicion in posiciones:
+                    resultados[posicion] = (None, 0)
+                continue
+            similitudes = self._puntuar([preguntas[posicion] for posicion in posiciones], categoria)
+            mejores = similitudes.argmax(axis=1)
+            for fila, posicion in enumerate(posiciones):
+                mejor = int(mejores[fila])
+                resultados[posicion] = (respuestas[mejor], float(similitudes[fila, mejor]))
+        return resultados
+
+class MotorTFIDF(RefuerzosVectoriales):
+    """Motor de respuestas basado en una matriz dispersa TF-IDF calculada al inicio (requiere numpy y scipy)"""
+    umbral = 0.2
+
+    def __init__(self, conocimientos, palabras_clave_categoria, reglas_refuerzo, precalculado=None):
+        try:
+            import numpy as np
+            from scipy import sparse
+        except ImportError as e:
+            raise ImportError("El motor 'tfidf' necesita numpy y scipy: pip install numpy scipy") from e
+        self.np = np
+        self.sparse = sparse
+        self.conocimientos = conocimientos
+        self.palabras_clave_categoria = palabras_clave_categoria
+        self.reglas_refuerzo = reglas_refuerzo
+        precalculado = precalculado or precalcular_respuestas(conocimientos)
+
+        # Vocabulario y frecuencia documental sobre todas las respuestas
+        self.vocabulario = {}
+        documentos = {}
+        frecuencia_documental = []
+        for categoria, respuestas in conocimientos.items():
+            documentos[categoria] = []
+            for respuesta in respuestas:
+                conteos = {}
+                for token in precalculado["tokens"][respuesta]:
+                    indice = self.vocabulario.setdefault(token, len(self.vocabulario))
+                    conteos[indice] = conteos.get(indice, 0) + 1
+                for indice in conteos:
+                    if indice == len(frecuencia_documental):
+                        frecuencia_documental.append(0)
+                    frecuencia_documental[indice] += 1
+                documentos[categoria].append(conteos)
+
+        total = sum(len(respuestas) for respuestas in conocimientos.values())
+        self.idf = np.log((1 + total) / (1 + np.array(frecuencia_documental, dtype=np.float64))) + 1
+
+        # Una matriz normalizada por categoría más las máscaras de los refuerzos por palabra clave
+        self.matrices = {categoria: self._matriz(documentos[categoria]) for categoria in conocimientos}
+        self._preparar_refuerzos(precalculado["minusculas"])
+
+    def _ponderar(self, conteos):
+        """Convierte conteos de términos en pesos TF-IDF normalizados"""
+        indices = self.np.fromiter(conteos.keys(), dtype=self.np.int64, count=len(conteos))
+        pesos = (1 + self.np.log(self.np.fromiter(conteos.values(), dtype=self.np.float64, count=len(conteos)))) * self.idf[indices]
+        norma = self.np.linalg.norm(pesos)
+        return indices, pesos / norma if norma else pesos
+
+    def _matriz(self, documentos):
+        """Construye la matriz CSR (respuestas x vocabulario) de una categoría"""
+        filas, columnas, datos = [], [], []
+        for fila, conteos in enumerate(documentos):
+            if not conteos:
+                continue
+            indices, pesos = self._ponderar(conteos)
+            filas.extend([fila] * len(indices))
+            columnas.extend(indices)
+            datos.extend(pesos)
+        return self.sparse.csr_matrix((datos, (filas, columnas)), shape=(len(documentos), len(self.vocabulario)))
+
+    def _matriz_consultas(self, preguntas):
+        """Construye la matriz TF-IDF dispersa (preguntas x vocabulario) ignorando palabras fuera del vocabulario"""
+        filas, columnas, datos = [], [], []
+        for fila, pregunta in enumerate(preguntas):
+            conteos = {}
+            for token in tokenizar_palabras(pregunta):
+                indice = self.vocabulario.get(token)
+                if indice is not None:
+                    conteos[indice] = conteos.get(indice, 0) + 1
+            if not conteos:
+                continue
+            indices, pesos = self._ponderar(conteos)
+            filas.extend([fila] * len(indices))
+            columnas.extend(indices)
+            datos.extend(pesos)
+        return self.sparse.csr_matrix((datos, (filas, columnas)), shape=(len(preguntas), len(self.vocabulario)))
+
+    def _puntuar(self, preguntas, categoria):
+        """Matriz (preguntas x respuestas) de similitud coseno más los refuerzos por palabra clave"""
+        similitudes = (self._matriz_consultas(preguntas) @ self.matrices[categoria].T).toarray()
+        return self._sumar_refuerzos(similitudes, preguntas, categoria)
+
+class MotorSemantico(RefuerzosVectoriales):
+    """Motor de respuestas por similitud semántica con vectores densos precalculados (requiere numpy)
+
+    Las palabras sin tildes y sus trigramas de letras se reparten con un hash en DIMENSION_RASGOS columnas
+    TF-IDF; una SVD aleatorizada (LSA) las reduce a DIMENSIONES, así las paráfrasis y las palabras de la misma
+    familia ("compuso", "compositor") quedan cerca. Los vectores se guardan en un .npy que se abre con mmap.
+    """
+    FORMATO_INDICE = 1
+    DIMENSION_RASGOS = 2 ** 14
+    DIMENSIONES = 64
+    LONGITUD_NGRAMA = 3
+    ITERACIONES_SVD = 2
+    # Umbral de confianza: percentil de la puntuación de preguntas hechas con palabras de otra categoría
+    PERCENTIL_UMBRAL = 90
+    MUESTRAS_UMBRAL = 500
+    MAX_TOKENS_ANALIZADOS = 10000
+    # crear_motor_respuestas le pasa la ruta donde guardar sus vectores
+    indice_en_disco = True
+
+    def __init__(self, conocimientos, palabras_clave_categoria, reglas_refuerzo, precalculado=None, ruta_indice=None, umbral=None):
+        try:
+            import numpy as np
+        except ImportError as e:
+            raise ImportError("El motor 'semantico' necesita numpy: pip install numpy") from e
+        self.np = np
+        self.conocimientos = conocimientos
+        self.palabras_clave_categoria = palabras_clave_categoria
+        self.reglas_refuerzo = reglas_refuerzo
+        precalculado = precalculado or precalcular_respuestas(conocimientos)
+        # Columnas de los rasgos de cada palabra ya vista
+        self._rasgos_analizados = {}
+
+        # Las respuestas ocupan filas consecutivas, categoría por categoría
+        self.filas = {}
+        total = 0
+        for categoria, respuestas in conocimientos.items():
+            self.filas[categoria] = (total, total + len(respuestas))
+            total += len(respuestas)
+
+        # Una sola matriz: los vectores de las respuestas y debajo la proyección de los rasgos de una pregunta,
+        # con el idf de cada rasgo en la última columna
+        indice = self._cargar_o_construir(precalculado["tokens"], total, ruta_indice)
+        self.vectores = indice[:total, :-1]
+        self.proyeccion = indice[total:, :-1]
+        self.idf = indice[total:, -1]
+        self.umbral = umbral if umbral is not None else self._calibrar_umbral(precalculado["tokens"])
+        self._preparar_refuerzos(precalculado["minusculas"])
+
+    def _firma(self):
+        """Huella de las respuestas y los parámetros, para saber si el índice guardado sigue valiendo"""
+        import hashlib
+        huella = hashlib.sha1(repr((self.FORMATO_INDICE, self.DIMENSION_RASGOS, self.DIMENSIONES, self.LONGITUD_NGRAMA)).encode("utf-8"))
+        for categoria, respuestas in self.conocimientos.items():
+            huella.update(categoria.encode("utf-8"))
+            for respuesta in respuestas:
+                huella.update(b"\0" + respuesta.encode("utf-8"))
+        return huella.hexdigest()[:16]
+
+    def _cargar_o_construir(self, tokens, total, ruta_indice):
+        """Abre con mmap el índice guardado si está al día; si no, lo calcula y lo guarda en ruta_indice-<firma>.npy"""
+        np = self.np
+        ruta = f"{ruta_indice}-{self._firma()}.npy" if ruta_indice else None
+        if ruta and os.path.exists(ruta):
+            try:
+                indice = np.load(ruta, mmap_mode="r")
+                if indice.ndim == 2 and indice.shape[0] == total + self.DIMENSION_RASGOS and indice.shape[1] > 1:
+                    return indice
+            except (OSError, ValueError) as e:
+                print(f"Error al leer el índice semántico {ruta}: {e}")
+        indice = self._construir(tokens, total)
+        if ruta:
+            try:
+                # Escribir en un temporal y renombrar: otros procesos pueden estar abriendo el índice
+                temporal = f"{ruta}.{os.getpid()}.tmp"
+                with open(temporal, 'wb') as archivo:
+                    np.save(archivo, indice)
+                os.replace(temporal, ruta)
+                self._borrar_indices_antiguos(ruta_indice, ruta)
+                return np.load(ruta, mmap_mode="r")
+            except OSError as e:
+                print(f"Error al guardar el índice semántico {ruta}: {e}")
+        return indice
+
+    @staticmethod
+    def _borrar_indices_antiguos(ruta_indice, actual):
+        """Borra los índices de versiones anteriores de la base (los procesos que aún los usan conservan su mmap)"""
+        import glob
+        for ruta in glob.glob(glob.escape(ruta_indice) + "-*.npy"):
+            if ruta != actual:
+                try:
+                    os.remove(ruta)
+                except OSError:
+                    pass
+
+    def _rasgos_token(self, token):
+        """Columnas de los rasgos de una palabra: la palabra sin tildes y sus trigramas de letras"""
+        rasgos = self._rasgos_analizados.get(token)
+        if rasgos is None:
+            import zlib
+            forma = quitar_tildes(token)
+            marcada = f" {forma} "
+            n = self.LONGITUD_NGRAMA
+            partes = ["#" + forma] + [marcada[i:i + n] for i in range(len(marcada) - n + 1)]
+            # crc32 y no hash(): las columnas deben ser las mismas en todos los procesos
+            rasgos = tuple(zlib.crc32(parte.encode("utf-8")) % self.DIMENSION_RASGOS for parte in partes)
+            if len(self._rasgos_analizados) >= self.MAX_TOKENS_ANALIZADOS:
+                self._rasgos_analizados.clear()
+            self._rasgos_analizados[token] = rasgos
+        return rasgos
+
+    def _conteos(self, tokens):
+        """Conteos de los rasgos (columna -> veces) de una lista de palabras, sin las palabras vacías"""
+        conteos = {}
+        for token in tokens:
+            if token in STOPWORDS_ES:
+                continue
+            for columna in self._rasgos_token(token):
+                conteos[columna] = conteos.get(columna, 0) + 1
+        return conteos
+
+    def _construir(self, tokens, total):
+        """Calcula los vectores de las respuestas y la proyección de los rasgos con una SVD aleatorizada"""
+        np = self.np
+        documentos = [self._conteos(tokens[respuesta]) for respuestas in self.conocimientos.values() for respuesta in respuestas]
+        frecuencia_documental = np.zeros(self.DIMENSION_RASGOS)
+        for conteos in documentos:
+            frecuencia_documental[list(conteos)] += 1
+        idf = np.log((1 + total) / (1 + frecuencia_documental)) + 1
+
+        # Filas TF-IDF normalizadas como (columnas, pesos): con hashing casi todas las columnas de una fila son cero
+        filas = []
+        for conteos in documentos:
+            columnas = np.fromiter(conteos.keys(), dtype=np.int64, count=len(conteos))
+            pesos = (1 + np.log(np.fromiter(conteos.values(), dtype=np.float64, count=len(conteos)))) * idf[columnas]
+            norma = np.linalg.norm(pesos)
+            filas.append((columnas, pesos / norma if norma else pesos))
+
+        def por_derecha(matriz):  # filas @ matriz
+            resultado = np.zeros((len(filas), matriz.shape[1]))
+            for fila, (columnas, pesos) in enumerate(filas):
+                if len(columnas):
+                    resultado[fila] = pesos @ matriz[columnas]
+            return resultado
+
+        def por_izquierda(matriz):  # filas.T @ matriz
+            resultado = np.zeros((self.DIMENSION_RASGOS, matriz.shape[1]))
+            for fila, (columnas, pesos) in enumerate(filas):
+                resultado[columnas] += np.outer(pesos, matriz[fila])
+            return resultado
+
+        # SVD aleatorizada (Halko et al.): base ortonormal de la imagen con unas iteraciones de potencia
+        dimensiones = max(1, min(self.DIMENSIONES, total))
+        aleatorio = np.random.default_rng(0)
+        base, _ = np.linalg.qr(por_derecha(aleatorio.standard_normal((self.DIMENSION_RASGOS, dimensiones + 10))))
+        for _ in range(self.ITERACIONES_SVD):
+            base, _ = np.linalg.qr(por_derecha(np.linalg.qr(por_izquierda(base))[0]))
+        _, _, componentes = np.linalg.svd(por_izquierda(base).T, full_matrices=False)
+        componentes = componentes[:dimensiones].T
+
+        vectores = por_derecha(componentes)
+        normas = np.linalg.norm(vectores, axis=1, keepdims=True)
+        vectores /= np.where(normas > 0, normas, 1)
+        return np.vstack([
+            np.hstack([vectores, np.zeros((total, 1))]),
+            np.hstack([idf[:, None] * componentes, idf[:, None]]),
+        ]).astype(np.float32)
+
+    def _calibrar_umbral(self, tokens):
+        """Similitud mínima para fiarse de una respuesta: la que solo supera un PERCENTIL_UMBRAL % de preguntas
+        sin relación, formadas con palabras de respuestas de otra categoría"""
+        np = self.np
+        categorias = [categoria for categoria, respuestas in self.conocimientos.items() if respuestas]
+        if len(categorias) < 2:
+            return MotorSecuencia.umbral
+        aleatorio = random.Random(0)
+        preguntas, destinos = [], []
+        for _ in range(self.MUESTRAS_UMBRAL):
+            origen, destino = aleatorio.sample(categorias, 2)
+            palabras = [token for token in tokens[aleatorio.choice(self.conocimientos[origen])] if token not in STOPWORDS_ES]
+            if palabras:
+                preguntas.append(" ".join(aleatorio.sample(palabras, min(len(palabras), aleatorio.randint(1, 4)))))
+                destinos.append(destino)
+        if not preguntas:
+            return MotorSecuencia.umbral
+        consultas = self._vectores_consultas(preguntas)
+        # Lo que el motor devolvería: la mejor respuesta de la otra categoría
+        mejores = [float((self.vectores[slice(*self.filas[destino])] @ consulta).max()) for consulta, destino in zip(consultas, destinos)]
+        return float(np.percentile(mejores, self.PERCENTIL_UMBRAL))
+
+    def _vectores_consultas(self, preguntas):
+        """Proyección (preguntas x DIMENSIONES) del vector TF-IDF normalizado de cada pregunta
+
+        No se vuelve a normalizar: su norma es la parte de la pregunta que cabe en el espacio de las respuestas,
+        así las preguntas con palabras que no aparecen en ninguna respuesta puntúan menos.
+        """
+        np = self.np
+        consultas = np.zeros((len(preguntas), self.proyeccion.shape[1]), dtype=np.float32)
+        for fila, pregunta in enumerate(preguntas):
+            conteos = self._conteos(tokenizar_palabras(pregunta))
+            if conteos:
+                columnas = np.fromiter(conteos.keys(), dtype=np.int64, count=len(conteos))
+                pesos = 1 + np.log(np.fromiter(conteos.values(), dtype=np.float32, count=len(conteos)))
+                norma = np.linalg.norm(pesos * self.idf[columnas])
+                if norma:
+                    consultas[fila] = (pesos @ self.proyeccion[columnas]) / norma
+        return consultas
+
+    def _puntuar(self, preguntas, categoria):
+        """Matriz (preguntas x respuestas) de similitud coseno más los refuerzos por palabra clave"""
+        inicio, fin = self.filas[categoria]
+        similitudes = (self._vectores_consultas(preguntas) @ self.vectores[inicio:fin].T).astype(self.np.float64)
+        return self._sumar_refuerzos(similitudes, preguntas, categoria)
+
+# Motores disponibles para buscar respuestas dentro de una categoría
+MOTORES_RESPUESTA = {
+    "secuencia": MotorSecuencia,
+    "tfidf": MotorTFIDF,
+    "semantico": MotorSemantico,
+}
+
+def crear_motor_respuestas(nombre, conocimientos, palabras_clave_categoria, reglas_refuerzo, precalculado=None, ruta_indice=None):
+    """Crea el motor de respuestas indicado por su nombre; ruta_indice es dónde guarda su índice si lo necesita"""
+    if nombre not in MOTORES_RESPUESTA:
+        raise ValueError(f"Motor de respuestas desconocido: {nombre}. Opciones: {', '.join(MOTORES_RESPUESTA)}")
+    motor = MOTORES_RESPUESTA[nombre]
+    if getattr(motor, "indice_en_disco", False):
+        return motor(conocimientos, palabras_clave_categoria, reglas_refuerzo, precalculado, ruta_indice=ruta_indice)
+    return motor(conocimientos, palabras_clave_categoria, reglas_refuerzo, precalculado)
+
+class CacheRespuestas:
+    """Caché LRU con caducidad opcional para los resultados de categorizar y buscar respuesta
+
+    Con una Instrumentacion, cada acierto y cada fallo se cuentan también en sus sumideros
+    (cache_aciertos y cache_fallos).
+    """
+    def __init__(self, max_entradas=1024, ttl=None, instrumentacion=None):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self.instrumentacion = instrumentacion
+        self.entradas = OrderedDict()  # clave -> (instante de guardado, valor)
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave):
+        """Devuelve (encontrado, valor) y marca la entrada como usada recientemente"""
+        entrada = self.entradas.get(clave)
+        if entrada is not None and (self.ttl is None or time.monotonic() - entrada[0] < self.ttl):
+            self.entradas.move_to_end(clave)
+            self.aciertos += 1
+            if self.instrumentacion is not None:
+                self.instrumentacion.contar("cache_aciertos")
+            return True, entrada[1]
+        if entrada is not None:
+            del self.entradas[clave]
+        self.fallos += 1
+        if self.instrumentacion is not None:
+            self.instrumentacion.contar("cache_fallos")
+        return False, None
+
+    def guardar(self, clave, valor):
+        """Guarda un valor expulsando la entrada menos usada si se supera el tamaño"""
+        if self.max_entradas <= 0:
+            return
+        self.entradas[clave] = (time.monotonic(), valor)
+        self.entradas.move_to_end(clave)
+        while len(self.entradas) > self.max_entradas:
+            self.entradas.popitem(last=False)
+
+    def limpiar(self):
+        """Vacía la caché (por ejemplo al recargar los conocimientos)"""
+        self.entradas.clear()
+
+    def estadisticas(self):
+        """Devuelve aciertos, fallos, tasa de acierto y tamaño actual"""
+        total = self.aciertos + self.fallos
+        return {
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "tasa_aciertos": self.aciertos / total if total else 0.0,
+            "entradas": len(self.entradas),
+        }
+
+# Base de conocimientos externa: se edita en JSON y se puede compilar a un binario con los índices ya calculados
+RUTA_CONOCIMIENTOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "conocimientos_orguebot.json")
+MAGIA_COMPILADO = b"ORGUEKB\x01"
+VERSION_COMPILADO = 7
+# Cabecera: magia, versión, número de cadenas distintas y longitud del contenido que la sigue
+CABECERA_COMPILADO = "<8sIIQ"
+
+def precalcular_respuestas(conocimientos):
+    """Calcula las formas en minúsculas y las palabras de cada respuesta, que los motores usan en cada búsqueda"""
+    respuestas = [respuesta for respuestas in conocimientos.values() for respuesta in respuestas]
+    return {
+        "minusculas": {respuesta: respuesta.lower() for respuesta in respuestas},
+        "tokens": {respuesta: tokenizar_palabras(respuesta) for respuesta in respuestas},
+    }
+
+def ruta_compilada(ruta):
+    """Ruta del archivo compilado que acompaña a una base de conocimientos JSON"""
+    return os.path.splitext(ruta)[0] + ".kb"
+
+def ruta_indice_semantico(ruta):
+    """Prefijo de los vectores del motor semántico que acompañan a una base de conocimientos JSON"""
+    return os.path.splitext(ruta)[0] + ".semantico"
+
+def _firma_archivo(ruta):
+    """Fecha de modificación y tamaño de un archivo, o None si no existe"""
+    try:
+        estado = os.stat(ruta)
+    except OSError:
+        return None
+    return (estado.st_mtime_ns, estado.st_size)
+
+def firma_conocimientos(ruta):
+    """Firma de la base de conocimientos y de su versión compilada, para detectar cambios"""
+    return (_firma_archivo(ruta), _firma_archivo(ruta_compilada(ruta)))
+
+class BaseConocimientos:
+    """Conocimientos, mensajes y estructuras precalculadas del bot, cargados de un archivo externo"""
+    def __init__(self, datos, precalculado=None, indice_categorias=None, escaner=None, indice_difuso=None,
+                 indice_entidades=None, firma=None):
+        self.datos = datos
+        self.conocimientos = datos["conocimientos"]
+        self.mensajes = datos["mensajes"]
+        self.easter_eggs = datos["easter_eggs"]
+        self.categorias_palabras = datos["categorias_palabras"]
+        self.palabras_alta_relevancia = datos["palabras_alta_relevancia"]
+        self.palabras_clave_categoria = datos["palabras_clave_categoria"]
+        # Refuerzos para preguntas concretas: (categoría, palabras en la pregunta, palabras en la respuesta)
+        self.reglas_refuerzo = [
+            (regla["categoria"], regla["palabras_pregunta"], regla["palabras_respuesta"])
+            for regla in datos["reglas_refuerzo"]
+        ]
+        self.precalculado = precalculado if precalculado is not None else precalcular_respuestas(self.conocimientos)
+        if indice_categorias is None:
+            indice_categorias = IndiceCategorias(self.categorias_palabras, self.palabras_alta_relevancia)
+        self.indice_categorias = indice_categorias
+        if indice_difuso is None:
+            palabras_clave = list(indice_categorias.claves_exactas)
+            palabras_clave += [palabra for palabras in self.palabras_clave_categoria.values() for palabra in palabras]
+            # Una palabra vacía que es palabra clave ("cuando") no se busca con erratas: "cuanto" no es "cuando"
+            palabras_clave = [palabra for palabra in palabras_clave if palabra not in STOPWORDS_ES]
+            palabras_conocidas = {token for tokens in self.precalculado["tokens"].values() for token in tokens} | STOPWORDS_ES
+            indice_difuso = IndiceDifuso(palabras_clave, palabras_conocidas)
+        self.indice_difuso = indice_difuso
+        if indice_entidades is None:
+            indice_entidades = IndiceEntidades(datos.get("entidades", {}), self.conocimientos, self.precalculado["minusculas"])
+        self.indice_entidades = indice_entidades
+        if escaner is None:
+            escaner = EscanerMensajes(self.easter_eggs, indice_categorias.claves_exactas, entidades=indice_entidades.formas)
+        self.escaner = escaner
+        self.firma = firma
+
+def _leer_json(ruta):
+    """Lee la base de conocimientos editable"""
+    with open(ruta, 'r', encoding='utf-8') as archivo:
+        return BaseConocimientos(json.load(archivo))
+
+def cargar_base_conocimientos(ruta=RUTA_CONOCIMIENTOS):
+    """Carga la versión compilada si está al día con el JSON; si no, el JSON"""
+    firma = firma_conocimientos(ruta)
+    firma_json, firma_compilada = firma
+    base = None
+    if firma_compilada is not None and (firma_json is None or firma_compilada[0] >= firma_json[0]):
+        try:
+            base = _leer_compilado(ruta_compilada(ruta))
+        except Exception as e:
+            print(f"Error al leer {ruta_compilada(ruta)}: {e}")
+    if base is None:
+        base = _leer_json(ruta)
+    base.firma = firma
+    return base
+
+def _compartir_cadenas(valor, cadenas):
+    """Hace que las cadenas iguales sean el mismo objeto, para guardarlas (y cargarlas) una sola vez"""
+    if isinstance(valor, str):
+        return cadenas.setdefault(valor, valor)
+    if isinstance(valor, dict):
+        return {_compartir_cadenas(clave, cadenas): _compartir_cadenas(elemento, cadenas) for clave, elemento in valor.items()}
+    if isinstance(valor, (list, tuple, set, frozenset)):
+        return type(valor)(_compartir_cadenas(elemento, cadenas) for elemento in valor)
+    return valor
+
+def compilar_conocimientos(origen=RUTA_CONOCIMIENTOS, destino=None):
+    """Genera el archivo compilado: cadenas únicas, minúsculas, palabras e índices ya calculados
+
+    Solo se guardan datos (dicts, listas, tuplas, conjuntos y cadenas), nunca instancias: el archivo no depende
+    de cómo se importó este módulo (como OrgueBot o como __main__ desde la línea de comandos).
+    """
+    import pickle
+    import struct
+    destino = destino if destino is not None else ruta_compilada(origen)
+    base = _leer_json(origen)
+    cadenas = {}
+    contenido = pickle.dumps(_compartir_cadenas({
+        "datos": base.datos,
+        "precalculado": base.precalculado,
+        "indice_categorias": base.indice_categorias.estado(),
+        "escaner": base.escaner.estado(),
+        "indice_difuso": base.indice_difuso.estado(),
+        "indice_entidades": base.indice_entidades.estado(),
+    }, cadenas), protocol=pickle.HIGHEST_PROTOCOL)
+    cabecera = struct.pack(CABECERA_COMPILADO, MAGIA_COMPILADO, VERSION_COMPILADO, len(cadenas), len(contenido))
+
+    # Escribir en un temporal y renombrar: los procesos que recargan nunca ven un archivo a medias
+    temporal = destino + ".tmp"
+    with open(temporal, 'wb') as archivo:
+        archivo.write(cabecera)
+        archivo.write(contenido)
+    os.replace(temporal, destino)
+    return destino
+
+def _cargar_datos_compilados(contenido):
+    """pickle.loads que rechaza cualquier clase o función: el archivo compilado solo contiene datos
+
+    Así un .kb manipulado no puede ejecutar código al cargarse. Aun así, no copies archivos .kb de origen
+    desconocido: compílalos a partir de su JSON.
+    """
+    import io
+    import pickle
+
+    class CargadorDatos(pickle.Unpickler):
+        def find_class(self, modulo, nombre):
+            raise pickle.UnpicklingError(f"el archivo compilado solo puede contener datos, no {modulo}.{nombre}")
+
+    return CargadorDatos(io.BytesIO(contenido)).load()
+
+def _leer_compilado(ruta):
+    """Lee el archivo compilado; cada proceso construye sus propios objetos a partir de él
+
+    No se comparte entre procesos: los trabajadores del servidor pre-fork heredan del proceso principal la base
+    ya cargada (copia-en-escritura) y solo vuelven a leer el archivo al recargar los conocimientos.
+    """
+    import struct
+    tam_cabecera = struct.calcsize(CABECERA_COMPILADO)
+    with open(ruta, 'rb') as archivo:
+        cabecera = archivo.read(tam_cabecera)
+        if len(cabecera) < tam_cabecera:
+            raise ValueError("archivo compilado incompleto")
+        magia, version, _, tam_contenido = struct.unpack(CABECERA_COMPILADO, cabecera)
+        if magia != MAGIA_COMPILADO or version != VERSION_COMPILADO:
+            raise ValueError("formato de archivo compilado no reconocido")
+        contenido = archivo.read(tam_contenido)
+    if len(contenido) < tam_contenido:
+        raise ValueError("archivo compilado incompleto")
+    contenido = _cargar_datos_compilados(contenido)
+    return BaseConocimientos(
+        contenido["datos"],
+        precalculado=contenido["precalculado"],
+        indice_categorias=IndiceCategorias.desde_estado(contenido["indice_categorias"]),
+        escaner=EscanerMensajes.desde_estado(contenido["escaner"]),
+        indice_difuso=IndiceDifuso.desde_estado(contenido["indice_difuso"]),
+        indice_entidades=IndiceEntidades.desde_estado(contenido["indice_entidades"]),
+    )
+
+# Palabras que indican que un mensaje sigue el tema anterior ("¿y quién más?", "¿dónde tocaba él?")
+PALABRAS_ALTERNATIVA = frozenset(["otro", "otra", "otros", "otras", "también", "además"])
+# Solo pronombres que remiten a alguien ya nombrado: "esta", "su" o "lo" aparecen en cualquier pregunta
+PALABRAS_REFERENCIA = frozenset(["él", "ella", "ellos", "ellas", "allí", "allá"])
+PALABRAS_CONTINUACION = frozenset(["y", "e"])
+# Lo que queda de un seguimiento sin contar estas palabras tiene que ser del tema anterior
+PALABRAS_SEGUIMIENTO = (PALABRAS_ALTERNATIVA | PALABRAS_REFERENCIA | PALABRAS_CONTINUACION | STOPWORDS_ES
+                        | frozenset(["más", "qué", "quién", "quiénes", "cómo", "cuál", "cuáles", "cuándo", "dónde"]))
+
+class ContextoConversacion:
+    """Ventana de lo último que se habló en una sesión: entidades mencionadas y respuestas ya dadas"""
+    TAM_VENTANA = 5
+
+    def __init__(self, tam_ventana=TAM_VENTANA):
+        # La última entidad de la ventana es la mencionada más recientemente
+        self.entidades = deque(maxlen=tam_ventana)
+        self.respuestas = deque(maxlen=tam_ventana)
+
+    def recordar(self, entidades, respuesta=None):
+        """Añade las entidades mencionadas (de menos a más reciente) y la respuesta dada"""
+        for entidad in entidades:
+            if entidad in self.entidades:
+                self.entidades.remove(entidad)
+            self.entidades.append(entidad)
+        if respuesta is not None:
+            self.respuestas.append(respuesta)
+
+    def ultima_entidad(self):
+        """Entidad mencionada más recientemente, o None"""
+        return self.entidades[-1] if self.entidades else None
+
+class SesionOrgueBot:
+    """Estado de una conversación con un usuario, separado del conocimiento compartido del bot"""
     def __init__(self):
-        # Inicialización
-        self.memoria = OrgueBotMemoria()
-        self.cargar_conocimientos()
         self.conversacion_actual = []
+        # ContextoConversacion, creado con la primera respuesta
         self.contexto_actual = None
         self.ultima_categoria = None
-        self.stopwords = set(stopwords.words('spanish'))
         self.modo_divertido = False
         self.contador_preguntas = 0
+
+def _atributo_de_sesion(nombre):
+    """Propiedad que redirige un atributo del bot a su sesión por defecto"""
+    def obtener(self):
+        return getattr(self.sesion, nombre)
+    def asignar(self, valor):
+        setattr(self.sesion, nombre, valor)
+    return property(obtener, asignar)
+
+class OrgueBot:
+    """Clase principal del chatbot especializado en órganos musicales"""
+    # El estado de la conversación vive en una SesionOrgueBot; el bot solo guarda el conocimiento
+    conversacion_actual = _atributo_de_sesion("conversacion_actual")
+    contexto_actual = _atributo_de_sesion("contexto_actual")
+    ultima_categoria = _atributo_de_sesion("ultima_categoria")
+    modo_divertido = _atributo_de_sesion("modo_divertido")
+    contador_preguntas = _atributo_de_sesion("contador_preguntas")
+    # Puntuación de la categoría anterior a partir de la cual una pregunta sigue en el mismo tema
+    UMBRAL_SEGUIMIENTO = 1.0
+    # Puntuación mínima para dar una categoría a la pregunta
+    UMBRAL_CATEGORIA = 0.5
+    # Desde cuántas preguntas se categorizan todas con puntuar_lote en vez de una a una
+    MIN_LOTE_VECTORIAL = 16
+    # Mensajes cuyo escaneo se recuerda (en un lote se consultan dos veces: categoría y easter eggs)
+    MAX_ESCANEOS = 1024
+    # Etapas de una respuesta que mide Instrumentacion.instrumentar (método -> etapa)
+    ETAPAS_INSTRUMENTADAS = {
+        "responder_pregunta": "responder_pregunta",
+        "responder_lote": "responder_lote",
+        "verificar_easter_eggs": "easter_eggs",
+        "_escanear": "escanear",
+        "_resolver_seguimiento": "seguimiento",
+        "_analizar_sin_cache": "analizar",
+        "_corregir_preguntas": "corregir",
+        "_categoria": "categorizar",
+        "_categorias": "categorizar_lote",
+        "_buscar_respuestas": "buscar_respuesta",
+    }
+
+    def __init__(self, motor_respuestas="secuencia", memoria=None, tam_cache=1024, ttl_cache=None,
+                 ruta_conocimientos=RUTA_CONOCIMIENTOS, intervalo_recarga=None, instrumentacion=None):
+        # Inicialización
+        self.memoria = memoria if memoria is not None else OrgueBotMemoria()
+        # Sin instrumentación los métodos no se tocan: medir no cuesta nada si no se pide
+        self.instrumentacion = instrumentacion
+        if instrumentacion is not None:
+            instrumentacion.instrumentar(self)
+            instrumentacion.instrumentar(self.memoria)
+        self.motor_respuestas = motor_respuestas
+        self.cache_respuestas = CacheRespuestas(tam_cache, ttl_cache, instrumentacion)
+        self.ruta_conocimientos = ruta_conocimientos
+        # Segundos entre comprobaciones de cambios en la base de conocimientos (None: sin recarga en caliente)
+        self.intervalo_recarga = intervalo_recarga
+        self._ultima_comprobacion = time.monotonic()
+        self.cargar_conocimientos()
+        self.sesion = SesionOrgueBot()
+        self.stopwords = STOPWORDS_ES
         
     def cargar_conocimientos(self):
-        """Carga la base de conocimientos"""
-        # Base de conocimientos en español
-        self.conocimientos = {
-            "historia": [
-                "El órgano es uno de los instrumentos más antiguos que sigue en uso. Sus orígenes se remontan al siglo III a.C. con el hydraulis griego. 🎹",
-                "Los órganos de tubos modernos empezaron a aparecer en las iglesias europeas alrededor del siglo VIII. ⛪",
-                "El período barroco (1600-1750) se considera la edad de oro de la música para órgano, con compositores como Bach llevando el instrumento a su máxima expresión. 🎼",
-                "En el siglo XIX, los órganos se volvieron más grandes y versátiles, incorporando nuevos registros y mecanismos. 🔧",
-                "El órgano Hammond fue inventado en 1935 por Laurens Hammond como una alternativa económica a los órganos de tubos para iglesias. 💰",
-                "¿Sabías que el primer órgano documentado en España llegó como regalo del emperador bizantino Constantino V al rey Pipino el Breve en el año 757? 📜",
-                "Durante la Revolución Francesa, muchos órganos fueron destruidos por considerarse símbolos del antiguo régimen. ¡Menos mal que no todos corrieron esa suerte! 🇫🇷",
-                "El órgano más antiguo del mundo que todavía funciona está en la Basílica de Valère en Sion, Suiza, y data de alrededor de 1435. ¡Casi 600 años sonando! 🇨🇭",
-            ],
-            "compositores": [
-                "Johann Sebastian Bach es considerado el más grande compositor para órgano. Sus obras incluyen la Toccata y Fuga en Re menor y los Preludios Corales. 👑",
-                "Dietrich Buxtehude fue una gran influencia para Bach. Sus obras para órgano incluyen preludios, fugas y chaconas. 🎵",
-                "César Franck revitalizó la música de órgano en Francia durante el siglo XIX con obras como sus Tres Corales. 🇫🇷",
-                "Olivier Messiaen creó un lenguaje musical único para órgano en el siglo XX, con obras como 'La Nativité du Seigneur'. 🌟",
-                "Felix Mendelssohn contribuyó significativamente al repertorio con sus Sonatas para órgano, ayudando a revivir el interés por Bach. 📚",
-                "Charles-Marie Widor es famoso por su 'Toccata' de la Quinta Sinfonía para órgano, una pieza frecuente en bodas. 💒",
-                "Louis Vierne, organista ciego de Notre-Dame de París, murió en 1937 mientras daba un recital en su amado órgano. ¡Un final dramático para un gran músico! 🎭",
-                "Max Reger escribió algunas de las obras más complejas para órgano, con armonías cromáticas y estructuras contrapuntísticas densas. ¡Todo un desafío! 🧩",
-                "Antonio de Cabezón, organista ciego español del siglo XVI, fue pionero en la música para teclado y una gran influencia en toda Europa. ¡Orgullo español! 🇪🇸",
-                "¿Sabías que Mozart llamaba al órgano 'el rey de los instrumentos'? Aunque no compuso mucho para él, lo admiraba enormemente. 👑",
-            ],
-            "estructura": [
-                "Un órgano de tubos consta principalmente de tubos, consolas con teclados y pedales, y un sistema para suministrar aire a los tubos. 🎛️",
-                "Los teclados manuales del órgano se llaman 'manuales', y un órgano puede tener desde uno hasta siete de ellos. 🎹",
-                "El pedalero es un teclado tocado con los pies, generalmente con 30-32 teclas, y controla los sonidos más graves. 👣",
-                "Los registros son conjuntos de tubos con un timbre particular. Pueden simular diferentes instrumentos o crear sonidos únicos del órgano. 🎺",
-                "Los tubos pueden ser labiales (como una flauta) o de lengüeta (con una vibración de caña), creando diferentes timbres. 🎵",
-                "El 'secreto' es la cámara de aire presurizado que distribuye el viento a los tubos cuando se presionan las teclas. ¡Es el corazón del órgano! 💨",
-                "La tracción es el sistema que conecta las teclas con las válvulas que permiten el paso del aire a los tubos. Puede ser mecánica, neumática, eléctrica o combinada. ⚡",
-                "Algunos órganos gigantes tienen tubos tan grandes que podrían caber una persona dentro. El más grande puede medir hasta 19 metros de altura. ¡Imagina el sonido! 📏",
-                "Los tubos de órgano se fabrican principalmente con aleaciones de estaño y plomo, aunque también pueden ser de madera, cobre o incluso bambú. 🪵",
-                "Los 'tiradores' o 'registros' son los controles que el organista utiliza para seleccionar qué juegos de tubos sonarán. Un órgano grande puede tener más de 100. 🎚️",
-            ],
-            "tecnica": [
-                "La técnica del órgano difiere del piano: no hay dinámica por presión, se debe controlar la articulación y usar registros para variar la intensidad. 🎯",
-                "El 'toque legato' es fundamental en la interpretación del órgano, especialmente en música romántica y moderna. ✨",
-                "La registración es el arte de seleccionar y combinar los diferentes registros para lograr el color tonal deseado. 🎨",
-                "La técnica de pedaleo requiere años de práctica para dominar movimientos como el 'talón-punta' y cruces de pies. 🦶",
-                "La improvisación ha sido históricamente una habilidad esencial para los organistas, especialmente en contextos litúrgicos. 🎶",
-                "Un buen organista debe poder leer tres pentagramas simultáneamente: dos para las manos y uno para los pies. ¡Todo un desafío de coordinación! 👀",
-                "El 'appoggiatura' es un adorno muy utilizado en la música barroca para órgano que consiste en una nota rápida antes de la nota principal. 🎭",
-                "La técnica de 'staccato' en órgano es más compleja que en piano, pues depende no solo de cómo se toca la tecla sino también de la acústica del espacio. 🏛️",
-                "En la interpretación de Bach, se debate entre un toque más articulado (al estilo barroco) o más legato (como en la tradición romántica). ¿Tú cuál prefieres? 🤔",
-                "La técnica de pedaleo 'talón-punta' fue desarrollada en el siglo XIX y permite mayor agilidad con los pies que las técnicas antiguas. 💃",
-            ],
-            "organos_famosos": [
-                "El órgano Cavaillé-Coll de Saint-Sulpice en París es uno de los instrumentos más grandes y prestigiosos del mundo. 🇫🇷",
-                "El órgano de la Catedral de Notre-Dame en París es históricamente significativo y ha sido tocado por grandes músicos como Louis Vierne. 🔔",
-                "El órgano Wanamaker en Filadelfia es el órgano de tubos funcional más grande del mundo, con más de 28,000 tubos. 🇺🇸",
-                "El órgano Silbermann de la Iglesia de Santo Tomás en Leipzig es famoso por su asociación con J.S. Bach. 🇩🇪",
-                "El órgano de la Mezquita-Catedral de Córdoba es uno de los más importantes de España, construido por el famoso organero José Martínez Colmenero. 🇪🇸",
-                "El órgano del Royal Albert Hall de Londres, apodado 'La Voz de Júpiter', es uno de los más grandes del mundo con 9,999 tubos. ¿Por qué no 10,000? ¡Dicen que fue para evitar impuestos adicionales! 💷",
-                "El órgano de bambú de Las Piñas, Filipinas, es único en el mundo porque sus tubos están hechos de bambú en lugar de metal. ¡Sonido exótico garantizado! 🎍",
-                "El órgano de la Basílica de Mafra en Portugal tiene seis órganos que pueden tocarse simultáneamente. ¡Menudo espectáculo sonoro! 🇵🇹",
-                "El llamado 'órgano de estalactitas' en Virginia, EE.UU., no es un órgano tradicional sino una formación rocosa que suena al ser golpeada. ¡La naturaleza también crea instrumentos! 🗿",
-                "El órgano de la Sydney Opera House en Australia tiene 10,154 tubos y su construcción tardó 10 años. ¡Vale la pena escucharlo si visitas el país! 🦘",
-            ],
-            "musica_liturgica": [
-                "El órgano ha sido el instrumento principal en la música litúrgica cristiana durante siglos. ⛪",
-                "En la tradición católica, el órgano acompaña cantos, proporciona música para momentos de reflexión y marca momentos importantes de la liturgia. 🙏",
-                "En las iglesias protestantes, especialmente luteranas, el órgano acompaña himnos congregacionales y corales. 📖",
-                "El año litúrgico (Adviento, Navidad, Cuaresma, Pascua, etc.) tiene música específica para órgano asociada a cada temporada. 📅",
-                "Muchos compositores han escrito colecciones de piezas para cubrir las necesidades del año litúrgico, como el 'Orgelbüchlein' de Bach. 📚",
-                "Durante el Concilio Vaticano II (1962-1965) se discutió el papel del órgano en la liturgia, reafirmando su importancia pero abriendo la puerta a otros instrumentos. 🎸",
-                "El canto gregoriano a menudo se alterna con versos de órgano en lo que se llama 'alternatim practice', una tradición que se remonta al siglo XV. 📜",
-                "El Improperium es una forma específica de improvisación organística durante la liturgia del Viernes Santo. ✝️",
-                "En algunas tradiciones, el órgano guarda silencio durante la Cuaresma para regresar gloriosamente en la Vigilia Pascual. 🌅",
-                "Los 'versos de órgano' son piezas cortas que sustituyen versos cantados del Magnificat o de los salmos en la liturgia. 🎵",
-            ],
-            "mantenimiento": [
-                "Los órganos de tubos requieren afinación regular, especialmente cuando cambian las temperaturas estacionales. 🔧",
-                "La humedad es un factor crítico para los órganos de tubos: muy poca puede agrietar la madera, demasiada puede causar oxidación. 💧",
-                "Los órganos históricos a menudo mantienen su entonación original, que puede ser diferente del estándar moderno A=440Hz. 🎵",
-                "El mantenimiento preventivo incluye limpieza de polvo, ajuste de mecanismos y revisión de fugas de aire. 🧹",
-                "La restauración de órganos históricos es una especialidad que combina conocimientos de música, historia, artesanía y conservación. 🏺",
-                "Los fuelles de un órgano antiguo solían requerir personas que los accionaran manualmente durante todo el concierto o servicio. ¡Un trabajo agotador! 💪",
-                "La polilla puede ser un enemigo mortal para los órganos con piezas de madera. ¡Algunos organeros utilizan tratamientos especiales para protegerlos! 🦋",
-                "Cada tubo debe ser afinado individualmente, lo que significa que un órgano grande puede requerir varios días para una afinación completa. ⏱️",
-                "El temperamento igual, usado en pianos modernos, no siempre se aplica en órganos históricos que pueden usar temperamentos mesotónicos u otros sistemas de afinación. 🧮",
-                "El polvo es uno de los mayores enemigos del órgano, ya que puede entrar en los tubos y cambiar su sonido. Algunos órganos modernos incorporan filtros de aire. 🌬️",
-            ],
-            "curiosidades": [
-                "El órgano más pesado del mundo es el de la Catedral de Liverpool, con más de 32,000 tubos y un peso de unas 250 toneladas. ¡Como 40 elefantes! 🐘",
-                "La nota más grave de un órgano puede ser tan baja que no se oye sino que se siente como una vibración. ¡Literalmente te sacude! 📳",
-                "En la Edad Media, algunos órganos tenían teclas tan grandes que debían ser golpeadas con los puños o los codos. ¡No era un instrumento para delicados! 👊",
-                "El órgano de agua romano (hydraulis) usaba agua para regular la presión del aire. ¡Una ingeniería avanzada para la época! 💦",
-                "Algunos órganos históricos contienen metales preciosos como el oro y la plata en sus tubos para obtener timbres específicos. 💎",
-                "El 'Hallelujah Chorus' de Händel a menudo se toca con órgano, aunque originalmente fue compuesto para orquesta y coro. 🎭",
-                "En algunos países, los organistas tienen que aprobar exámenes oficiales para poder tocar en iglesias importantes. ¡Nada de aficionados! 📝",
-                "En la época barroca, el organista a menudo también dirigía el coro y la orquesta desde el órgano. ¡Un verdadero multitasking! 🧠",
-                "El aire que entra en los tubos del órgano debe ser perfectamente limpio. Incluso una partícula pequeña puede cambiar el sonido de un tubo. 🌬️",
-                "Algunos tubos de órgano están hechos de madera y pueden tener forma cuadrada en lugar de cilíndrica. ¡La forma afecta al sonido! 📦",
-            ]
-        }
+        """Carga la base de conocimientos desde el archivo externo (o su versión compilada)"""
+        self._aplicar_base(cargar_base_conocimientos(self.ruta_conocimientos))
+    
+    def _aplicar_base(self, base):
+        """Sustituye los conocimientos del bot por los de una BaseConocimientos"""
+        self.base_conocimientos = base
+        self.conocimientos = base.conocimientos
+        self.mensajes = base.mensajes
+        self.easter_eggs = base.easter_eggs
+        self.categorias_palabras = base.categorias_palabras
+        self.palabras_alta_relevancia = base.palabras_alta_relevancia
+        self.palabras_clave_categoria = base.palabras_clave_categoria
+        self.reglas_refuerzo = base.reglas_refuerzo
         
-        # Mensajes del sistema
-        self.mensajes = {
-            "saludos": [
-                "¡Bienvenido al Chatbot del Órgano! ¿En qué puedo ayudarte hoy? 🎹",
-                "¡Hola! Soy el asistente virtual especializado en órganos musicales. ¿Qué te gustaría saber? 🎵",
-                "Bienvenido al mundo del órgano. ¿Tienes alguna pregunta sobre este magnífico instrumento? 🎼",
-                "¡Saludos! Estoy aquí para compartir conocimientos sobre el órgano y su música. ¿Qué te interesa saber? 🎶",
-                "¡Hola organófilo! ¿Listo para explorar el fascinante mundo de los órganos musicales? 🎭"
-            ],
-            "despedidas": [
-                "¡Gracias por conversar sobre órganos! Espero haberte ayudado. ¡Hasta pronto! 👋",
-                "Ha sido un placer compartir información sobre este maravilloso instrumento. ¡Vuelve pronto! 🎵",
-                "Espero que hayas aprendido algo nuevo sobre el órgano hoy. ¡Hasta la próxima! 📚",
-                "¡Adiós! Si tienes más preguntas sobre el órgano, no dudes en volver a consultarme. 🎹",
-                "¡Que tus días estén llenos de música! ¡Hasta pronto! 🎶"
-            ],
-            "no_info": [
-                "Lo siento, no tengo información específica sobre eso. ¿Hay algo más sobre órganos que te gustaría saber? 🤔",
-                "Esa es una pregunta interesante, pero no tengo datos precisos al respecto. ¿Puedo ayudarte con otro aspecto del órgano? 📝",
-                "No dispongo de esa información en mi base de conocimientos. ¿Te interesa saber sobre la historia, compositores o técnica del órgano? 📚",
-                "No tengo detalles sobre eso, pero puedo informarte sobre la estructura del órgano, compositores famosos o técnicas de interpretación. 🧐",
-                "Mmm... esa pregunta se sale de mi registro. ¿Quieres probar con otra? 🎵"
-            ],
-            "sugerencias": "Si no sabes qué preguntar, estas son algunas preguntas populares:",
-            "ayuda": "Puedes preguntarme sobre historia, compositores, estructura, técnica, órganos famosos, música litúrgica, mantenimiento u otras curiosidades del órgano. También puedo contarte algún dato curioso aleatorio si escribes 'dato curioso'.",
-            "modo_divertido_on": "¡Modo divertido activado! 🎭 Prepárate para respuestas con más ritmo y melodía.",
-            "modo_divertido_off": "Modo divertido desactivado. Volvemos a la seriedad del órgano. 🎹",
-            "datos_curiosos": [
-                "¿Sabías que el órgano de la Catedral de Passau en Alemania tiene 17,974 tubos y 233 registros? ¡Es uno de los órganos de iglesia más grandes del mundo! 🏆",
-                "En la antigüedad, se necesitaban hasta 12 personas para accionar los fuelles de un órgano grande. ¡Todo un equipo de 'sopladores'! 💨",
-                "El organista Johann Ludwig Krebs fue alumno de Bach. Su apellido significa 'cangrejo' en alemán, y Bach bromeaba: '¡Es el único cangrejo en mi arroyo!' 🦀",
-                "Algunos órganos tienen tubos hechos de madera de más de 500 años de antigüedad que siguen funcionando perfectamente. ¡Una longevidad impresionante! 🌳",
-                "¿Te imaginas tocar 7 teclados a la vez? El órgano Atlantic City Convention Hall tiene ese número de manuales. ¡Necesitarías ser un pulpo! 🐙",
-                "Mozart escribió música para un instrumento llamado 'Orgelwalze', un tipo de órgano mecánico similar a una caja de música. 🎡",
-                "El órgano de la abadía de Weingarten en Alemania tiene una fachada tan espectacular que se le conoce como 'el órgano Gabler' en honor a su constructor. ¡Un verdadero tesoro barroco! 🏛️",
-                "El dióxido de carbono exhalado por la congregación en una iglesia puede desafinar los tubos del órgano con el tiempo. ¡Respirar afecta a la música! 😮"
-            ]
-        }
-
-        # Easter eggs
-        self.easter_eggs = {
-            "konami": {
-                "clave": "arriba arriba abajo abajo izquierda derecha izquierda derecha b a",
-                "respuesta": "🎮 ¡CÓDIGO KONAMI ACTIVADO! Acabas de desbloquear el modo organista invencible. Ahora puedes tocar Bach a 200 BPM sin equivocarte. ¡Poderes ilimitados! 🎹🔥",
-                "nombre": "konami_code"
-            },
-            "star_wars": {
-                "clave": "que la fuerza te acompañe",
-                "respuesta": "🎵 *Suena el tema de Star Wars en el órgano* 🚀 El Maestro Yoda dice: 'Tocar el órgano debes, mmm sí. El camino al lado luminoso de la música es.'",
-                "nombre": "jedi_organista"
-            },
-            "toccata": {
-                "clave": "toccata y fuga",
-                "respuesta": "🧛‍♂️ *Relámpagos y truenos* ¡Muahaha! Has invocado al Fantasma de la Ópera y al Conde Drácula simultáneamente. Ambos te piden autógrafos por tu exquisito gusto musical. La Toccata y Fuga en Re menor de Bach es su melodía favorita para hacer entradas dramáticas.",
-                "nombre": "phantom_dracula"
-            },
-            "rickroll": {
-                "clave": "never gonna give you up",
-                "respuesta": "🎵 *El órgano comienza a tocar 'Never Gonna Give You Up'* ¡Has sido ORGANROLLADO! Rick Astley estaría orgulloso de esta versión para órgano de su clásico. 🎹🕺",
-                "nombre": "organroll"
-            },
-            "bach_secret": {
-                "clave": "b a c h",
-                "respuesta": "🎼 *El órgano toca la secuencia de notas Si♭-La-Do-Si♮* ¡Has descubierto el motivo BACH! En notación alemana, estas notas deletrean B-A-C-H. El propio Johann Sebastian usó este motivo en sus composiciones. ¡Eres un verdadero conocedor! 👏",
-                "nombre": "motivo_bach"
-            }
-        }
+        # Índice invertido construido una sola vez (o leído del archivo compilado) para categorizar preguntas
+        self.indice_categorias = base.indice_categorias
         
-        self.categorias_palabras = {
-            "historia": ["historia", "origen", "antiguo", "evolución", "histórico", "cuando", "comenzó", "inventó", "creó", "surgió", "primero", "antigüedad", "inicios", "principio"],
-            "compositores": ["compositor", "bach", "buxtehude", "franck", "messiaen", "mendelssohn", "músico", "autor", "escribió", "compuso", "famosos", "importantes", "reconocidos", "grandes", "obras"],
-            "estructura": ["estructura", "parte", "tubo", "consola", "manual", "pedal", "registro", "construcción", "diseño", "componente", "conformado", "construido", "hecho", "organizado", "compuesto"],
-            "tecnica": ["técnica", "tocar", "interpretar", "ejecución", "pedal", "digitación", "registración", "método", "práctica", "estudio", "aprender", "básicas", "principiantes", "iniciación", "ejecutar"],
-            "organos_famosos": ["famoso", "importante", "grande", "catedral", "iglesia", "notre dame", "wanamaker", "conocido", "monumental", "impresionante", "popular", "reconocido", "destacado", "célebres", "renombrados", "mundo"],
-            "musica_liturgica": ["liturgia", "misa", "iglesia", "religioso", "servicio", "culto", "ceremonia", "ritual", "sagrado", "eclesiástico", "religión", "católico", "protestante", "celebración"],
-            "mantenimiento": ["mantener", "afinar", "restaurar", "conservar", "reparar", "cuidar", "preservar", "ajustar", "limpiar", "renovar", "cuidado", "conservación", "requiere", "necesita"],
-            "curiosidades": ["curioso", "interesante", "insólito", "extraño", "sorprendente", "dato", "sabías", "impactante", "anécdota", "fascinante", "curiosidad", "asombroso", "cuéntame", "sabes"]
-        }
+        # Autómata con todos los patrones que se buscan en los mensajes y sus últimos resultados
+        self.escaner = base.escaner
+        self._escaneos = {}
+        self._vocabularios = {}
+        
+        # Palabras clave que se reconocen aunque estén mal escritas
+        self.indice_difuso = base.indice_difuso
+        
+        # Compositores y órganos famosos, para seguir el hilo de la conversación
+        self.indice_entidades = base.indice_entidades
+        
+        # Motor de búsqueda de respuestas dentro de una categoría
+        self.motor = crear_motor_respuestas(self.motor_respuestas, self.conocimientos, self.palabras_clave_categoria,
+                                            self.reglas_refuerzo, base.precalculado,
+                                            ruta_indice_semantico(self.ruta_conocimientos))
+        
+        # Las respuestas guardadas en caché dejan de ser válidas con los nuevos conocimientos
+        self.cache_respuestas.limpiar()
+    
+    def recargar_si_cambio(self):
+        """Vuelve a cargar la base de conocimientos si su archivo cambió; devuelve si se recargó"""
+        firma = firma_conocimientos(self.ruta_conocimientos)
+        if firma == self.base_conocimientos.firma:
+            return False
+        try:
+            self._aplicar_base(cargar_base_conocimientos(self.ruta_conocimientos))
+        except (OSError, ValueError, KeyError) as e:
+            # Se sigue respondiendo con los conocimientos anteriores hasta que el archivo vuelva a cambiar
+            print(f"Error al recargar conocimientos: {e}")
+            self.base_conocimientos.firma = firma
+            return False
+        return True
+    
+    def _comprobar_recarga(self):
+        """Comprueba si hay que recargar los conocimientos, como mucho una vez cada intervalo_recarga segundos"""
+        if self.intervalo_recarga is None:
+            return
+        ahora = time.monotonic()
+        if ahora - self._ultima_comprobacion >= self.intervalo_recarga:
+            self._ultima_comprobacion = ahora
+            self.recargar_si_cambio()
     
     def _preprocesar_texto(self, texto):
         """Preprocesa el texto para análisis"""
         # Tokenización y filtrado de stopwords
-        tokens = word_tokenize(texto.lower())
+        tokens = PATRON_TOKENS.findall(texto.lower())
         return [token for token in tokens if token not in self.stopwords]
     
-    def _calcular_similitud(self, texto1, texto2):
-        """Calcula la similitud entre dos textos"""
-        return SequenceMatcher(None, texto1.lower(), texto2.lower()).ratio()
+    def _buscar_respuesta(self, pregunta, categoria):
+        """Devuelve la respuesta más relevante de la categoría o None si ninguna supera el umbral"""
+        mejor_respuesta, mejor_similitud = self.motor.buscar(pregunta, categoria)
+        return mejor_respuesta if mejor_similitud > self.motor.umbral else None
+    
+    def _buscar_respuestas(self, preguntas, categorias):
+        """Mejor respuesta y puntuación para cada pregunta en su categoría, con una sola llamada al motor"""
+        return self.motor.buscar_lote(preguntas, categorias)
     
     def _encontrar_respuesta_relevante(self, pregunta, categoria):
         """Encuentra la respuesta más relevante dentro de una categoría"""
-        mejor_similitud = 0
-        mejor_respuesta = None
-        
-        # Palabras clave específicas por categoría para mejorar la búsqueda
-        palabras_clave_categoria = {
-            "historia": ["origen", "historia", "antiguo", "antigüedad", "comenzó", "inventó"],
-            "compositores": ["bach", "compositor", "escribieron", "compusieron", "famosos"],
-            "estructura": ["estructura", "construido", "compuesto", "partes", "tubos", "cómo funciona"],
-            "tecnica": ["técnicas", "tocar", "interpretar", "básicas", "aprender", "principiantes"],
-            "organos_famosos": ["famosos", "conocidos", "importantes", "mundo", "grandes"],
-            "musica_liturgica": ["liturgia", "religiosa", "misa", "iglesia", "ceremonia"],
-            "mantenimiento": ["mantenimiento", "cuidado", "conservación", "reparación", "requiere"],
-            "curiosidades": ["curiosidad", "dato", "interesante", "curioso", "sabías"]
-        }
-        
-        # Priorizar respuestas relevantes basadas en palabras clave específicas
-        palabras_pregunta = pregunta.lower().split()
-        
-        for respuesta in self.conocimientos[categoria]:
-            # Calcular similitud directa
-            similitud = self._calcular_similitud(pregunta, respuesta)
-            
-            # Aumentar similitud si contiene palabras clave relevantes
-            for palabra in palabras_clave_categoria.get(categoria, []):
-                if palabra in pregunta.lower() and palabra in respuesta.lower():
-                    similitud += 0.15
-            
-            # Para preguntas específicas sobre origen/historia
-            if categoria == "historia" and any(p in pregunta.lower() for p in ["origen", "comenzó", "primero", "inicios"]):
-                if any(p in respuesta.lower() for p in ["origen", "antiguo", "siglo III", "hydraulis", "primeros", "comenzó"]):
-                    similitud += 0.3
-            
-            # Para preguntas sobre compositores específicos como Bach
-            if categoria == "compositores" and "bach" in pregunta.lower():
-                if "bach" in respuesta.lower():
-                    similitud += 0.3
-            
-            # Para preguntas sobre estructura o construcción
-            if categoria == "estructura" and any(p in pregunta.lower() for p in ["estructura", "construido", "compuesto"]):
-                if any(p in respuesta.lower() for p in ["consta", "compone", "consiste", "parte"]):
-                    similitud += 0.3
-            
-            if similitud > mejor_similitud:
-                mejor_similitud = similitud
-                mejor_respuesta = respuesta
-        
-        return mejor_respuesta if mejor_similitud > 0.2 else random.choice(self.conocimientos[categoria])
+        respuesta = self._buscar_respuesta(pregunta, categoria)
+        return respuesta if respuesta is not None else random.choice(self.conocimientos[categoria])
 
-    def categorizar_pregunta(self, pregunta):
+    def categorizar_pregunta(self, pregunta, sesion=None):
         """Determina la categoría de la pregunta utilizando NLP"""
-        pregunta_procesada = pregunta.lower()
-        
-        # Inicializar puntuaciones para todas las categorías
-        puntuaciones = {categoria: 0 for categoria in self.categorias_palabras}
+        sesion = sesion if sesion is not None else self.sesion
+        categoria = self._categoria(pregunta)
+        if categoria:
+            sesion.ultima_categoria = categoria
+        return categoria
+    
+    def _categoria(self, pregunta):
+        """Devuelve la categoría con mayor puntuación o None si ninguna supera el umbral mínimo"""
+        puntuaciones = self._puntuaciones(pregunta)
         
-        # Evaluar cada categoría
-        for categoria, palabras_clave in self.categorias_palabras.items():
-            # Comprobar coincidencia exacta con palabras clave (mayor peso)
-            for palabra in palabras_clave:
-                if palabra in pregunta_procesada:
-                    puntuaciones[categoria] += 0.5
-            
-            # Analizar cada palabra en la pregunta (enfoque más sensible)
-            palabras_pregunta = pregunta_procesada.split()
-            for palabra_pregunta in palabras_pregunta:
-                for palabra_clave in palabras_clave:
-                    # Verificar coincidencia parcial
-                    if palabra_pregunta in palabra_clave or palabra_clave in palabra_pregunta:
-                        if len(palabra_pregunta) >= 4:  # Evitar coincidencias con palabras muy cortas
-                            puntuaciones[categoria] += 0.3
-            
-            # Palabras específicas de alta relevancia
-            palabras_alta_relevancia = {
-                "historia": ["origen", "historia", "antigüedad", "comenzó"],
-                "compositores": ["compositor", "bach", "músicos", "famosos"],
-                "estructura": ["estructura", "construido", "compuesto", "partes"],
-                "tecnica": ["técnica", "tocar", "interpretar", "aprender"],
-                "organos_famosos": ["famoso", "más grande", "conocido", "mundo"],
-                "musica_liturgica": ["liturgia", "misa", "iglesia", "religioso"],
-                "mantenimiento": ["mantenimiento", "cuidado", "conservación", "reparación"],
-                "curiosidades": ["curiosidad", "curioso", "dato", "interesante"]
-            }
-            
-            # Añadir puntos extra por palabras de alta relevancia
-            for palabra in palabras_alta_relevancia.get(categoria, []):
-                if palabra in pregunta_procesada:
-                    puntuaciones[categoria] += 1.0
-            
         # Determinar la categoría con mayor puntuación
         mejor_categoria = max(puntuaciones, key=puntuaciones.get)
         puntuacion_maxima = puntuaciones[mejor_categoria]
         
         # Solo devolver la categoría si supera un umbral mínimo
-        if puntuacion_maxima > 0.5:
-            self.ultima_categoria = mejor_categoria
+        if puntuacion_maxima > self.UMBRAL_CATEGORIA:
             return mejor_categoria
         else:
             return None
     
-    def verificar_easter_eggs(self, mensaje):
+    def _puntuaciones(self, pregunta):
+        """Puntuación de cada categoría con el índice precalculado y las palabras clave ya encontradas"""
+        return self.indice_categorias.puntuar(pregunta.lower(), self._escanear(pregunta).claves)
+    
+    def _categorias(self, preguntas):
+        """Categoría de cada pregunta, como _categoria; con numpy, un lote grande se puntúa con productos de matrices"""
+        if len(preguntas) < self.MIN_LOTE_VECTORIAL:
+            return [self._categoria(pregunta) for pregunta in preguntas]
+        try:
+            puntuaciones = self.indice_categorias.puntuar_lote([pregunta.lower() for pregunta in preguntas],
+                                                               [self._escanear(pregunta).claves for pregunta in preguntas])
+        except ImportError:
+            # Sin numpy se puntúa cada pregunta por separado
+            return [self._categoria(pregunta) for pregunta in preguntas]
+        categorias = self.indice_categorias.categorias
+        # argmax se queda con la primera categoría empatada, igual que max sobre el diccionario de puntuaciones
+        mejores = puntuaciones.argmax(axis=1)
+        return [categorias[mejor] if puntuaciones[fila, mejor] > self.UMBRAL_CATEGORIA else None
+                for fila, mejor in enumerate(mejores.tolist())]
+    
+    def _categoria_corregida(self, pregunta, corregida, categoria):
+        """Revisa la categoría de la pregunta con sus erratas corregidas; una errata corregida no basta para darle categoría
+
+        La categoría tiene que puntuar ya algo en la pregunta sin corregir sus erratas (con las tildes puestas);
+        si no, vale la categoría de esa pregunta sin corregir, como "cuanto cuesta" no es "cuando cuesta".
+        """
+        if corregida is pregunta or categoria is None:
+            return categoria
+        sin_erratas = self.indice_difuso.corregir_texto(pregunta, erratas=False)
+        if sin_erratas == corregida or self._puntuaciones(sin_erratas)[categoria] > 0:
+            return categoria
+        return self._categoria(sin_erratas)
+    
+    def _escanear(self, mensaje):
+        """Busca de una vez en el mensaje easter eggs, despedidas, ayuda y palabras clave (con memoria de los últimos)"""
+        coincidencias = self._escaneos.get(mensaje)
+        if coincidencias is None:
+            coincidencias = self.escaner.escanear(mensaje.lower())
+            if len(self._escaneos) >= self.MAX_ESCANEOS:
+                self._escaneos.clear()
+            self._escaneos[mensaje] = coincidencias
+        return coincidencias
+    
+    def verificar_easter_eggs(self, mensaje, sesion=None):
         """Verifica si el mensaje activa algún easter egg"""
+        sesion = sesion if sesion is not None else self.sesion
         mensaje_lower = mensaje.lower().strip()
         
-        for nombre, egg in self.easter_eggs.items():
-            if egg["clave"] in mensaje_lower:
-                encontrado_nuevo = self.memoria.registrar_easter_egg(egg["nombre"])
-                if encontrado_nuevo:
-                    return f"{egg['respuesta']} 🎉 ¡Has encontrado un nuevo easter egg!"
-                return egg["respuesta"]
+        nombre = self._escanear(mensaje).huevo
+        if nombre is not None:
+            egg = self.easter_eggs[nombre]
+            encontrado_nuevo = self.memoria.registrar_easter_egg(egg["nombre"])
+            if encontrado_nuevo:
+                return f"{egg['respuesta']} 🎉 ¡Has encontrado un nuevo easter egg!"
+            return egg["respuesta"]
         
         # Easter egg secreto del modo divertido
         if mensaje_lower == "modo divertido":
-            self.modo_divertido = not self.modo_divertido
-            return self.mensajes["modo_divertido_on"] if self.modo_divertido else self.mensajes["modo_divertido_off"]
+            sesion.modo_divertido = not sesion.modo_divertido
+            return self.mensajes["modo_divertido_on"] if sesion.modo_divertido else self.mensajes["modo_divertido_off"]
         
         # Easter egg para datos curiosos
         if mensaje_lower in ["dato curioso", "datos curiosos", "curiosidad", "cuéntame algo interesante"]:
@@ -406,43 +2541,230 @@ class OrgueBot:
         
         return None
 
-    def responder_pregunta(self, pregunta):
+    def responder_pregunta(self, pregunta, sesion=None):
         """Responde la pregunta del usuario"""
+        sesion = sesion if sesion is not None else self.sesion
+        self._comprobar_recarga()
         # Verificar primero si es un easter egg
-        respuesta_egg = self.verificar_easter_eggs(pregunta)
+        respuesta_egg = self.verificar_easter_eggs(pregunta, sesion)
         if respuesta_egg:
             return respuesta_egg
         
-        # Determinar categoría
-        categoria = self.categorizar_pregunta(pregunta)
+        # Una pregunta de seguimiento se resuelve con el tema anterior sin puntuar todas las categorías
+        seguimiento = self._resolver_seguimiento(pregunta, sesion)
+        if seguimiento is not None:
+            categoria, respuesta_base = seguimiento
+        else:
+            categoria, respuesta_base = self._analizar_pregunta(pregunta)
+        if categoria and respuesta_base is None:
+            # Sin respuesta parecida: mejor una sobre la entidad mencionada que una al azar
+            respuesta_base = self._respuesta_con_entidad(pregunta, categoria) or random.choice(self.conocimientos[categoria])
+        self._recordar_contexto(pregunta, respuesta_base, sesion)
+        # Un seguimiento sin palabras clave ("¿y quién más?") solo tiene sentido tras otra pregunta: no se sugiere
+        registrar = seguimiento is None or bool(self._escanear(pregunta).claves)
+        return self._componer_respuesta(pregunta, categoria, respuesta_base, sesion, registrar=registrar)
+    
+    def _clave_cache(self, pregunta):
+        """Normaliza la pregunta para usarla como clave de la caché"""
+        return " ".join(pregunta.lower().split())
+    
+    def _analizar_pregunta(self, pregunta):
+        """Devuelve la categoría y la mejor respuesta (o None), reutilizándolas de la caché si ya se calcularon"""
+        clave = self._clave_cache(pregunta)
+        encontrado, resultado = self.cache_respuestas.obtener(clave)
+        if not encontrado:
+            resultado = self._analizar_sin_cache([pregunta])[0]
+            self.cache_respuestas.guardar(clave, resultado)
+        return resultado
+    
+    def _resolver_seguimiento(self, pregunta, sesion):
+        """(categoría, respuesta) de una pregunta que sigue el tema anterior, o None si hay que analizarla entera"""
+        anterior = sesion.ultima_categoria
+        contexto = sesion.contexto_actual
+        if anterior is None or contexto is None:
+            return None
+        palabras = tokenizar_palabras(pregunta)
+        alternativa = not PALABRAS_ALTERNATIVA.isdisjoint(palabras) or (palabras and palabras[-1] == "más")
+        
+        claves = self._escanear(pregunta).claves
+        if claves:
+            # Se puntúa primero la categoría anterior: si todas sus palabras clave la apoyan, no se miran las demás
+            puntuacion = self.indice_categorias.puntuar_categoria(claves, anterior)
+            if puntuacion is None or puntuacion < self.UMBRAL_SEGUIMIENTO:
+                return None
+            respuesta = self._respuesta_en_categoria(pregunta, anterior)
+            if alternativa and (respuesta is None or respuesta in contexto.respuestas):
+                respuesta = self._respuesta_alternativa(anterior, contexto)
+            return anterior, respuesta
+        
+        # Sin palabras clave: "¿y Widor?", "¿quién más?", "¿dónde tocaba él?", "¿y en Francia?"
+        entidades = self._escanear(pregunta).entidades
+        if entidades:
+            return self._respuesta_sobre(entidades[0], anterior, contexto)
+        referencia = not PALABRAS_REFERENCIA.isdisjoint(palabras) and contexto.ultima_entidad() is not None
+        continuacion = bool(palabras) and palabras[0] in PALABRAS_CONTINUACION
+        if not (alternativa or referencia or continuacion):
+            return None
+        # El resto del mensaje tiene que ser del tema anterior: "¿y el clima de hoy?" no es un seguimiento
+        resto = [palabra for palabra in palabras if palabra not in PALABRAS_SEGUIMIENTO]
+        if not self._vocabulario(anterior).issuperset(resto):
+            return None
+        respuesta = self._respuesta_en_categoria(pregunta, anterior) if resto else None
+        if alternativa:
+            return anterior, self._respuesta_alternativa(anterior, contexto)
+        if referencia:
+            return self._respuesta_sobre(contexto.ultima_entidad(), anterior, contexto)
+        if respuesta is None or respuesta in contexto.respuestas:
+            respuesta = self._respuesta_alternativa(anterior, contexto)
+        return anterior, respuesta
+    
+    def _vocabulario(self, categoria):
+        """Palabras de las respuestas y palabras clave de una categoría (se calculan la primera vez)"""
+        vocabulario = self._vocabularios.get(categoria)
+        if vocabulario is None:
+            tokens = self.base_conocimientos.precalculado["tokens"]
+            vocabulario = {token for respuesta in self.conocimientos[categoria] for token in tokens[respuesta]}
+            vocabulario.update(self.categorias_palabras.get(categoria, ()))
+            vocabulario.update(self.palabras_clave_categoria.get(categoria, ()))
+            self._vocabularios[categoria] = vocabulario
+        return vocabulario
+    
+    def _respuesta_en_categoria(self, pregunta, categoria):
+        """Mejor respuesta de una sola categoría, con caché propia (el resultado depende de la categoría anterior)"""
+        clave = (categoria, self._clave_cache(pregunta))
+        encontrado, respuesta = self.cache_respuestas.obtener(clave)
+        if not encontrado:
+            respuesta = self._buscar_respuesta(self.indice_difuso.corregir_texto(pregunta), categoria)
+            self.cache_respuestas.guardar(clave, respuesta)
+        return respuesta
+    
+    def _respuesta_sobre(self, entidad, anterior, contexto):
+        """(categoría, respuesta) que habla de la entidad, a ser posible del tema anterior y sin repetir"""
+        menciones = self.indice_entidades.respuestas_sobre(entidad, anterior)
+        if not menciones:
+            return None
+        for categoria, respuesta in menciones:
+            if respuesta not in contexto.respuestas:
+                return categoria, respuesta
+        return menciones[0]
+    
+    def _respuesta_con_entidad(self, pregunta, categoria):
+        """Primera respuesta de la categoría que habla de una entidad mencionada en la pregunta, o None"""
+        for entidad in self._escanear(pregunta).entidades:
+            for categoria_mencion, respuesta in self.indice_entidades.respuestas_sobre(entidad, categoria):
+                if categoria_mencion == categoria:
+                    return respuesta
+        return None
+    
+    def _respuesta_alternativa(self, categoria, contexto):
+        """Respuesta de la categoría aún no dada, mejor si trata de una entidad de la que no se ha hablado"""
+        nuevas = [respuesta for respuesta in self.conocimientos[categoria] if respuesta not in contexto.respuestas]
+        for respuesta in nuevas:
+            entidades = self.indice_entidades.por_respuesta.get(respuesta)
+            if entidades and entidades[0] not in contexto.entidades:
+                return respuesta
+        return nuevas[0] if nuevas else None
+    
+    def _recordar_contexto(self, pregunta, respuesta_base, sesion):
+        """Guarda en la sesión las entidades de la pregunta y de la respuesta, y la respuesta dada"""
+        if sesion.contexto_actual is None:
+            sesion.contexto_actual = ContextoConversacion()
+        # La entidad de la que trata la respuesta (la primera) y las de la pregunta quedan como más recientes
+        entidades = list(reversed(self.indice_entidades.por_respuesta.get(respuesta_base, ())))
+        entidades += self._escanear(pregunta).entidades
+        sesion.contexto_actual.recordar(entidades, respuesta_base)
+    
+    def _corregir_preguntas(self, preguntas):
+        """Cambia las palabras clave mal escritas ("mantenimeinto") por la palabra clave correcta"""
+        return [self.indice_difuso.corregir_texto(pregunta) for pregunta in preguntas]
+    
+    def _analizar_sin_cache(self, preguntas):
+        """Categoriza varias preguntas y busca sus respuestas con una sola llamada al motor"""
+        corregidas = self._corregir_preguntas(preguntas)
+        categorias = [self._categoria_corregida(pregunta, corregida, categoria)
+                      for pregunta, corregida, categoria in zip(preguntas, corregidas, self._categorias(corregidas))]
+        preguntas = corregidas
+        con_categoria = [i for i, categoria in enumerate(categorias) if categoria]
+        encontradas = self._buscar_respuestas([preguntas[i] for i in con_categoria], [categorias[i] for i in con_categoria])
         
+        resultados = [(categoria, None) for categoria in categorias]
+        for i, (mejor_respuesta, mejor_similitud) in zip(con_categoria, encontradas):
+            if mejor_similitud > self.motor.umbral:
+                resultados[i] = (categorias[i], mejor_respuesta)
+        return resultados
+    
+    def _componer_respuesta(self, pregunta, categoria, respuesta_base, sesion, registrar=True):
+        """Registra la pregunta (salvo registrar=False) y construye la respuesta final para la sesión"""
         # Registrar pregunta si se identificó una categoría
         if categoria:
-            self.memoria.registrar_pregunta(pregunta, categoria)
+            sesion.ultima_categoria = categoria
+            if registrar:
+                self.memoria.registrar_pregunta(pregunta, categoria)
             
-            # Buscar la respuesta más relevante en lugar de elegir una aleatoria
-            respuesta_base = self._encontrar_respuesta_relevante(pregunta, categoria)
+            # Si ninguna respuesta es suficientemente parecida, elegir una al azar de la categoría
+            if respuesta_base is None:
+                respuesta_base = random.choice(self.conocimientos[categoria])
             
             # Si está en modo divertido, añadir más emojis y entusiasmo
-            if self.modo_divertido:
+            if sesion.modo_divertido:
                 emojis = "🎵🎹🎭🎼🎶🎧🎻"
                 respuesta_base = respuesta_base.replace(".", "! 🎵").replace(",", ", ¡vaya! ")
                 return f"{respuesta_base} {random.choice(emojis)}{random.choice(emojis)}"
             return respuesta_base
         else:
             return random.choice(self.mensajes["no_info"])
+    
+    def responder_lote(self, preguntas, sesion=None, ejecutor=None, tam_fragmento=64):
+        """Responde muchas preguntas a la vez guardando la memoria una sola vez; devuelve dicts pregunta/categoria/respuesta"""
+        sesion = sesion if sesion is not None else SesionOrgueBot()
+        self._comprobar_recarga()
+        preguntas = list(preguntas)
+        claves = [self._clave_cache(pregunta) for pregunta in preguntas]
+        
+        # Analizar una sola vez cada pregunta distinta que no esté en la caché
+        analisis = {}
+        pendientes = {}
+        for clave, pregunta in zip(claves, preguntas):
+            if clave in analisis or clave in pendientes:
+                continue
+            encontrado, resultado = self.cache_respuestas.obtener(clave)
+            if encontrado:
+                analisis[clave] = resultado
+            else:
+                pendientes[clave] = pregunta
+        
+        if pendientes:
+            por_analizar = list(pendientes.values())
+            if ejecutor is None:
+                resultados = self._analizar_sin_cache(por_analizar)
+            else:
+                # Repartir los fragmentos entre los procesos de crear_ejecutor_lote
+                fragmentos = [por_analizar[i:i + tam_fragmento] for i in range(0, len(por_analizar), tam_fragmento)]
+                resultados = [resultado for parcial in ejecutor.map(_analizar_fragmento, fragmentos) for resultado in parcial]
+            for clave, resultado in zip(pendientes, resultados):
+                self.cache_respuestas.guardar(clave, resultado)
+                analisis[clave] = resultado
+        
+        # Easter eggs, modo divertido y memoria se aplican en el orden original
+        salida = []
+        with self.memoria.en_lote():
+            for clave, pregunta in zip(claves, preguntas):
+                respuesta_egg = self.verificar_easter_eggs(pregunta, sesion)
+                if respuesta_egg:
+                    salida.append({"pregunta": pregunta, "categoria": None, "respuesta": respuesta_egg})
+                    continue
+                categoria, respuesta_base = analisis[clave]
+                respuesta = self._componer_respuesta(pregunta, categoria, respuesta_base, sesion)
+                salida.append({"pregunta": pregunta, "categoria": categoria, "respuesta": respuesta})
+        return salida
 
     def es_despedida(self, mensaje):
         """Verifica si el mensaje es una despedida"""
-        mensaje = mensaje.lower()
-        palabras_despedida = ["adiós", "chao", "hasta luego", "salir", "terminar", "cerrar", "bye", "me voy", "hasta pronto"]
-        
-        return any(palabra in mensaje for palabra in palabras_despedida)
+        return self._escanear(mensaje).despedida
     
     def es_ayuda(self, mensaje):
         """Verifica si el usuario pide ayuda"""
-        mensaje = mensaje.lower()
-        return "ayuda" in mensaje or "help" in mensaje or "?" == mensaje
+        return self._escanear(mensaje).ayuda or "?" == mensaje
     
     def mostrar_sugerencias(self):
         """Muestra sugerencias de preguntas al usuario"""
@@ -455,8 +2777,33 @@ class OrgueBot:
         else:
             print(f"\n{Fore.CYAN}{self.mensajes['ayuda']}{Style.RESET_ALL}")
     
+    def procesar_mensaje(self, mensaje_usuario, sesion=None):
+        """Procesa un mensaje dentro de una sesión y devuelve (respuesta, fin de la conversación)"""
+        sesion = sesion if sesion is not None else self.sesion
+        
+        # Registrar la pregunta
+        sesion.conversacion_actual.append({"rol": "usuario", "mensaje": mensaje_usuario})
+        
+        # Verificar si el usuario quiere salir
+        if self.es_despedida(mensaje_usuario):
+            respuesta = random.choice(self.mensajes["despedidas"])
+            sesion.conversacion_actual.append({"rol": "bot", "mensaje": respuesta})
+            self.memoria.registrar_conversacion(sesion.conversacion_actual)
+            return respuesta, True
+        
+        # Verificar si pide ayuda
+        if self.es_ayuda(mensaje_usuario):
+            sesion.conversacion_actual.append({"rol": "bot", "mensaje": self.mensajes["ayuda"]})
+            return self.mensajes["ayuda"], False
+            
+        # Responder la pregunta
+        respuesta = self.responder_pregunta(mensaje_usuario, sesion)
+        sesion.conversacion_actual.append({"rol": "bot", "mensaje": respuesta})
+        return respuesta, False
+    
     def iniciar(self):
         """Inicia el chatbot"""
+        iniciar_colores()
         print(f"{Fore.GREEN}{random.choice(self.mensajes['saludos'])}{Style.RESET_ALL}")
         print(f"{Fore.CYAN}Escribe 'ayuda' en cualquier momento para ver opciones.{Style.RESET_ALL}")
         self.conversacion_actual = []
@@ -469,34 +2816,253 @@ class OrgueBot:
             # Obtener input del usuario
             mensaje_usuario = input(f"{Fore.YELLOW}Tú: {Style.RESET_ALL}")
             
-            # Registrar la pregunta
-            self.conversacion_actual.append({"rol": "usuario", "mensaje": mensaje_usuario})
-            
-            # Verificar si el usuario quiere salir
-            if self.es_despedida(mensaje_usuario):
-                respuesta = random.choice(self.mensajes["despedidas"])
-                print(f"{Fore.GREEN}Bot: {respuesta}{Style.RESET_ALL}")
-                self.conversacion_actual.append({"rol": "bot", "mensaje": respuesta})
-                self.memoria.registrar_conversacion(self.conversacion_actual)
-                break
-            
-            # Verificar si pide ayuda
-            if self.es_ayuda(mensaje_usuario):
-                print(f"{Fore.GREEN}Bot: {self.mensajes['ayuda']}{Style.RESET_ALL}")
-                self.conversacion_actual.append({"rol": "bot", "mensaje": self.mensajes["ayuda"]})
-                continue
-                
-            # Responder la pregunta
-            respuesta = self.responder_pregunta(mensaje_usuario)
+            respuesta, terminar = self.procesar_mensaje(mensaje_usuario)
             print(f"{Fore.GREEN}Bot: {respuesta}{Style.RESET_ALL}")
-            self.conversacion_actual.append({"rol": "bot", "mensaje": respuesta})
+            if terminar:
+                break
 
-# Ejecutar el chatbot
-if __name__ == "__main__":
+# Bot heredado por los procesos de crear_ejecutor_lote
+_bot_lote = None
+
+def _iniciar_trabajador_lote(bot):
+    """Guarda en el proceso trabajador el bot heredado del proceso padre"""
+    global _bot_lote
+    _bot_lote = bot
+
+def _analizar_fragmento(preguntas):
+    """Categoriza y busca respuestas de un fragmento de preguntas en un proceso trabajador"""
+    # Cada trabajador tiene su copia del bot y recarga por su cuenta si el padre lo hizo
+    _bot_lote._comprobar_recarga()
+    return _bot_lote._analizar_sin_cache(preguntas)
+
+def crear_ejecutor_lote(bot, procesos):
+    """Crea un pool de procesos para responder_lote; los trabajadores heredan el bot por fork"""
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    return ProcessPoolExecutor(
+        max_workers=procesos,
+        mp_context=multiprocessing.get_context("fork"),
+        initializer=_iniciar_trabajador_lote,
+        initargs=(bot,)
+    )
+
+def responder_archivo(bot, entrada, salida, tam_lote=256, ejecutor=None):
+    """Lee una pregunta por línea y escribe cada respuesta como una línea JSON según se van respondiendo"""
+    lote = []
+    for linea in entrada:
+        pregunta = linea.strip()
+        if pregunta:
+            lote.append(pregunta)
+        if len(lote) >= tam_lote:
+            _escribir_lote(bot.responder_lote(lote, ejecutor=ejecutor), salida)
+            lote = []
+    if lote:
+        _escribir_lote(bot.responder_lote(lote, ejecutor=ejecutor), salida)
+
+def _escribir_lote(resultados, salida):
+    """Escribe los resultados de un lote en formato JSON Lines"""
+    for resultado in resultados:
+        salida.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+    salida.flush()
+
+# Tipos de memoria disponibles desde la línea de comandos
+MEMORIAS = {
+    "json": OrgueBotMemoria,
+    "diario": OrgueBotMemoriaDiario,
+    "sqlite": OrgueBotMemoriaSQLite,
+}
+
+# Archivo por defecto de cada tipo de memoria
+RUTAS_MEMORIA = {
+    "json": "memoria_orguebot.json",
+    "diario": "memoria_orguebot.json",
+    "sqlite": "memoria_orguebot.db",
+}
+
+def crear_memoria(tipo="json", ruta_archivo=None, retencion=None):
+    """Crea la memoria del tipo indicado, con su archivo por defecto si no se da una ruta"""
+    return MEMORIAS[tipo](ruta_archivo or RUTAS_MEMORIA[tipo], retencion=retencion)
+
+def _crear_retencion(args):
+    """Política de retención pedida con las opciones --max-* (None si no se pidió ningún límite)"""
+    limites = (args.max_conversaciones, args.max_dias, args.max_mb, args.max_preguntas)
+    if all(limite is None for limite in limites) and args.min_frecuencia == 1:
+        return None
+    return PoliticaRetencion(
+        max_conversaciones=args.max_conversaciones,
+        max_dias=args.max_dias,
+        max_bytes=int(args.max_mb * 1024 * 1024) if args.max_mb is not None else None,
+        directorio_archivo=args.archivo_memoria,
+        min_frecuencia=args.min_frecuencia,
+        max_preguntas=args.max_preguntas,
+    )
+
+def _crear_instrumentacion(args):
+    """Instrumentación pedida con --metricas y --perfil (None si no se pidió ninguna)"""
+    if args.metricas is None and args.perfil is None:
+        return None
+    sumideros = [SumideroPrometheus()] if args.metricas else []
+    perfilador = PERFILADORES[args.perfil]() if args.perfil else None
+    return Instrumentacion(sumideros, perfilador)
+
+def _cerrar_instrumentacion(args, instrumentacion):
+    """Guarda las métricas y muestra el informe del perfilador"""
+    if instrumentacion is None:
+        return
+    if args.metricas:
+        instrumentacion.sumideros[0].volcar(args.metricas)
+    if instrumentacion.perfilador is not None:
+        if hasattr(instrumentacion.perfilador, "detener"):
+            instrumentacion.perfilador.detener()
+        print(instrumentacion.perfilador.informe(), file=sys.stderr)
+
+def _ejecutar_comando(args, instrumentacion):
+    """Ejecuta el subcomando elegido (o el chat interactivo)"""
+    if args.comando == "servidor" and args.trabajadores > 1:
+        from orguebot_servidor import ejecutar_servidor_multiproceso
+        if instrumentacion is not None:
+            print("--metricas y --perfil solo están disponibles con un trabajador")
+            return
+        ejecutar_servidor_multiproceso(args.host, args.puerto, args.trabajadores,
+                                       functools.partial(crear_memoria, args.memoria, args.ruta_memoria, _crear_retencion(args)),
+                                       motor_respuestas=args.motor, ruta_conocimientos=args.conocimientos,
+                                       intervalo_recarga=args.recarga)
+        return
+
+    if args.comando == "servidor":
+        from orguebot_servidor import ejecutar_servidor
+        ejecutar_servidor(args.host, args.puerto, motor_respuestas=args.motor,
+                          memoria=crear_memoria(args.memoria, args.ruta_memoria, _crear_retencion(args)),
+                          ruta_conocimientos=args.conocimientos, intervalo_recarga=args.recarga,
+                          instrumentacion=instrumentacion)
+        return
+
+    if args.comando == "lote":
+        chatbot = OrgueBot(motor_respuestas=args.motor, memoria=crear_memoria(args.memoria, args.ruta_memoria, _crear_retencion(args)),
+                           ruta_conocimientos=args.conocimientos, intervalo_recarga=args.recarga,
+                           instrumentacion=instrumentacion)
+        entrada = open(args.archivo, 'r', encoding='utf-8') if args.archivo else sys.stdin
+        ejecutor = crear_ejecutor_lote(chatbot, args.procesos) if args.procesos > 1 else None
+        try:
+            responder_archivo(chatbot, entrada, sys.stdout, args.tam_lote, ejecutor)
+        finally:
+            if ejecutor is not None:
+                ejecutor.shutdown()
+            if entrada is not sys.stdin:
+                entrada.close()
+        return
+
+    # Ejecutar el chatbot: solo el chat interactivo usa colorama, así la salida de los subcomandos queda intacta
+    iniciar_colores()
     try:
-        chatbot = OrgueBot()
+        chatbot = OrgueBot(motor_respuestas=args.motor, memoria=crear_memoria(args.memoria, args.ruta_memoria, _crear_retencion(args)),
+                           ruta_conocimientos=args.conocimientos, intervalo_recarga=args.recarga,
+                           instrumentacion=instrumentacion)
         chatbot.iniciar()
     except KeyboardInterrupt:
         print(f"\n{Fore.RED}Programa interrumpido por el usuario.{Style.RESET_ALL}")
     except Exception as e:
         print(f"\n{Fore.RED}Error inesperado: {e}{Style.RESET_ALL}")
+
+def main(argv=None):
+    """Punto de entrada de la línea de comandos"""
+    import argparse
+    parser = argparse.ArgumentParser(description="OrgueBot, el chatbot especializado en órganos musicales")
+    parser.add_argument("--motor", choices=list(MOTORES_RESPUESTA), default="secuencia", help="motor para elegir respuestas")
+    parser.add_argument("--memoria", choices=list(MEMORIAS), default="json", help="dónde guardar la memoria")
+    parser.add_argument("--ruta-memoria", default=None, help="archivo de memoria (por defecto el del tipo elegido)")
+    parser.add_argument("--conocimientos", default=RUTA_CONOCIMIENTOS, help="base de conocimientos en JSON (usa su .kb compilado si está al día)")
+    parser.add_argument("--recarga", type=float, default=None, metavar="SEGUNDOS", help="comprobar cada tantos segundos si cambió la base de conocimientos")
+    parser.add_argument("--metricas", default=None, metavar="ARCHIVO", help="guardar al terminar los tiempos por etapa en formato Prometheus")
+    parser.add_argument("--perfil", choices=list(PERFILADORES), default=None, help="perfilar las respuestas y mostrar el informe al terminar")
+    retencion = parser.add_argument_group("retención de la memoria")
+    retencion.add_argument("--max-conversaciones", type=int, default=None, metavar="N", help="conversaciones que se conservan; las más antiguas se archivan")
+    retencion.add_argument("--max-dias", type=float, default=None, metavar="DIAS", help="archivar las conversaciones más antiguas que esto")
+    retencion.add_argument("--max-mb", type=float, default=None, metavar="MB", help="tamaño máximo del archivo de memoria")
+    retencion.add_argument("--archivo-memoria", default=None, metavar="DIRECTORIO", help="dónde archivar (por defecto <memoria>.archivo)")
+    retencion.add_argument("--min-frecuencia", type=int, default=1, metavar="N", help="al compactar, descartar preguntas menos frecuentes")
+    retencion.add_argument("--max-preguntas", type=int, default=None, metavar="N", help="al compactar, conservar solo las N preguntas más frecuentes")
+    subcomandos = parser.add_subparsers(dest="comando")
+
+    compilar = subcomandos.add_parser("compilar", help="compila la base de conocimientos a un archivo .kb")
+    compilar.add_argument("origen", nargs="?", default=None, help="base en JSON (por defecto la de --conocimientos)")
+    compilar.add_argument("destino", nargs="?", default=None, help="archivo compilado (por defecto el mismo nombre con .kb)")
+
+    migrar = subcomandos.add_parser("migrar-sqlite", help="importa memoria_orguebot.json a una base SQLite")
+    migrar.add_argument("origen", nargs="?", default="memoria_orguebot.json")
+    migrar.add_argument("destino", nargs="?", default="memoria_orguebot.db")
+
+    servidor = subcomandos.add_parser("servidor", help="atiende muchas sesiones a la vez por TCP (una línea por mensaje)")
+    servidor.add_argument("--host", default="127.0.0.1")
+    servidor.add_argument("--puerto", type=int, default=8765)
+    servidor.add_argument("--trabajadores", type=int, default=1, help="procesos que atienden conexiones (la memoria la escribe otro proceso)")
+
+    archivo = subcomandos.add_parser("archivo", help="muestra en JSON Lines las conversaciones archivadas")
+    archivo.add_argument("--desde", default=None, metavar="FECHA", help="AAAA-MM-DD o AAAA-MM-DD HH:MM:SS")
+    archivo.add_argument("--hasta", default=None, metavar="FECHA", help="AAAA-MM-DD o AAAA-MM-DD HH:MM:SS (incluida)")
+
+    analitica = subcomandos.add_parser("analitica", help="resume la memoria (categorías, preguntas sin respuesta, easter eggs) leyéndola por trozos")
+    analitica.add_argument("--con-archivo", action="store_true", help="incluir las conversaciones archivadas")
+    analitica.add_argument("--top", type=int, default=10, help="preguntas sin respuesta más frecuentes que se muestran")
+    analitica.add_argument("--json", action="store_true", help="mostrar el informe en JSON")
+
+    exportar = subcomandos.add_parser("exportar", help="escribe las conversaciones en JSON Lines leyendo la memoria por trozos")
+    exportar.add_argument("--con-archivo", action="store_true", help="incluir primero las conversaciones archivadas")
+
+    subcomandos.add_parser("compactar-memoria", help="aplica ahora la política de retención y compacta las preguntas frecuentes")
+
+    lote = subcomandos.add_parser("lote", help="responde preguntas de un archivo o de stdin y escribe JSON Lines")
+    lote.add_argument("archivo", nargs="?", default=None, help="una pregunta por línea (por defecto stdin)")
+    lote.add_argument("--procesos", type=int, default=1, help="procesos para categorizar y buscar respuestas")
+    lote.add_argument("--tam-lote", type=int, default=256, help="preguntas por lote")
+
+    args = parser.parse_args(argv)
+
+    if args.comando == "migrar-sqlite":
+        memoria = migrar_json_a_sqlite(args.origen, args.destino)
+        print(f"{Fore.GREEN}Migradas {len(memoria.get('conversaciones', []))} conversaciones y "
+              f"{len(memoria.get('preguntas_frecuentes', {}))} preguntas a {args.destino}{Style.RESET_ALL}")
+        return
+
+    if args.comando == "compilar":
+        destino = compilar_conocimientos(args.origen or args.conocimientos, args.destino)
+        print(f"{Fore.GREEN}Base de conocimientos compilada en {destino}{Style.RESET_ALL}")
+        return
+
+    if args.comando == "archivo":
+        ruta_memoria = args.ruta_memoria or RUTAS_MEMORIA[args.memoria]
+        archivo = ArchivoConversaciones(args.archivo_memoria or ruta_memoria + ".archivo")
+        for conversacion in archivo.leer(args.desde, args.hasta):
+            sys.stdout.write(json.dumps(conversacion, ensure_ascii=False) + "\n")
+        return
+
+    if args.comando in ("analitica", "exportar"):
+        from orguebot_analitica import describir_informe, exportar_conversaciones, recorrer_memoria, resumir_memoria
+        ruta_memoria = args.ruta_memoria or RUTAS_MEMORIA[args.memoria]
+        directorio_archivo = (args.archivo_memoria or ruta_memoria + ".archivo") if args.con_archivo else None
+        eventos = recorrer_memoria(args.memoria, ruta_memoria, directorio_archivo)
+        if args.comando == "exportar":
+            exportar_conversaciones(eventos, sys.stdout)
+            return
+        base = cargar_base_conocimientos(args.conocimientos)
+        informe = resumir_memoria(eventos, base.mensajes, base.easter_eggs, args.top)
+        print(json.dumps(informe, ensure_ascii=False, indent=2) if args.json else describir_informe(informe))
+        return
+
+    if args.comando == "compactar-memoria":
+        memoria = crear_memoria(args.memoria, args.ruta_memoria, _crear_retencion(args) or PoliticaRetencion())
+        memoria.aplicar_retencion(compactar=True)
+        memoria.guardar_memoria()
+        if hasattr(memoria, "cerrar"):
+            memoria.cerrar()
+        print(f"{Fore.GREEN}Memoria compactada{Style.RESET_ALL}")
+        return
+
+    instrumentacion = _crear_instrumentacion(args)
+    try:
+        _ejecutar_comando(args, instrumentacion)
+    finally:
+        _cerrar_instrumentacion(args, instrumentacion)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+"""Exportación y analítica de la memoria de OrgueBot sin cargarla entera
+
+Uso:
+    python OrgueBot.py [--memoria json|diario|sqlite] [--ruta-memoria RUTA] analitica [--con-archivo] [--json]
+    python OrgueBot.py [--memoria json|diario|sqlite] [--ruta-memoria RUTA] exportar [--con-archivo] > conversaciones.jsonl
+
+La memoria se recorre como una secuencia de eventos con el mismo formato que el diario
+({"tipo": "conversacion" | "pregunta" | "easter_egg", ...}): el JSON se lee por trozos con un
+analizador incremental, el diario y el archivo línea a línea y SQLite con cursores. Los agregados
+ocupan una memoria fija, sea cual sea el tamaño del historial.
+"""
+import json
+import os
+import re
+
+from OrgueBot import ArchivoConversaciones, normalizar_pregunta
+
+ESPACIOS = re.compile(r"\s*")
+
+
+class LectorJSON:
+    """Lee un documento JSON por trozos: las listas y objetos grandes se recorren elemento a elemento"""
+    TAM_TROZO = 64 * 1024
+
+    def __init__(self, archivo):
+        self.archivo = archivo
+        self.buffer = ""
+        self.pos = 0
+        self.decodificador = json.JSONDecoder()
+
+    def _rellenar(self):
+        """Descarta lo ya leído y añade el siguiente trozo del archivo; devuelve False al final"""
+        trozo = self.archivo.read(self.TAM_TROZO)
+        if not trozo:
+            return False
+        self.buffer = self.buffer[self.pos:] + trozo
+        self.pos = 0
+        return True
+
+    def _caracter(self):
+        """Siguiente carácter que no es un espacio (sin consumirlo), o "" al final del documento"""
+        while True:
+            self.pos = ESPACIOS.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) or not self._rellenar():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def _esperar(self, caracter):
+        """Consume el carácter indicado o falla si el documento no es el esperado"""
+        encontrado = self._caracter()
+        if encontrado != caracter:
+            raise ValueError(f"Se esperaba {caracter!r} y se encontró {encontrado!r}")
+        self.pos += 1
+
+    def valor(self):
+        """Decodifica el siguiente valor completo"""
+        self._caracter()
+        while True:
+            try:
+                valor, fin = self.decodificador.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._rellenar():
+                    raise
+                continue
+            # Un número al final del trozo puede seguir en el siguiente
+            if fin == len(self.buffer) and self._rellenar():
+                continue
+            self.pos = fin
+            return valor
+
+    def elementos(self):
+        """Recorre una lista elemento a elemento"""
+        self._esperar("[")
+        if self._caracter() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.valor()
+            separador = self._caracter()
+            self.pos += 1
+            if separador == "]":
+                return
+            if separador != ",":
+                raise ValueError(f"Se esperaba ',' o ']' y se encontró {separador!r}")
+
+    def claves(self):
+        """Recorre un objeto clave a clave; quien recorre debe leer el valor de cada clave antes de pedir la siguiente"""
+        self._esperar("{")
+        if self._caracter() == "}":
+            self.pos += 1
+            return
+        while True:
+            clave = self.valor()
+            self._esperar(":")
+            yield clave
+            separador = self._caracter()
+            self.pos += 1
+            if separador == "}":
+                return
+            if separador != ",":
+                raise ValueError(f"Se esperaba ',' o '}}' y se encontró {separador!r}")
+
+
+def recorrer_memoria_json(ruta):
+    """Eventos de memoria_orguebot.json y, si existe, de su diario posteriores a la instantánea"""
+    secuencia = 0
+    if os.path.exists(ruta):
+        with open(ruta, 'r', encoding='utf-8') as archivo:
+            lector = LectorJSON(archivo)
+            for clave in lector.claves():
+                if clave == "conversaciones":
+                    for conversacion in lector.elementos():
+                        yield {"tipo": "conversacion", "fecha": conversacion["fecha"], "intercambios": conversacion["intercambios"]}
+                elif clave == "preguntas_frecuentes":
+                    for pregunta in lector.claves():
+                        datos = lector.valor()
+                        yield {"tipo": "pregunta", "pregunta": pregunta, "categoria": datos["categoria"], "frecuencia": datos["frecuencia"]}
+                elif clave == "huevos_pascua_encontrados":
+                    for nombre in lector.elementos():
+                        yield {"tipo": "easter_egg", "nombre": nombre}
+                elif clave == "secuencia_diario":
+                    secuencia = lector.valor()
+                else:
+                    lector.valor()
+
+    ruta_diario = ruta + ".diario"
+    if os.path.exists(ruta_diario):
+        with open(ruta_diario, 'rb') as diario:
+            for linea in diario:
+                if not linea.endswith(b"\n"):
+                    break
+                evento = json.loads(linea.decode('utf-8'))
+                if evento["secuencia"] > secuencia:
+                    yield evento
+
+
+def recorrer_memoria_sqlite(ruta):
+    """Eventos de una memoria SQLite leídos con cursores (nunca se cargan todas las filas)"""
+    import sqlite3
+    conexion = sqlite3.connect(f"file:{ruta}?mode=ro", uri=True)
+    try:
+        actual = None
+        for conversacion_id, fecha, rol, mensaje in conexion.execute(
+                "SELECT c.id, c.fecha, i.rol, i.mensaje FROM conversaciones c "
+                "LEFT JOIN intercambios i ON i.conversacion_id = c.id ORDER BY c.id, i.orden"):
+            if actual is None or actual[0] != conversacion_id:
+                if actual is not None:
+                    yield actual[1]
+                actual = (conversacion_id, {"tipo": "conversacion", "fecha": fecha, "intercambios": []})
+            if rol is not None:
+                actual[1]["intercambios"].append({"rol": rol, "mensaje": mensaje})
+        if actual is not None:
+            yield actual[1]
+        for pregunta, categoria, frecuencia in conexion.execute(
+                "SELECT pregunta, categoria, frecuencia FROM preguntas_frecuentes ORDER BY rowid"):
+            yield {"tipo": "pregunta", "pregunta": pregunta, "categoria": categoria, "frecuencia": frecuencia}
+        for (nombre,) in conexion.execute("SELECT nombre FROM huevos_pascua_encontrados ORDER BY rowid"):
+            yield {"tipo": "easter_egg", "nombre": nombre}
+    finally:
+        conexion.close()
+
+
+def recorrer_memoria(tipo, ruta, directorio_archivo=None):
+    """Eventos de la memoria del tipo indicado, precedidos de las conversaciones archivadas si se da su directorio"""
+    if directorio_archivo is not None:
+        for conversacion in ArchivoConversaciones(directorio_archivo).leer():
+            yield {"tipo": "conversacion", "fecha": conversacion["fecha"], "intercambios": conversacion["intercambios"]}
+    if tipo == "sqlite":
+        yield from recorrer_memoria_sqlite(ruta)
+    else:
+        yield from recorrer_memoria_json(ruta)
+
+
+class ContadorFrecuentes:
+    """Claves más frecuentes de un flujo con un número fijo de contadores (algoritmo Space-Saving)
+
+    Las claves que están de verdad entre las más frecuentes se conservan; su cuenta puede estar
+    sobrestimada como mucho en la del contador que reemplazaron.
+    """
+    def __init__(self, capacidad=200):
+        self.capacidad = capacidad
+        self.conteos = {}
+
+    def agregar(self, clave, cantidad=1):
+        """Suma apariciones de una clave"""
+        if clave in self.conteos:
+            self.conteos[clave] += cantidad
+        elif len(self.conteos) < self.capacidad:
+            self.conteos[clave] = cantidad
+        else:
+            minima = min(self.conteos, key=self.conteos.get)
+            self.conteos[clave] = self.conteos.pop(minima) + cantidad
+
+    def mas_frecuentes(self, n):
+        """Las n claves con más apariciones y su cuenta"""
+        return sorted(self.conteos.items(), key=lambda elemento: -elemento[1])[:n]
+
+
+class ResumenMemoria:
+    """Agregados de la memoria calculados evento a evento con memoria acotada"""
+    def __init__(self, mensajes, easter_eggs, n_top=10):
+        self.no_info = frozenset(mensajes["no_info"])
+        self.huevo_por_respuesta = {egg["respuesta"]: egg["nombre"] for egg in easter_eggs.values()}
+        self.nombres_huevos = [egg["nombre"] for egg in easter_eggs.values()]
+        self.n_top = n_top
+        self.conversaciones = 0
+        self.mensajes_usuario = 0
+        self.primera_fecha = None
+        self.ultima_fecha = None
+        self.registros_preguntas = 0
+        self.por_categoria = {}
+        self.sin_respuesta = 0
+        self.preguntas_sin_respuesta = ContadorFrecuentes()
+        self.conversaciones_con_huevo = 0
+        self.conversaciones_por_huevo = {}
+        self.huevos_encontrados = set()
+
+    def agregar(self, evento):
+        """Incorpora un evento de recorrer_memoria"""
+        if evento["tipo"] == "conversacion":
+            self._agregar_conversacion(evento)
+        elif evento["tipo"] == "pregunta":
+            frecuencia = evento.get("frecuencia", 1)
+            self.registros_preguntas += frecuencia
+            self.por_categoria[evento["categoria"]] = self.por_categoria.get(evento["categoria"], 0) + frecuencia
+        elif evento["tipo"] == "easter_egg":
+            self.huevos_encontrados.add(evento["nombre"])
+
+    def _agregar_conversacion(self, conversacion):
+        """Cuenta mensajes, preguntas sin respuesta y easter eggs de una conversación"""
+        self.conversaciones += 1
+        fecha = conversacion["fecha"]
+        if self.primera_fecha is None or fecha < self.primera_fecha:
+            self.primera_fecha = fecha
+        if self.ultima_fecha is None or fecha > self.ultima_fecha:
+            self.ultima_fecha = fecha
+        huevos = set()
+        pregunta = None
+        for intercambio in conversacion["intercambios"]:
+            if intercambio["rol"] == "usuario":
+                self.mensajes_usuario += 1
+                pregunta = intercambio["mensaje"]
+                continue
+            mensaje = intercambio["mensaje"]
+            if mensaje in self.no_info and pregunta is not None:
+                self.sin_respuesta += 1
+                self.preguntas_sin_respuesta.agregar(normalizar_pregunta(pregunta))
+            # Las respuestas de los easter eggs pueden llevar detrás el aviso de huevo nuevo
+            nombre = self.huevo_por_respuesta.get(mensaje) or self.huevo_por_respuesta.get(mensaje.split(" 🎉 ")[0])
+            if nombre is not None:
+                huevos.add(nombre)
+            pregunta = None
+        if huevos:
+            self.conversaciones_con_huevo += 1
+            for nombre in huevos:
+                self.conversaciones_por_huevo[nombre] = self.conversaciones_por_huevo.get(nombre, 0) + 1
+
+    def informe(self):
+        """Diccionario con todos los agregados"""
+        conversaciones = self.conversaciones or 1
+        total_categorias = self.registros_preguntas or 1
+        return {
+            "conversaciones": self.conversaciones,
+            "mensajes_usuario": self.mensajes_usuario,
+            "primera_fecha": self.primera_fecha,
+            "ultima_fecha": self.ultima_fecha,
+            "preguntas_registradas": self.registros_preguntas,
+            "distribucion_categorias": {
+                categoria: {"preguntas": cantidad, "proporcion": round(cantidad / total_categorias, 4)}
+                for categoria, cantidad in sorted(self.por_categoria.items(), key=lambda elemento: -elemento[1])
+            },
+            "sin_respuesta": {
+                "mensajes": self.sin_respuesta,
+                "proporcion": round(self.sin_respuesta / (self.mensajes_usuario or 1), 4),
+                "mas_frecuentes": [
+                    {"pregunta": pregunta, "veces": veces}
+                    for pregunta, veces in self.preguntas_sin_respuesta.mas_frecuentes(self.n_top)
+                ],
+            },
+            "easter_eggs": {
+                "descubiertos": len(self.huevos_encontrados),
+                "total": len(self.nombres_huevos),
+                "proporcion_descubiertos": round(len(self.huevos_encontrados) / (len(self.nombres_huevos) or 1), 4),
+                "conversaciones_con_huevo": round(self.conversaciones_con_huevo / conversaciones, 4),
+                "por_huevo": {
+                    nombre: round(self.conversaciones_por_huevo.get(nombre, 0) / conversaciones, 4)
+                    for nombre in self.nombres_huevos
+                },
+            },
+        }
+
+
+def resumir_memoria(eventos, mensajes, easter_eggs, n_top=10):
+    """Recorre los eventos una sola vez y devuelve el informe"""
+    resumen = ResumenMemoria(mensajes, easter_eggs, n_top)
+    for evento in eventos:
+        resumen.agregar(evento)
+    return resumen.informe()
+
+
+def exportar_conversaciones(eventos, salida):
+    """Escribe cada conversación como una línea JSON; devuelve cuántas se escribieron"""
+    escritas = 0
+    for evento in eventos:
+        if evento["tipo"] == "conversacion":
+            salida.write(json.dumps({"fecha": evento["fecha"], "intercambios": evento["intercambios"]}, ensure_ascii=False) + "\n")
+            escritas += 1
+    return escritas
+
+
+def describir_informe(informe):
+    """Texto legible del informe de resumir_memoria"""
+    lineas = [
+        f"Conversaciones: {informe['conversaciones']} ({informe['primera_fecha']} - {informe['ultima_fecha']})",
+        f"Mensajes de usuarios: {informe['mensajes_usuario']}",
+        f"Preguntas registradas: {informe['preguntas_registradas']}",
+        "Distribución por categoría:",
+    ]
+    for categoria, datos in informe["distribucion_categorias"].items():
+        lineas.append(f"  {categoria}: {datos['preguntas']} ({datos['proporcion']:.1%})")
+    sin_respuesta = informe["sin_respuesta"]
+    lineas.append(f"Sin respuesta: {sin_respuesta['mensajes']} ({sin_respuesta['proporcion']:.1%} de los mensajes)")
+    for elemento in sin_respuesta["mas_frecuentes"]:
+        lineas.append(f"  {elemento['veces']:>6}  {elemento['pregunta']}")
+    huevos = informe["easter_eggs"]
+    lineas.append(f"Easter eggs descubiertos: {huevos['descubiertos']}/{huevos['total']}; "
+                  f"aparecen en el {huevos['conversaciones_con_huevo']:.1%} de las conversaciones")
+    for nombre, proporcion in huevos["por_huevo"].items():
+        lineas.append(f"  {nombre}: {proporcion:.1%}")
+    return "\n".join(lineas)
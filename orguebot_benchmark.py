@@ -0,0 +1,787 @@
+"""Benchmarks de OrgueBot
+
+Uso:
+    python orguebot_benchmark.py arranque [--repeticiones 10] [--salida arranque.json]
+    python orguebot_benchmark.py rendimiento [--respuestas 10,1000,100000] [--preguntas-guardadas 1000,100000,1000000]
+                                             [--motor secuencia] [--memoria json] [--salida rendimiento.json]
+    python orguebot_benchmark.py carga [--sesiones 2000] [--concurrentes 500] [--motor secuencia] [--memoria diario]
+                                       [--reproducir memoria_orguebot.json] [--salida carga.json]
+    python orguebot_benchmark.py comparar anterior.json nuevo.json [--tolerancia 0.2]
+
+`arranque` mide en procesos nuevos (en frío) el tiempo de `import OrgueBot` con `python -X importtime`
+y el tiempo hasta la primera respuesta, y falla si se superan los objetivos.
+
+`rendimiento` genera bases de conocimientos y memorias sintéticas (reproducibles con --semilla) y mide
+latencias (percentiles), operaciones por segundo y pico de memoria del camino de respuesta y de la memoria.
+
+`carga` simula miles de sesiones intercaladas sobre un único bot en el mismo proceso, sin red: reproduce
+las conversaciones de una memoria guardada y mezcla sesiones sintéticas (saludos, ayuda, easter eggs,
+preguntas, seguimientos y despedidas). Mide la latencia de extremo a extremo de cada mensaje, el crecimiento
+de la memoria del proceso y las escrituras de la memoria del bot por sesión.
+
+`comparar` contrasta dos resultados de `rendimiento` o `carga` y falla si alguna latencia empeora más de la tolerancia.
+"""
+import argparse
+import json
+import os
+import platform
+import py_compile
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import OrgueBot
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+
+# Objetivos de arranque en frío para los trabajadores que se lanzan bajo demanda
+OBJETIVO_IMPORTACION_MS = 50
+OBJETIVO_PRIMERA_RESPUESTA_MS = 100
+
+# Se ejecuta en un proceso nuevo: importar, construir el bot y responder una pregunta
+PROGRAMA_PRIMERA_RESPUESTA = """
+import json, os, sys, time
+inicio = time.perf_counter()
+import OrgueBot
+importado = time.perf_counter()
+bot = OrgueBot.OrgueBot(memoria=OrgueBot.OrgueBotMemoria(os.path.join(sys.argv[1], "memoria.json")))
+construido = time.perf_counter()
+bot.responder_pregunta("¿Cuál es el origen del órgano musical?")
+respondido = time.perf_counter()
+print(json.dumps({
+    "importacion_ms": (importado - inicio) * 1000,
+    "construccion_ms": (construido - importado) * 1000,
+    "primera_respuesta_ms": (respondido - inicio) * 1000,
+}))
+"""
+
+
+def _medir_importtime():
+    """Devuelve el tiempo acumulado (ms) de importar OrgueBot según `python -X importtime`"""
+    proceso = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import OrgueBot"],
+        cwd=DIRECTORIO, capture_output=True, text=True, check=True
+    )
+    for linea in proceso.stderr.splitlines():
+        # Formato: "import time: propio | acumulado | módulo"
+        partes = [parte.strip() for parte in linea.split("|")]
+        if len(partes) == 3 and partes[2] == "OrgueBot":
+            return int(partes[1]) / 1000
+    raise RuntimeError("No se encontró OrgueBot en la salida de -X importtime")
+
+
+def _medir_primera_respuesta(directorio_temporal):
+    """Mide en un proceso nuevo la importación, la construcción del bot y la primera respuesta"""
+    proceso = subprocess.run(
+        [sys.executable, "-c", PROGRAMA_PRIMERA_RESPUESTA, directorio_temporal],
+        cwd=DIRECTORIO, capture_output=True, text=True, check=True
+    )
+    return json.loads(proceso.stdout.strip().splitlines()[-1])
+
+
+def _resumen(valores):
+    """Mediana, mínimo y máximo de una lista de tiempos"""
+    return {
+        "mediana_ms": statistics.median(valores),
+        "min_ms": min(valores),
+        "max_ms": max(valores),
+    }
+
+
+def benchmark_arranque(repeticiones=10):
+    """Mide el arranque en frío y lo compara con los objetivos"""
+    # Generar el .pyc para no medir la compilación (aunque PYTHONDONTWRITEBYTECODE esté activo)
+    py_compile.compile(os.path.join(DIRECTORIO, "OrgueBot.py"))
+
+    importtime = [_medir_importtime() for _ in range(repeticiones)]
+    with tempfile.TemporaryDirectory() as directorio_temporal:
+        mediciones = [_medir_primera_respuesta(directorio_temporal) for _ in range(repeticiones)]
+
+    resultado = {
+        "repeticiones": repeticiones,
+        "python": sys.version.split()[0],
+        "importtime": _resumen(importtime),
+        "construccion": _resumen([m["construccion_ms"] for m in mediciones]),
+        "primera_respuesta": _resumen([m["primera_respuesta_ms"] for m in mediciones]),
+        "objetivos": {
+            "importacion_ms": OBJETIVO_IMPORTACION_MS,
+            "primera_respuesta_ms": OBJETIVO_PRIMERA_RESPUESTA_MS,
+        },
+    }
+    resultado["cumple_objetivos"] = (
+        resultado["importtime"]["mediana_ms"] <= OBJETIVO_IMPORTACION_MS
+        and resultado["primera_respuesta"]["mediana_ms"] <= OBJETIVO_PRIMERA_RESPUESTA_MS
+    )
+    return resultado
+
+
+# Tamaños por defecto de las bases sintéticas
+TAMANOS_RESPUESTAS = [10, 1000, 100000]
+TAMANOS_PREGUNTAS_GUARDADAS = [1000, 100000, 1000000]
+PERCENTILES = (50, 90, 99)
+
+# Plantillas de preguntas sobre una palabra clave de la categoría
+PLANTILLAS_PREGUNTAS = [
+    "¿Qué sabes sobre {}?",
+    "Háblame de {} en el órgano",
+    "¿Cuál es la relación entre el órgano y {}?",
+    "Quiero aprender sobre {}",
+    "¿Me cuentas algo de {}?",
+]
+# Palabras sin relación con los órganos, para preguntas que no deberían tener categoría
+PALABRAS_AJENAS = ["fútbol", "pizza", "tiempo", "coche", "playa", "película", "gato", "lunes", "tren", "ciudad"]
+
+
+def generar_base_conocimientos(n_respuestas, semilla=0):
+    """Base de conocimientos sintética con el formato de conocimientos_orguebot.json y n respuestas en total"""
+    aleatorio = random.Random(semilla)
+    with open(OrgueBot.RUTA_CONOCIMIENTOS, 'r', encoding='utf-8') as archivo:
+        datos = json.load(archivo)
+
+    # Vocabulario de cada categoría: sus respuestas reales y sus palabras clave
+    vocabulario = {
+        categoria: sorted({palabra for respuesta in respuestas for palabra in OrgueBot.tokenizar_palabras(respuesta)})
+        for categoria, respuestas in datos["conocimientos"].items()
+    }
+    categorias = list(datos["conocimientos"])
+    conocimientos = {categoria: [] for categoria in categorias}
+    for i in range(n_respuestas):
+        categoria = categorias[i % len(categorias)]
+        palabras = aleatorio.choices(vocabulario[categoria], k=aleatorio.randint(12, 30))
+        if aleatorio.random() < 0.5:
+            palabras.insert(aleatorio.randrange(len(palabras)), aleatorio.choice(datos["palabras_clave_categoria"][categoria]))
+        conocimientos[categoria].append(" ".join(palabras).capitalize() + ".")
+    # Toda categoría necesita al menos una respuesta
+    for categoria in categorias:
+        if not conocimientos[categoria]:
+            conocimientos[categoria] = datos["conocimientos"][categoria][:1]
+    datos["conocimientos"] = conocimientos
+    return datos
+
+
+def generar_preguntas(datos, n, semilla=0):
+    """Corpus de preguntas con repeticiones (popularidad tipo Zipf): por palabra clave, fragmentos de respuestas y ajenas"""
+    aleatorio = random.Random(semilla)
+    categorias = list(datos["conocimientos"])
+    distintas = []
+    for _ in range(max(1, n // 4)):
+        tipo = aleatorio.random()
+        categoria = aleatorio.choice(categorias)
+        if tipo < 0.5:
+            clave = aleatorio.choice(datos["categorias_palabras"][categoria])
+            distintas.append(aleatorio.choice(PLANTILLAS_PREGUNTAS).format(clave))
+        elif tipo < 0.8:
+            palabras = aleatorio.choice(datos["conocimientos"][categoria]).split()
+            inicio = aleatorio.randrange(max(1, len(palabras) - 6))
+            distintas.append(" ".join(palabras[inicio:inicio + aleatorio.randint(4, 8)]) + "?")
+        else:
+            distintas.append(" ".join(aleatorio.choices(PALABRAS_AJENAS, k=aleatorio.randint(2, 6))))
+    pesos = [1 / (rango + 1) for rango in range(len(distintas))]
+    return aleatorio.choices(distintas, weights=pesos, k=n)
+
+
+def generar_memoria(n_preguntas, datos, semilla=0):
+    """Memoria sintética con el formato de memoria_orguebot.json y n preguntas guardadas"""
+    aleatorio = random.Random(semilla)
+    categorias = list(datos["conocimientos"])
+    preguntas = {}
+    for i, pregunta in enumerate(generar_preguntas(datos, n_preguntas, semilla)):
+        # El sufijo hace única cada pregunta; las frecuencias siguen una cola larga
+        preguntas[f"{pregunta.lower()} #{i}"] = {
+            "categoria": aleatorio.choice(categorias),
+            "frecuencia": int(1 / aleatorio.random() ** 0.7),
+        }
+    return {"conversaciones": [], "preguntas_frecuentes": preguntas, "feedback": {}, "huevos_pascua_encontrados": []}
+
+
+def _percentil(ordenadas, percentil):
+    """Percentil con interpolación lineal sobre una lista ordenada"""
+    posicion = (len(ordenadas) - 1) * percentil / 100
+    inferior = int(posicion)
+    superior = min(inferior + 1, len(ordenadas) - 1)
+    return ordenadas[inferior] + (ordenadas[superior] - ordenadas[inferior]) * (posicion - inferior)
+
+
+def _estadisticas(latencias, total):
+    """Percentiles, media y máximo (ms) y operaciones por segundo de una serie de latencias"""
+    ordenadas = sorted(latencias)
+    resultado = {"operaciones": len(ordenadas)}
+    if not ordenadas:
+        return resultado
+    for percentil in PERCENTILES:
+        resultado[f"p{percentil}_ms"] = _percentil(ordenadas, percentil) * 1000
+    resultado["media_ms"] = statistics.fmean(ordenadas) * 1000
+    resultado["max_ms"] = ordenadas[-1] * 1000
+    resultado["por_segundo"] = len(ordenadas) / total if total > 0 else None
+    return resultado
+
+
+def _medir(funcion, argumentos, tiempo_max=None):
+    """Llama a funcion con cada argumento y devuelve sus estadísticas; se detiene al pasar tiempo_max segundos"""
+    latencias = []
+    inicio = time.perf_counter()
+    for argumento in argumentos:
+        antes = time.perf_counter()
+        funcion(*argumento)
+        despues = time.perf_counter()
+        latencias.append(despues - antes)
+        if tiempo_max is not None and despues - inicio >= tiempo_max:
+            break
+    return _estadisticas(latencias, time.perf_counter() - inicio)
+
+
+def _pico_memoria(funcion):
+    """Ejecuta funcion y devuelve su resultado y el pico de memoria asignada por Python (MB)"""
+    tracemalloc.start()
+    try:
+        resultado = funcion()
+        pico = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return resultado, pico / 2 ** 20
+
+
+def benchmark_respuestas(n_respuestas, motor="secuencia", consultas=1000, tiempo_max=10.0, semilla=0):
+    """Mide categorizar_pregunta, _encontrar_respuesta_relevante y responder_pregunta sobre una base sintética"""
+    datos = generar_base_conocimientos(n_respuestas, semilla)
+    preguntas = generar_preguntas(datos, consultas, semilla)
+    with tempfile.TemporaryDirectory() as directorio_temporal:
+        ruta = os.path.join(directorio_temporal, "conocimientos.json")
+        with open(ruta, 'w', encoding='utf-8') as archivo:
+            json.dump(datos, archivo, ensure_ascii=False)
+
+        def crear_bot():
+            # Memoria SQLite en RAM: se mide el camino de respuesta, no la escritura en disco de la memoria
+            return OrgueBot.OrgueBot(motor_respuestas=motor, memoria=OrgueBot.OrgueBotMemoriaSQLite(":memory:"),
+                                     ruta_conocimientos=ruta)
+
+        random.seed(semilla)
+        inicio = time.perf_counter()
+        bot = crear_bot()
+        construccion_ms = (time.perf_counter() - inicio) * 1000
+
+        # Cada operación se mide en un bot recién creado: la primera pasada por preguntas distintas recorre el camino
+        # en frío (caché de respuestas y memorias de escaneos, palabras y rasgos vacías) y la segunda lo repite con todo ya calculado
+        distintas = [(pregunta,) for pregunta in dict.fromkeys(preguntas)]
+        categorias = [bot._categoria(pregunta) for (pregunta,) in distintas]
+        con_categoria = [(pregunta, categoria) for (pregunta,), categoria in zip(distintas, categorias) if categoria]
+        operaciones = {}
+        for nombre, argumentos in (("categorizar_pregunta", distintas),
+                                   ("_encontrar_respuesta_relevante", con_categoria),
+                                   ("responder_pregunta", distintas)):
+            funcion = getattr(crear_bot(), nombre)
+            operaciones[f"{nombre} (en frío)"] = _medir(funcion, argumentos, tiempo_max)
+            operaciones[f"{nombre} (en caliente)"] = _medir(funcion, argumentos, tiempo_max)
+
+        # Pico de memoria de construir el bot y responder una muestra, en una pasada aparte (tracemalloc ralentiza)
+        def construir_y_responder():
+            otro = crear_bot()
+            for pregunta in preguntas[:100]:
+                otro.responder_pregunta(pregunta)
+        _, pico = _pico_memoria(construir_y_responder)
+
+    return {
+        "respuestas": n_respuestas,
+        "motor": motor,
+        "preguntas_con_categoria": len(con_categoria) / len(distintas),
+        "construccion_ms": construccion_ms,
+        "pico_memoria_mb": pico,
+        "operaciones": operaciones,
+    }
+
+
+def benchmark_memoria(n_preguntas, tipo="json", consultas=1000, repeticiones=5, tiempo_max=10.0, semilla=0):
+    """Mide la carga, registrar_pregunta, obtener_sugerencias y guardar_memoria con n preguntas guardadas"""
+    datos = generar_base_conocimientos(10, semilla)
+    memoria_sintetica = generar_memoria(n_preguntas, datos, semilla)
+    nuevas = [(pregunta, categoria) for pregunta, categoria in zip(
+        generar_preguntas(datos, consultas, semilla + 1),
+        random.Random(semilla).choices(list(datos["conocimientos"]), k=consultas)
+    )]
+    with tempfile.TemporaryDirectory() as directorio_temporal:
+        if tipo == "sqlite":
+            ruta = os.path.join(directorio_temporal, "memoria.db")
+            memoria = OrgueBot.OrgueBotMemoriaSQLite(ruta)
+            memoria.importar(memoria_sintetica)
+            memoria.cerrar()
+        else:
+            ruta = os.path.join(directorio_temporal, "memoria.json")
+            with open(ruta, 'w', encoding='utf-8') as archivo:
+                json.dump(memoria_sintetica, archivo, ensure_ascii=False, indent=2)
+        tam_archivo = os.path.getsize(ruta)
+        del memoria_sintetica
+
+        abiertas = []
+        def cargar():
+            abiertas.append(OrgueBot.crear_memoria(tipo, ruta))
+        operaciones = {"carga": _medir(cargar, [()] * repeticiones, tiempo_max)}
+        for anterior in abiertas[:-1]:
+            if hasattr(anterior, "cerrar"):
+                anterior.cerrar()
+        memoria = abiertas[-1]
+
+        operaciones["registrar_pregunta"] = _medir(memoria.registrar_pregunta, nuevas, tiempo_max)
+        operaciones["obtener_sugerencias"] = _medir(memoria.obtener_sugerencias, [()] * consultas, tiempo_max)
+        operaciones["guardar_memoria"] = _medir(memoria.guardar_memoria, [()] * repeticiones, tiempo_max)
+        if hasattr(memoria, "cerrar"):
+            memoria.cerrar()
+
+        # Pico de memoria de cargar y guardar una vez
+        def cargar_y_guardar():
+            otra = OrgueBot.crear_memoria(tipo, ruta)
+            otra.guardar_memoria()
+            if hasattr(otra, "cerrar"):
+                otra.cerrar()
+        _, pico = _pico_memoria(cargar_y_guardar)
+
+    return {
+        "preguntas_guardadas": n_preguntas,
+        "tipo": tipo,
+        "tam_archivo_mb": tam_archivo / 2 ** 20,
+        "pico_memoria_mb": pico,
+        "operaciones": operaciones,
+    }
+
+
+def _rss_max_mb():
+    """Memoria residente máxima del proceso (MB), si el sistema la ofrece"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux la da en KB y macOS en bytes
+    return rss / 2 ** 20 if sys.platform == "darwin" else rss / 2 ** 10
+
+
+def _commit_actual():
+    """Commit de git del árbol medido, para saber qué versión produjo cada resultado"""
+    try:
+        proceso = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=DIRECTORIO, capture_output=True, text=True)
+    except OSError:
+        return None
+    return proceso.stdout.strip() or None
+
+
+def benchmark_rendimiento(tamanos_respuestas=TAMANOS_RESPUESTAS, tamanos_memoria=TAMANOS_PREGUNTAS_GUARDADAS,
+                          motor="secuencia", tipo_memoria="json", consultas=1000, repeticiones=5,
+                          tiempo_max=10.0, semilla=0, informar=print):
+    """Ejecuta todos los escenarios del camino de respuesta y de la memoria"""
+    resultado = {
+        "python": sys.version.split()[0],
+        "plataforma": platform.platform(),
+        "commit": _commit_actual(),
+        "parametros": {
+            "motor": motor,
+            "memoria": tipo_memoria,
+            "consultas": consultas,
+            "repeticiones": repeticiones,
+            "tiempo_max_s": tiempo_max,
+            "semilla": semilla,
+        },
+        "respuestas": [],
+        "memoria": [],
+    }
+    for n in tamanos_respuestas:
+        escenario = benchmark_respuestas(n, motor, consultas, tiempo_max, semilla)
+        resultado["respuestas"].append(escenario)
+        informar(_describir(f"{n} respuestas ({motor})", escenario))
+    for n in tamanos_memoria:
+        escenario = benchmark_memoria(n, tipo_memoria, consultas, repeticiones, tiempo_max, semilla)
+        resultado["memoria"].append(escenario)
+        informar(_describir(f"{n} preguntas guardadas ({tipo_memoria})", escenario))
+    resultado["rss_max_mb"] = _rss_max_mb()
+    return resultado
+
+
+# Sesiones sintéticas de la prueba de carga
+SALUDOS = ["hola", "buenas", "buenos días", "hola, ¿qué tal?", "saludos"]
+PREGUNTAS_SEGUIMIENTO = ["¿y quién más?", "¿y otro?", "cuéntame más", "¿quién era él?"]
+# Parte de las sesiones se abandonan sin despedirse (y no se guardan como conversación)
+PROPORCION_ABANDONO = 0.1
+MAX_GUIONES_REPRODUCIDOS = 10000
+MUESTRAS_MEMORIA = 20
+
+
+class MemoriaMedida:
+    """Envuelve la memoria del bot y cuenta las llamadas y el tiempo de cada escritura"""
+    ESCRITURAS = ("registrar_pregunta", "registrar_conversacion", "registrar_easter_egg", "guardar_memoria", "cerrar")
+
+    def __init__(self, memoria):
+        self.memoria = memoria
+        self.llamadas = {}
+        self.segundos = {}
+        for metodo in self.ESCRITURAS:
+            if hasattr(memoria, metodo):
+                self.llamadas[metodo] = 0
+                self.segundos[metodo] = 0.0
+                setattr(self, metodo, self._medir(metodo, getattr(memoria, metodo)))
+
+    def _medir(self, metodo, funcion):
+        def medida(*args):
+            inicio = time.perf_counter()
+            try:
+                return funcion(*args)
+            finally:
+                self.llamadas[metodo] += 1
+                self.segundos[metodo] += time.perf_counter() - inicio
+        return medida
+
+    def __getattr__(self, nombre):
+        return getattr(self.memoria, nombre)
+
+
+def _rss_actual_mb():
+    """Memoria residente actual del proceso (MB), en Linux"""
+    try:
+        with open("/proc/self/statm", 'r') as archivo:
+            paginas = int(archivo.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return paginas * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def _contadores_escritura():
+    """Bytes y llamadas de escritura del proceso hasta ahora según /proc/self/io (Linux)"""
+    try:
+        with open("/proc/self/io", 'r') as archivo:
+            valores = dict(linea.split(": ") for linea in archivo.read().splitlines())
+        return {"bytes": int(valores["wchar"]), "llamadas": int(valores["syscw"])}
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _tam_directorio(directorio):
+    """Bytes que ocupan los archivos de un directorio y sus subdirectorios"""
+    return sum(os.path.getsize(os.path.join(raiz, nombre)) for raiz, _, nombres in os.walk(directorio) for nombre in nombres)
+
+
+def cargar_guiones(ruta, maximo=MAX_GUIONES_REPRODUCIDOS):
+    """Mensajes del usuario de cada conversación guardada en una memoria (JSON con su diario, o SQLite si es .db)"""
+    import orguebot_analitica
+    tipo = "sqlite" if ruta.endswith(".db") else "json"
+    guiones = []
+    for evento in orguebot_analitica.recorrer_memoria(tipo, ruta):
+        if evento["tipo"] != "conversacion":
+            continue
+        guion = [intercambio["mensaje"] for intercambio in evento["intercambios"] if intercambio["rol"] == "usuario"]
+        if guion:
+            guiones.append(guion)
+            if len(guiones) >= maximo:
+                break
+    return guiones
+
+
+def generar_guion(aleatorio, preguntas, claves_huevos):
+    """Mensajes de una sesión sintética: saludo, ayuda, preguntas, seguimientos, easter eggs y despedida"""
+    guion = [aleatorio.choice(SALUDOS)]
+    if aleatorio.random() < 0.3:
+        guion.append(aleatorio.choice(["ayuda", "?"]))
+    for _ in range(aleatorio.randint(2, 8)):
+        tipo = aleatorio.random()
+        if tipo < 0.6:
+            guion.append(aleatorio.choice(preguntas))
+        elif tipo < 0.8:
+            guion.append(aleatorio.choice(PREGUNTAS_SEGUIMIENTO))
+        elif tipo < 0.95:
+            guion.append(aleatorio.choice(claves_huevos))
+        else:
+            guion.append("ayuda")
+    if aleatorio.random() >= PROPORCION_ABANDONO:
+        guion.append(aleatorio.choice(OrgueBot.PALABRAS_DESPEDIDA))
+    return guion
+
+
+def _clasificar(bot, mensaje):
+    """Tipo de un mensaje para agrupar sus latencias (tras responderlo: el escaneo ya está en memoria)"""
+    if mensaje.lower().strip(" ,.!¿?") in SALUDOS:
+        return "saludo"
+    if bot.es_despedida(mensaje):
+        return "despedida"
+    if bot.es_ayuda(mensaje):
+        return "ayuda"
+    if bot._escanear(mensaje).huevo is not None or mensaje.lower().strip() in ("dato curioso", "modo divertido"):
+        return "easter_egg"
+    return "pregunta"
+
+
+def benchmark_carga(sesiones=2000, concurrentes=500, motor="secuencia", tipo_memoria="diario", reproducir=None,
+                    proporcion_reproducidas=0.5, semilla=0):
+    """Simula muchas sesiones intercaladas sobre un único bot en el mismo proceso, como el servidor asíncrono
+
+    Mide la latencia de cada mensaje de procesar_mensaje, el tiempo de servicio de cada sesión, el crecimiento
+    de la memoria del proceso y las escrituras de la memoria del bot (en un directorio temporal).
+    """
+    aleatorio = random.Random(semilla)
+    random.seed(semilla)
+    reproducidas = cargar_guiones(reproducir) if reproducir else []
+    with tempfile.TemporaryDirectory() as directorio_temporal:
+        ruta = os.path.join(directorio_temporal, os.path.basename(OrgueBot.RUTAS_MEMORIA[tipo_memoria]))
+        memoria = MemoriaMedida(OrgueBot.crear_memoria(tipo_memoria, ruta))
+        bot = OrgueBot.OrgueBot(motor_respuestas=motor, memoria=memoria)
+        datos = bot.base_conocimientos.datos
+        preguntas = generar_preguntas(datos, 1000, semilla)
+        claves_huevos = [egg["clave"] for egg in datos["easter_eggs"].values()] + ["dato curioso"]
+
+        def nuevo_guion():
+            if reproducidas and aleatorio.random() < proporcion_reproducidas:
+                return aleatorio.choice(reproducidas)
+            return generar_guion(aleatorio, preguntas, claves_huevos)
+
+        # Sesiones abiertas: [sesión, guion, mensajes respondidos, tiempo de servicio, instante del primer mensaje]
+        activas = []
+        iniciadas = 0
+        latencias = {}
+        servicio = []
+        duracion = []
+        mensajes_por_sesion = []
+        intervalo_muestras = max(1, sesiones // MUESTRAS_MEMORIA)
+        muestras = [{"sesiones": 0, "rss_mb": _rss_actual_mb(), "bloques": sys.getallocatedblocks()}]
+        escrituras_iniciales = _contadores_escritura()
+        inicio = time.perf_counter()
+        while activas or iniciadas < sesiones:
+            while len(activas) < concurrentes and iniciadas < sesiones:
+                activas.append([OrgueBot.SesionOrgueBot(), nuevo_guion(), 0, 0.0, None])
+                iniciadas += 1
+            # Se atiende un mensaje de una sesión al azar: los mensajes de todas las sesiones se intercalan
+            posicion = aleatorio.randrange(len(activas))
+            estado = activas[posicion]
+            mensaje = estado[1][estado[2]]
+            antes = time.perf_counter()
+            _, fin = bot.procesar_mensaje(mensaje, estado[0])
+            despues = time.perf_counter()
+            latencias.setdefault(_clasificar(bot, mensaje), []).append(despues - antes)
+            if estado[4] is None:
+                estado[4] = antes
+            estado[2] += 1
+            estado[3] += despues - antes
+            if fin or estado[2] == len(estado[1]):
+                servicio.append(estado[3])
+                duracion.append(despues - estado[4])
+                mensajes_por_sesion.append(estado[2])
+                activas[posicion] = activas[-1]
+                activas.pop()
+                if len(servicio) % intervalo_muestras == 0:
+                    muestras.append({"sesiones": len(servicio), "rss_mb": _rss_actual_mb(), "bloques": sys.getallocatedblocks()})
+        if hasattr(memoria, "cerrar"):
+            memoria.cerrar()
+        else:
+            memoria.guardar_memoria()
+        total = time.perf_counter() - inicio
+        escrituras_finales = _contadores_escritura()
+        tam_disco = _tam_directorio(directorio_temporal)
+
+    todas = [latencia for lista in latencias.values() for latencia in lista]
+    operaciones = {"mensaje": _estadisticas(todas, total)}
+    for tipo, lista in sorted(latencias.items()):
+        operaciones[f"mensaje ({tipo})"] = _estadisticas(lista, total)
+    operaciones["servicio de la sesión"] = _estadisticas(servicio, total)
+    operaciones["duración de la sesión"] = _estadisticas(duracion, total)
+
+    terminadas = len(servicio)
+    inicial, final = muestras[0], muestras[-1]
+    crecimiento_rss = final["rss_mb"] - inicial["rss_mb"] if final["rss_mb"] is not None and inicial["rss_mb"] is not None else None
+    persistencia = {
+        metodo: {"llamadas": memoria.llamadas[metodo], "total_ms": memoria.segundos[metodo] * 1000,
+                 "por_sesion_ms": memoria.segundos[metodo] * 1000 / terminadas if terminadas else None}
+        for metodo in memoria.llamadas
+    }
+    if escrituras_iniciales is not None and escrituras_finales is not None:
+        bytes_escritos = escrituras_finales["bytes"] - escrituras_iniciales["bytes"]
+        llamadas_escritura = escrituras_finales["llamadas"] - escrituras_iniciales["llamadas"]
+        persistencia["bytes_escritos_por_sesion"] = bytes_escritos / terminadas if terminadas else None
+        persistencia["escrituras_por_sesion"] = llamadas_escritura / terminadas if terminadas else None
+    persistencia["tam_final_mb"] = tam_disco / 2 ** 20
+
+    return {
+        "sesiones": terminadas,
+        "concurrentes": concurrentes,
+        "motor": motor,
+        "tipo": tipo_memoria,
+        "guiones_reproducidos": len(reproducidas),
+        "mensajes": len(todas),
+        "mensajes_por_sesion": statistics.fmean(mensajes_por_sesion) if mensajes_por_sesion else 0,
+        "duracion_s": total,
+        # _describir y comparar_resultados usan el pico de la serie de muestras
+        "pico_memoria_mb": max((muestra["rss_mb"] or 0) - (inicial["rss_mb"] or 0) for muestra in muestras),
+        "crecimiento_rss_mb": crecimiento_rss,
+        "kb_por_sesion": crecimiento_rss * 1024 / terminadas if crecimiento_rss is not None and terminadas else None,
+        "bloques_por_sesion": (final["bloques"] - inicial["bloques"]) / terminadas if terminadas else None,
+        "muestras_memoria": muestras,
+        "persistencia": persistencia,
+        "operaciones": operaciones,
+    }
+
+
+def _describir_carga(escenario):
+    """Resumen legible de una prueba de carga"""
+    lineas = [_describir(f"{escenario['sesiones']} sesiones ({escenario['concurrentes']} a la vez, "
+                         f"{escenario['motor']}, memoria {escenario['tipo']}), {escenario['mensajes']} mensajes "
+                         f"en {escenario['duracion_s']:.1f} s", escenario)]
+    if escenario["crecimiento_rss_mb"] is not None:
+        lineas.append(f"  memoria del proceso: +{escenario['crecimiento_rss_mb']:.1f} MB "
+                      f"({escenario['kb_por_sesion']:.2f} KB y {escenario['bloques_por_sesion']:.1f} bloques por sesión)")
+    persistencia = escenario["persistencia"]
+    for metodo in MemoriaMedida.ESCRITURAS:
+        if metodo in persistencia and persistencia[metodo]["llamadas"]:
+            medida = persistencia[metodo]
+            lineas.append(f"  {metodo:32} {medida['llamadas']:8} llamadas  {medida['por_sesion_ms']:9.3f} ms por sesión")
+    if "bytes_escritos_por_sesion" in persistencia:
+        lineas.append(f"  escrituras: {persistencia['bytes_escritos_por_sesion'] / 1024:.1f} KB y "
+                      f"{persistencia['escrituras_por_sesion']:.1f} llamadas por sesión; "
+                      f"memoria final en disco {persistencia['tam_final_mb']:.2f} MB")
+    return "\n".join(lineas)
+
+
+def _describir(titulo, escenario):
+    """Resumen legible de un escenario"""
+    lineas = [f"{titulo}: pico de memoria {escenario['pico_memoria_mb']:.1f} MB"]
+    for nombre, medida in escenario["operaciones"].items():
+        if not medida["operaciones"]:
+            lineas.append(f"  {nombre:44} sin operaciones")
+            continue
+        por_segundo = f"{medida['por_segundo']:.0f}/s" if medida["por_segundo"] else "-"
+        lineas.append(f"  {nombre:44} p50 {medida['p50_ms']:9.3f} ms  p99 {medida['p99_ms']:9.3f} ms  "
+                      f"{por_segundo:>10}  ({medida['operaciones']} ops)")
+    return "\n".join(lineas)
+
+
+def _escenarios(resultado):
+    """Escenarios de un resultado de rendimiento indexados por una clave estable"""
+    escenarios = {}
+    for escenario in resultado.get("respuestas", []):
+        escenarios[f"{escenario['respuestas']} respuestas ({escenario['motor']})"] = escenario
+    for escenario in resultado.get("memoria", []):
+        escenarios[f"{escenario['preguntas_guardadas']} preguntas guardadas ({escenario['tipo']})"] = escenario
+    for escenario in resultado.get("carga", []):
+        escenarios[f"carga de {escenario['sesiones']} sesiones ({escenario['concurrentes']} a la vez, "
+                   f"{escenario['motor']}, {escenario['tipo']})"] = escenario
+    return escenarios
+
+
+def comparar_resultados(anterior, nuevo, tolerancia=0.2, metricas=("p50_ms", "p99_ms")):
+    """Devuelve las regresiones (escenario, operación, métrica, antes, después) que superan la tolerancia"""
+    regresiones = []
+    escenarios_anteriores = _escenarios(anterior)
+    for clave, escenario in _escenarios(nuevo).items():
+        previo = escenarios_anteriores.get(clave)
+        if previo is None:
+            continue
+        for nombre, medida in escenario["operaciones"].items():
+            medida_previa = previo["operaciones"].get(nombre)
+            if not medida_previa or not medida_previa["operaciones"] or not medida["operaciones"]:
+                continue
+            for metrica in metricas:
+                if medida[metrica] > medida_previa[metrica] * (1 + tolerancia):
+                    regresiones.append((clave, nombre, metrica, medida_previa[metrica], medida[metrica]))
+        if escenario["pico_memoria_mb"] > previo["pico_memoria_mb"] * (1 + tolerancia):
+            regresiones.append((clave, "memoria", "pico_memoria_mb", previo["pico_memoria_mb"], escenario["pico_memoria_mb"]))
+    return regresiones
+
+
+def _lista_enteros(texto):
+    """Convierte "10,1000,100000" en [10, 1000, 100000] (una cadena vacía es una lista vacía)"""
+    return [int(valor) for valor in texto.split(",") if valor.strip()]
+
+
+def _cargar(ruta):
+    """Lee un resultado guardado con --salida"""
+    with open(ruta, 'r', encoding='utf-8') as archivo:
+        return json.load(archivo)
+
+
+def _guardar(resultado, ruta):
+    """Guarda los resultados en JSON para compararlos entre ejecuciones"""
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+        json.dump(resultado, archivo, ensure_ascii=False, indent=2)
+
+
+def main(argv=None):
+    """Punto de entrada de la línea de comandos"""
+    parser = argparse.ArgumentParser(description="Benchmarks de OrgueBot")
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+
+    arranque = subcomandos.add_parser("arranque", help="tiempo de importación y de primera respuesta en frío")
+    arranque.add_argument("--repeticiones", type=int, default=10)
+    arranque.add_argument("--salida", default=None, help="archivo JSON donde guardar los resultados")
+
+    rendimiento = subcomandos.add_parser("rendimiento", help="latencias, rendimiento y memoria con bases sintéticas")
+    rendimiento.add_argument("--respuestas", type=_lista_enteros, default=TAMANOS_RESPUESTAS,
+                             help="tamaños de la base de conocimientos, separados por comas")
+    rendimiento.add_argument("--preguntas-guardadas", type=_lista_enteros, default=TAMANOS_PREGUNTAS_GUARDADAS,
+                             help="tamaños de la memoria, separados por comas")
+    rendimiento.add_argument("--motor", choices=list(OrgueBot.MOTORES_RESPUESTA), default="secuencia")
+    rendimiento.add_argument("--memoria", choices=list(OrgueBot.MEMORIAS), default="json")
+    rendimiento.add_argument("--consultas", type=int, default=1000, help="preguntas por operación")
+    rendimiento.add_argument("--repeticiones", type=int, default=5, help="repeticiones de carga y guardar_memoria")
+    rendimiento.add_argument("--tiempo-max", type=float, default=10.0, help="segundos máximos por operación medida")
+    rendimiento.add_argument("--semilla", type=int, default=0)
+    rendimiento.add_argument("--salida", default=None, help="archivo JSON donde guardar los resultados")
+
+    carga = subcomandos.add_parser("carga", help="miles de sesiones simuladas sobre el bot en el mismo proceso")
+    carga.add_argument("--sesiones", type=int, default=2000, help="sesiones en total")
+    carga.add_argument("--concurrentes", type=int, default=500, help="sesiones abiertas a la vez")
+    carga.add_argument("--motor", choices=list(OrgueBot.MOTORES_RESPUESTA), default="secuencia")
+    carga.add_argument("--memoria", choices=list(OrgueBot.MEMORIAS), default="diario")
+    carga.add_argument("--reproducir", default=os.path.join(DIRECTORIO, "memoria_orguebot.json"),
+                       help="memoria cuyas conversaciones se reproducen (vacío: solo sesiones sintéticas)")
+    carga.add_argument("--proporcion-reproducidas", type=float, default=0.5,
+                       help="parte de las sesiones que reproducen una conversación guardada")
+    carga.add_argument("--semilla", type=int, default=0)
+    carga.add_argument("--salida", default=None, help="archivo JSON donde guardar los resultados")
+
+    comparar = subcomandos.add_parser("comparar", help="compara dos resultados de rendimiento y detecta regresiones")
+    comparar.add_argument("anterior")
+    comparar.add_argument("nuevo")
+    comparar.add_argument("--tolerancia", type=float, default=0.2, help="empeoramiento relativo permitido (0.2 = 20%%)")
+
+    args = parser.parse_args(argv)
+
+    if args.comando == "arranque":
+        resultado = benchmark_arranque(args.repeticiones)
+        print(f"import OrgueBot (-X importtime): {resultado['importtime']['mediana_ms']:.1f} ms "
+              f"(objetivo {OBJETIVO_IMPORTACION_MS} ms)")
+        print(f"Construcción del bot: {resultado['construccion']['mediana_ms']:.1f} ms")
+        print(f"Hasta la primera respuesta: {resultado['primera_respuesta']['mediana_ms']:.1f} ms "
+              f"(objetivo {OBJETIVO_PRIMERA_RESPUESTA_MS} ms)")
+        if args.salida:
+            _guardar(resultado, args.salida)
+        if not resultado["cumple_objetivos"]:
+            print("No se cumplen los objetivos de arranque")
+            sys.exit(1)
+
+    elif args.comando == "rendimiento":
+        resultado = benchmark_rendimiento(args.respuestas, args.preguntas_guardadas, args.motor, args.memoria,
+                                          args.consultas, args.repeticiones, args.tiempo_max, args.semilla)
+        if args.salida:
+            _guardar(resultado, args.salida)
+
+    elif args.comando == "carga":
+        escenario = benchmark_carga(args.sesiones, args.concurrentes, args.motor, args.memoria, args.reproducir or None,
+                                    args.proporcion_reproducidas, args.semilla)
+        print(_describir_carga(escenario))
+        if args.salida:
+            _guardar({
+                "python": sys.version.split()[0],
+                "plataforma": platform.platform(),
+                "commit": _commit_actual(),
+                "carga": [escenario],
+                "rss_max_mb": _rss_max_mb(),
+            }, args.salida)
+
+    elif args.comando == "comparar":
+        regresiones = comparar_resultados(_cargar(args.anterior), _cargar(args.nuevo), args.tolerancia)
+        for clave, operacion, metrica, antes, despues in regresiones:
+            print(f"{clave} / {operacion}: {metrica} {antes:.3f} -> {despues:.3f}")
+        if regresiones:
+            print(f"{len(regresiones)} regresiones por encima del {args.tolerancia:.0%}")
+            sys.exit(1)
+        print("Sin regresiones")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+"""Servidor asíncrono de OrgueBot para atender muchas sesiones a la vez
+
+Protocolo de líneas sobre TCP: cada conexión es una sesión, el cliente envía un mensaje por línea
+y el servidor contesta con líneas que empiezan por "Bot: ". Se puede probar con `nc 127.0.0.1 8765`.
+
+Con varios trabajadores (pre-fork), el proceso padre carga los conocimientos una vez y los procesos
+hijos los comparten copia-en-escritura; todas las escrituras de memoria van a un único proceso escritor.
+"""
+import asyncio
+import contextlib
+import json
+import queue
+import random
+import signal
+from concurrent.futures import ThreadPoolExecutor
+
+from OrgueBot import RUTA_CONOCIMIENTOS, OrgueBot, OrgueBotMemoria, SesionOrgueBot
+
+
+def aplicar_escrituras(memoria, lote):
+    """Aplica en la memoria real una lista de (método, argumentos) guardando una sola vez"""
+    with memoria.en_lote():
+        for metodo, argumentos in lote:
+            try:
+                getattr(memoria, metodo)(*argumentos)
+            except Exception as e:
+                print(f"Error al escribir memoria: {e}")
+
+
+class MemoriaEnCola:
+    """Memoria compartida por todas las sesiones: las escrituras se encolan y las aplica una única tarea escritora"""
+    def __init__(self, memoria, n_sugerencias=3):
+        self.memoria = memoria
+        self.n_sugerencias = n_sugerencias
+        self.cola = asyncio.Queue()
+        # Un solo hilo: las escrituras nunca se solapan y no bloquean el bucle de eventos
+        self.ejecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="orguebot-memoria")
+        self.huevos = set(memoria.huevos_encontrados())
+        self.sugerencias = memoria.obtener_sugerencias(n_sugerencias)
+
+    def registrar_conversacion(self, conversacion):
+        """Encola una conversación completa"""
+        self.cola.put_nowait(("registrar_conversacion", (list(conversacion),)))
+
+    def registrar_pregunta(self, pregunta, categoria):
+        """Encola una pregunta frecuente y su categoría"""
+        self.cola.put_nowait(("registrar_pregunta", (pregunta, categoria)))
+
+    def registrar_easter_egg(self, nombre):
+        """Encola un huevo de pascua y devuelve si es nuevo"""
+        if nombre in self.huevos:
+            return False
+        self.huevos.add(nombre)
+        self.cola.put_nowait(("registrar_easter_egg", (nombre,)))
+        return True
+
+    def huevos_encontrados(self):
+        """Devuelve los nombres de los huevos de pascua encontrados"""
+        return list(self.huevos)
+
+    def en_lote(self):
+        """Las escrituras ya se agrupan en la tarea escritora"""
+        return contextlib.nullcontext(self)
+
+    def obtener_sugerencias(self, n=3):
+        """Devuelve las preguntas más frecuentes calculadas tras el último lote escrito"""
+        return self.sugerencias[:n]
+
+    def _aplicar_lote(self, lote):
+        """Aplica en la memoria real un lote de escrituras (se ejecuta en el hilo escritor)"""
+        aplicar_escrituras(self.memoria, lote)
+        self.sugerencias = self.memoria.obtener_sugerencias(self.n_sugerencias)
+
+    async def escritor(self):
+        """Tarea escritora: vacía la cola por lotes y los aplica en orden"""
+        bucle = asyncio.get_running_loop()
+        while True:
+            lote = [await self.cola.get()]
+            while not self.cola.empty():
+                lote.append(self.cola.get_nowait())
+            try:
+                await bucle.run_in_executor(self.ejecutor, self._aplicar_lote, lote)
+            finally:
+                for _ in lote:
+                    self.cola.task_done()
+
+    async def cerrar(self):
+        """Espera a que se escriba todo lo encolado y libera la memoria real"""
+        await self.cola.join()
+        self.ejecutor.shutdown()
+        if hasattr(self.memoria, "cerrar"):
+            self.memoria.cerrar()
+
+
+class ServidorOrgueBot:
+    """Servidor TCP que crea una SesionOrgueBot por conexión sobre un único OrgueBot compartido"""
+    def __init__(self, bot, host="127.0.0.1", puerto=8765):
+        self.bot = bot
+        self.host = host
+        self.puerto = puerto
+        self.sesiones_activas = 0
+
+    async def _enviar(self, escritor, texto):
+        """Envía una línea al cliente"""
+        escritor.write((texto + "\n").encode("utf-8"))
+        await escritor.drain()
+
+    async def atender(self, lector, escritor):
+        """Atiende una conexión: el mismo flujo que OrgueBot.iniciar pero sin bloquear a las demás"""
+        sesion = SesionOrgueBot()
+        self.sesiones_activas += 1
+        try:
+            await self._enviar(escritor, f"Bot: {random.choice(self.bot.mensajes['saludos'])}")
+            await self._enviar(escritor, "Bot: Escribe 'ayuda' en cualquier momento para ver opciones.")
+            while True:
+                # Mostrar sugerencias cada 5 intercambios
+                if len(sesion.conversacion_actual) % 5 == 0 and sesion.conversacion_actual:
+                    sugerencias = self.bot.memoria.obtener_sugerencias()
+                    if sugerencias:
+                        await self._enviar(escritor, f"Bot: {self.bot.mensajes['sugerencias']}")
+                        for i, sugerencia in enumerate(sugerencias, 1):
+                            await self._enviar(escritor, f"Bot: {i}. {sugerencia}")
+                    else:
+                        await self._enviar(escritor, f"Bot: {self.bot.mensajes['ayuda']}")
+
+                linea = await lector.readline()
+                if not linea:
+                    break
+                mensaje = linea.decode("utf-8", errors="replace").rstrip("\r\n")
+                respuesta, terminar = self.bot.procesar_mensaje(mensaje, sesion)
+                await self._enviar(escritor, f"Bot: {respuesta}")
+                if terminar:
+                    break
+        except (ConnectionError, ValueError):
+            # Cliente desconectado o línea más larga que el límite del lector
+            pass
+        finally:
+            self.sesiones_activas -= 1
+            escritor.close()
+
+    async def servir(self, sock=None):
+        """Acepta conexiones hasta que se cancele la tarea (en `sock` si ya está abierto, como en los trabajadores)"""
+        if sock is not None:
+            servidor = await asyncio.start_server(self.atender, sock=sock)
+        else:
+            servidor = await asyncio.start_server(self.atender, self.host, self.puerto, backlog=4096)
+            print(f"OrgueBot escuchando en {self.host}:{self.puerto}")
+        async with servidor:
+            await servidor.serve_forever()
+
+
+async def servir(host="127.0.0.1", puerto=8765, motor_respuestas="secuencia", memoria=None,
+                 ruta_conocimientos=RUTA_CONOCIMIENTOS, intervalo_recarga=None, instrumentacion=None):
+    """Arranca el servidor con una memoria compartida escrita por una sola tarea"""
+    memoria = memoria if memoria is not None else OrgueBotMemoria()
+    if instrumentacion is not None:
+        # Las escrituras reales se miden en el hilo escritor
+        instrumentacion.instrumentar(memoria)
+    memoria_en_cola = MemoriaEnCola(memoria)
+    bot = OrgueBot(motor_respuestas=motor_respuestas, memoria=memoria_en_cola,
+                   ruta_conocimientos=ruta_conocimientos, intervalo_recarga=intervalo_recarga,
+                   instrumentacion=instrumentacion)
+    tarea_escritora = asyncio.create_task(memoria_en_cola.escritor())
+    try:
+        await ServidorOrgueBot(bot, host, puerto).servir()
+    finally:
+        await memoria_en_cola.cerrar()
+        tarea_escritora.cancel()
+
+
+def ejecutar_servidor(host="127.0.0.1", puerto=8765, motor_respuestas="secuencia", memoria=None,
+                      ruta_conocimientos=RUTA_CONOCIMIENTOS, intervalo_recarga=None, instrumentacion=None):
+    """Ejecuta el servidor hasta que se interrumpa con Ctrl+C"""
+    try:
+        asyncio.run(servir(host, puerto, motor_respuestas, memoria, ruta_conocimientos, intervalo_recarga, instrumentacion))
+    except KeyboardInterrupt:
+        print("\nServidor detenido.")
+
+
+# Bytes de memoria compartida donde el escritor publica sugerencias y huevos de pascua encontrados
+TAM_ESTADO_COMPARTIDO = 64 * 1024
+
+
+class MemoriaCompartida:
+    """Memoria de un proceso trabajador: escribe por una cola al proceso escritor y lee lo que este publica"""
+    def __init__(self, cola, estado, version):
+        self.cola = cola
+        self.estado = estado
+        self.version = version
+        self._version_leida = None
+        self._publicado = {"sugerencias": [], "huevos": []}
+        # Huevos encontrados en este trabajador que quizá el escritor aún no ha publicado
+        self.huevos = set()
+
+    def _leer_publicado(self):
+        """Lo último que publicó el escritor (solo se vuelve a leer si cambió la versión)"""
+        if self.version.value != self._version_leida:
+            with self.estado.get_lock():
+                datos = self.estado.value
+                self._version_leida = self.version.value
+            if datos:
+                self._publicado = json.loads(datos.decode("utf-8"))
+        return self._publicado
+
+    def registrar_conversacion(self, conversacion):
+        """Envía una conversación completa al escritor"""
+        self.cola.put(("registrar_conversacion", (list(conversacion),)))
+
+    def registrar_pregunta(self, pregunta, categoria):
+        """Envía una pregunta frecuente y su categoría al escritor"""
+        self.cola.put(("registrar_pregunta", (pregunta, categoria)))
+
+    def registrar_easter_egg(self, nombre):
+        """Envía un huevo de pascua y devuelve si es nuevo (para todos los trabajadores salvo en la ventana de publicación)"""
+        if nombre in self.huevos or nombre in self._leer_publicado()["huevos"]:
+            return False
+        self.huevos.add(nombre)
+        self.cola.put(("registrar_easter_egg", (nombre,)))
+        return True
+
+    def huevos_encontrados(self):
+        """Devuelve los nombres de los huevos de pascua encontrados"""
+        huevos = list(self._leer_publicado()["huevos"])
+        return huevos + [nombre for nombre in self.huevos if nombre not in huevos]
+
+    def en_lote(self):
+        """Las escrituras ya se agrupan en el proceso escritor"""
+        return contextlib.nullcontext(self)
+
+    def obtener_sugerencias(self, n=3):
+        """Devuelve las preguntas más frecuentes publicadas tras el último lote escrito"""
+        return self._leer_publicado()["sugerencias"][:n]
+
+    def cerrar(self):
+        """Espera a que lo encolado por este proceso llegue al escritor"""
+        self.cola.close()
+        self.cola.join_thread()
+
+
+def _publicar_estado(memoria, estado, version, n_sugerencias):
+    """Escribe en la memoria compartida las sugerencias y los huevos encontrados"""
+    datos = json.dumps({
+        "sugerencias": memoria.obtener_sugerencias(n_sugerencias),
+        "huevos": memoria.huevos_encontrados(),
+    }, ensure_ascii=False).encode("utf-8")
+    if len(datos) >= len(estado):
+        print(f"Error al publicar el estado de la memoria: ocupa {len(datos)} bytes")
+        return
+    with estado.get_lock():
+        estado.value = datos
+        version.value += 1
+
+
+def _proceso_escritor(crear_memoria, cola, estado, version, n_sugerencias=3, max_lote=1000):
+    """Único proceso que escribe la memoria: aplica por lotes lo que envían los trabajadores hasta recibir None"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    memoria = crear_memoria()
+    _publicar_estado(memoria, estado, version, n_sugerencias)
+    terminar = False
+    while not terminar:
+        lote = [cola.get()]
+        while len(lote) < max_lote:
+            try:
+                lote.append(cola.get_nowait())
+            except queue.Empty:
+                break
+        if None in lote:
+            terminar = True
+            lote = [escritura for escritura in lote if escritura is not None]
+        aplicar_escrituras(memoria, lote)
+        _publicar_estado(memoria, estado, version, n_sugerencias)
+    if hasattr(memoria, "cerrar"):
+        memoria.cerrar()
+
+
+def _proceso_trabajador(bot, sock):
+    """Atiende conexiones del socket compartido con el bot heredado del padre hasta recibir SIGTERM"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    async def principal():
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        await ServidorOrgueBot(bot).servir(sock)
+
+    try:
+        asyncio.run(principal())
+    except asyncio.CancelledError:
+        pass
+    finally:
+        bot.memoria.cerrar()
+
+
+def ejecutar_servidor_multiproceso(host="127.0.0.1", puerto=8765, trabajadores=2, crear_memoria=OrgueBotMemoria,
+                                   motor_respuestas="secuencia", ruta_conocimientos=RUTA_CONOCIMIENTOS,
+                                   intervalo_recarga=None):
+    """Servidor pre-fork: N procesos trabajadores sobre un mismo socket y un proceso escritor de la memoria
+
+    crear_memoria se llama solo en el proceso escritor, que es el único que abre el archivo de memoria.
+    """
+    import ctypes
+    import gc
+    import multiprocessing
+    import socket
+    contexto = multiprocessing.get_context("fork")
+    cola = contexto.Queue()
+    estado = contexto.Array(ctypes.c_char, TAM_ESTADO_COMPARTIDO)
+    version = contexto.Value(ctypes.c_uint64, 0, lock=False)
+    # El escritor arranca antes de cargar los conocimientos: no los necesita
+    escritor = contexto.Process(target=_proceso_escritor, args=(crear_memoria, cola, estado, version),
+                                name="orguebot-escritor")
+    escritor.start()
+
+    bot = OrgueBot(motor_respuestas=motor_respuestas, memoria=MemoriaCompartida(cola, estado, version),
+                   ruta_conocimientos=ruta_conocimientos, intervalo_recarga=intervalo_recarga)
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, puerto))
+    sock.listen(4096)
+
+    # SIGTERM (el de systemd o kill) detiene el servidor igual que Ctrl+C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    # Lo cargado hasta aquí no lo recorrerá el recolector en los hijos, así sus páginas siguen compartidas
+    gc.freeze()
+    procesos = [contexto.Process(target=_proceso_trabajador, args=(bot, sock), name=f"orguebot-trabajador-{i}")
+                for i in range(trabajadores)]
+    for proceso in procesos:
+        proceso.start()
+    print(f"OrgueBot escuchando en {host}:{puerto} con {trabajadores} trabajadores")
+    try:
+        for proceso in procesos:
+            proceso.join()
+    except KeyboardInterrupt:
+        print("\nServidor detenido.")
+    finally:
+        # Un segundo Ctrl+C no debe dejar el escritor sin cerrar
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        for proceso in procesos:
+            if proceso.is_alive():
+                proceso.terminate()
+        for proceso in procesos:
+            proceso.join()
+        # Los trabajadores ya vaciaron sus colas: el escritor termina tras aplicar todo
+        cola.put(None)
+        escritor.join()
+        sock.close()
@@ -0,0 +1,71 @@
+import io
+import json
+
+import pytest
+
+from orguebot_analitica import LectorJSON
+
+CONVERSACIONES = [
+    {"fecha": "2024-01-01 10:00:00", "intercambios": [{"rol": "usuario", "mensaje": "¿Quién fue Bach? 🎹"}]},
+    {"fecha": "2024-01-02 11:30:00", "intercambios": [{"rol": "bot", "mensaje": "Órgano, ñandú, «cita» y \"comillas\""}],
+     "puntuacion": 12345.5, "etiquetas": [True, False, None, -7]},
+    {"fecha": "2024-01-03 09:15:00", "intercambios": []},
+]
+
+
+def lector(texto, tam_trozo):
+    lector = LectorJSON(io.StringIO(texto))
+    lector.TAM_TROZO = tam_trozo
+    return lector
+
+
+def leer_memoria(lector):
+    """Recorre un documento con la forma de la memoria como lo hace recorrer_memoria_json"""
+    leido = {}
+    for clave in lector.claves():
+        if clave == "conversaciones":
+            leido[clave] = list(lector.elementos())
+        else:
+            leido[clave] = lector.valor()
+    return leido
+
+
+def test_objetos_partidos_entre_trozos():
+    memoria = {"conversaciones": CONVERSACIONES, "preguntas_frecuentes": {"órgano": {"frecuencia": 1234567}},
+               "secuencia_diario": 98765}
+    for texto in (json.dumps(memoria, ensure_ascii=False), json.dumps(memoria, ensure_ascii=False, indent=2)):
+        # Con trozos de cualquier tamaño cada corte cae en un sitio distinto (cadenas, números, literales...)
+        for tam_trozo in range(1, 40):
+            assert leer_memoria(lector(texto, tam_trozo)) == memoria, tam_trozo
+
+
+def test_numero_al_final_de_un_trozo():
+    # "12" y luego "34": el número no termina donde acaba el primer trozo
+    assert list(lector("[12345, 6]", 3).elementos()) == [12345, 6]
+    assert lector("98765", 2).valor() == 98765
+
+
+def test_caracteres_utf8_partidos_entre_lecturas():
+    texto = json.dumps(CONVERSACIONES, ensure_ascii=False)
+    # El archivo de texto recibe los bytes de uno en uno: cada carácter multibyte llega partido
+    archivo = io.TextIOWrapper(io.BytesIO(texto.encode("utf-8")), encoding="utf-8")
+    archivo._CHUNK_SIZE = 1
+    lector_utf8 = LectorJSON(archivo)
+    lector_utf8.TAM_TROZO = 2
+    assert list(lector_utf8.elementos()) == CONVERSACIONES
+
+
+def test_objeto_final_truncado():
+    texto = json.dumps(CONVERSACIONES, ensure_ascii=False)
+    truncado = texto[:texto.rindex('"intercambios"')]
+    elementos = lector(truncado, 7).elementos()
+    assert [next(elementos), next(elementos)] == CONVERSACIONES[:2]
+    with pytest.raises(ValueError):
+        next(elementos)
+
+
+def test_lista_sin_cerrar():
+    elementos = lector("[1, 2", 1).elementos()
+    assert [next(elementos), next(elementos)] == [1, 2]
+    with pytest.raises(ValueError):
+        next(elementos)
@@ -0,0 +1,32 @@
+import orguebot_benchmark
+
+
+def test_corpus_reproducible():
+    datos = orguebot_benchmark.generar_base_conocimientos(50, semilla=3)
+    assert datos == orguebot_benchmark.generar_base_conocimientos(50, semilla=3)
+    assert sum(len(respuestas) for respuestas in datos["conocimientos"].values()) == 50
+    preguntas = orguebot_benchmark.generar_preguntas(datos, 200, semilla=3)
+    assert len(preguntas) == 200
+    assert preguntas == orguebot_benchmark.generar_preguntas(datos, 200, semilla=3)
+    memoria = orguebot_benchmark.generar_memoria(100, datos, semilla=3)
+    assert len(memoria["preguntas_frecuentes"]) == 100
+
+
+def test_benchmark_respuestas_pequeno():
+    resultado = orguebot_benchmark.benchmark_respuestas(20, consultas=30, tiempo_max=1.0)
+    assert resultado["respuestas"] == 20
+    assert 0 < resultado["preguntas_con_categoria"] <= 1
+    for medida in resultado["operaciones"].values():
+        assert 0 < medida["operaciones"] <= 30
+        assert medida["p50_ms"] <= medida["p99_ms"] <= medida["max_ms"]
+
+
+def test_comparar_detecta_regresiones():
+    anterior = orguebot_benchmark.benchmark_respuestas(20, consultas=10, tiempo_max=1.0)
+    # El mismo escenario con el p99 de todas las operaciones duplicado
+    operaciones = {nombre: dict(medida, p99_ms=medida["p99_ms"] * 2) for nombre, medida in anterior["operaciones"].items()}
+    nuevo = {"respuestas": [dict(anterior, operaciones=operaciones)]}
+    regresiones = orguebot_benchmark.comparar_resultados({"respuestas": [anterior]}, nuevo)
+    assert {regresion[1] for regresion in regresiones} == set(anterior["operaciones"])
+    assert all(regresion[2] == "p99_ms" for regresion in regresiones)
+    assert orguebot_benchmark.comparar_resultados({"respuestas": [anterior]}, {"respuestas": [anterior]}) == []
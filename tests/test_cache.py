@@ -0,0 +1,63 @@
+import pytest
+
+import OrgueBot
+from OrgueBot import CacheRespuestas
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    instante = [100.0]
+    monkeypatch.setattr(OrgueBot.time, "monotonic", lambda: instante[0])
+    return instante
+
+
+def test_caduca_tras_el_ttl(reloj):
+    cache = CacheRespuestas(ttl=10)
+    cache.guardar("órgano", "instrumentos")
+    reloj[0] += 9.9
+    assert cache.obtener("órgano") == (True, "instrumentos")
+    reloj[0] += 0.2
+    assert cache.obtener("órgano") == (False, None)
+    assert cache.estadisticas()["entradas"] == 0
+
+
+def test_expulsa_la_menos_usada():
+    cache = CacheRespuestas(max_entradas=2)
+    cache.guardar("a", 1)
+    cache.guardar("b", 2)
+    assert cache.obtener("a") == (True, 1)
+    cache.guardar("c", 3)
+    assert cache.obtener("b") == (False, None)
+    assert cache.obtener("a") == (True, 1)
+    assert cache.obtener("c") == (True, 3)
+    assert cache.estadisticas() == {"aciertos": 3, "fallos": 1, "tasa_aciertos": 0.75, "entradas": 2}
+
+
+def test_sin_entradas_no_guarda():
+    cache = CacheRespuestas(max_entradas=0)
+    cache.guardar("a", 1)
+    assert cache.obtener("a") == (False, None)
+
+
+@pytest.fixture
+def bot(tmp_path):
+    return OrgueBot.OrgueBot(memoria=OrgueBot.OrgueBotMemoria(str(tmp_path / "memoria.json")))
+
+
+def test_acierto_sigue_registrando_la_pregunta(bot):
+    primera = bot.responder_pregunta("¿Quién fue Bach?", OrgueBot.SesionOrgueBot())
+    segunda = bot.responder_pregunta("¿quién  fue Bach?", OrgueBot.SesionOrgueBot())
+    assert primera == segunda
+    assert bot.cache_respuestas.estadisticas()["aciertos"] == 1
+    # La memoria se actualiza aunque la respuesta venga de la caché
+    assert bot.memoria.memoria["preguntas_frecuentes"]["¿quién fue bach?"]["frecuencia"] == 1
+    assert bot.memoria.memoria["preguntas_frecuentes"]["¿quién  fue bach?"]["frecuencia"] == 1
+
+
+def test_recargar_conocimientos_vacia_la_cache(bot):
+    bot.responder_pregunta("¿Quién fue Bach?", OrgueBot.SesionOrgueBot())
+    assert bot.cache_respuestas.estadisticas()["entradas"] == 1
+    bot.cargar_conocimientos()
+    assert bot.cache_respuestas.estadisticas()["entradas"] == 0
+    bot.responder_pregunta("¿Quién fue Bach?", OrgueBot.SesionOrgueBot())
+    assert bot.cache_respuestas.estadisticas()["aciertos"] == 0
@@ -0,0 +1,33 @@
+import json
+import os
+import subprocess
+import sys
+
+import colorama
+
+import OrgueBot
+
+
+def test_importar_no_carga_nltk():
+    # En un proceso nuevo: los demás tests ya han importado otros módulos en este
+    programa = "import sys, json, OrgueBot; print(json.dumps([m for m in ('nltk', 'numpy', 'scipy') if m in sys.modules]))"
+    proceso = subprocess.run([sys.executable, "-c", programa], cwd=os.path.dirname(os.path.abspath(OrgueBot.__file__)),
+                             capture_output=True, text=True, check=True)
+    assert json.loads(proceso.stdout) == []
+
+
+def test_exportar_no_inicia_colorama(tmp_path, capsys, monkeypatch):
+    iniciados = []
+    monkeypatch.setattr(colorama, "init", lambda *args, **kwargs: iniciados.append(True))
+    monkeypatch.setattr(OrgueBot, "_colores_iniciados", False)
+    ruta = tmp_path / "memoria.json"
+    ruta.write_text(json.dumps({
+        "conversaciones": [{"fecha": "2024-01-01 10:00:00", "intercambios": [{"rol": "usuario", "mensaje": "hola"}]}],
+        "preguntas_frecuentes": {}, "huevos_pascua_encontrados": [], "feedback": {},
+    }), encoding="utf-8")
+
+    OrgueBot.main(["--ruta-memoria", str(ruta), "exportar"])
+
+    salida = capsys.readouterr().out.splitlines()
+    assert [json.loads(linea)["intercambios"] for linea in salida] == [[{"rol": "usuario", "mensaje": "hola"}]]
+    assert not iniciados
@@ -0,0 +1,85 @@
+import os
+import pickletools
+import shutil
+import struct
+import subprocess
+import sys
+
+import pytest
+
+import OrgueBot
+
+PREGUNTAS = ["¿Quién fue Buxtehude?", "¿qué me cuentas del compocitor Bach?", "ayuda", "adiós",
+             "¿Cuál es el órgano más grande del mundo?", "¿y Widor?", "cuanto cuesta un organo"]
+
+
+@pytest.fixture
+def ruta_conocimientos(tmp_path):
+    ruta = str(tmp_path / "conocimientos.json")
+    shutil.copy(OrgueBot.RUTA_CONOCIMIENTOS, ruta)
+    return ruta
+
+
+def compilar_por_linea_de_comandos(ruta_conocimientos):
+    # Como lo hace un usuario: el módulo se ejecuta como __main__, no como OrgueBot
+    subprocess.run([sys.executable, OrgueBot.__file__, "--conocimientos", ruta_conocimientos, "compilar"],
+                   capture_output=True, text=True, check=True)
+    return OrgueBot.ruta_compilada(ruta_conocimientos)
+
+
+def test_compilado_por_linea_de_comandos_se_carga_desde_otro_modulo(ruta_conocimientos, capsys):
+    ruta = compilar_por_linea_de_comandos(ruta_conocimientos)
+    compilada = OrgueBot._leer_compilado(ruta)
+    desde_json = OrgueBot._leer_json(ruta_conocimientos)
+
+    for pregunta in PREGUNTAS:
+        texto = pregunta.lower()
+        esperado, obtenido = desde_json.escaner.escanear(texto), compilada.escaner.escanear(texto)
+        assert [getattr(obtenido, campo) for campo in obtenido.__slots__] == [getattr(esperado, campo) for campo in esperado.__slots__]
+        assert compilada.indice_difuso.corregir_texto(texto) == desde_json.indice_difuso.corregir_texto(texto)
+        assert compilada.indice_entidades.buscar(texto) == desde_json.indice_entidades.buscar(texto)
+        assert compilada.indice_categorias.puntuar(texto) == desde_json.indice_categorias.puntuar(texto)
+    assert compilada.indice_entidades.menciones == desde_json.indice_entidades.menciones
+
+    # El bot usa el compilado sin volver al JSON
+    bot = OrgueBot.OrgueBot(memoria=OrgueBot.OrgueBotMemoriaSQLite(":memory:"), ruta_conocimientos=ruta_conocimientos)
+    assert "Error al leer" not in capsys.readouterr().out
+    assert "Buxtehude" in bot.responder_pregunta("¿Quién fue Buxtehude?", OrgueBot.SesionOrgueBot())
+
+
+def test_compilado_solo_guarda_datos(ruta_conocimientos):
+    ruta = compilar_por_linea_de_comandos(ruta_conocimientos)
+    with open(ruta, "rb") as archivo:
+        archivo.seek(struct.calcsize(OrgueBot.CABECERA_COMPILADO))
+        contenido = archivo.read()
+    # Sin referencias a clases ni funciones: nada depende del nombre con el que se importó el módulo
+    assert not [codigo.name for codigo, _, _ in pickletools.genops(contenido) if "GLOBAL" in codigo.name or "REDUCE" in codigo.name]
+
+
+class EjecutaAlCargar:
+    def __reduce__(self):
+        return (os.getcwd, ())
+
+
+def test_rechaza_un_compilado_con_objetos(ruta_conocimientos, capsys):
+    import pickle
+    contenido = pickle.dumps({"datos": EjecutaAlCargar()})
+    ruta = OrgueBot.ruta_compilada(ruta_conocimientos)
+    with open(ruta, "wb") as archivo:
+        archivo.write(struct.pack(OrgueBot.CABECERA_COMPILADO, OrgueBot.MAGIA_COMPILADO, OrgueBot.VERSION_COMPILADO, 0, len(contenido)))
+        archivo.write(contenido)
+    with pytest.raises(pickle.UnpicklingError):
+        OrgueBot._leer_compilado(ruta)
+
+    # Se carga el JSON en su lugar
+    base = OrgueBot.cargar_base_conocimientos(ruta_conocimientos)
+    assert "Error al leer" in capsys.readouterr().out
+    assert base.conocimientos == OrgueBot._leer_json(ruta_conocimientos).conocimientos
+
+
+def test_compilado_incompleto(ruta_conocimientos):
+    ruta = compilar_por_linea_de_comandos(ruta_conocimientos)
+    with open(ruta, "r+b") as archivo:
+        archivo.truncate(os.path.getsize(ruta) - 10)
+    with pytest.raises(ValueError, match="incompleto"):
+        OrgueBot._leer_compilado(ruta)
@@ -0,0 +1,44 @@
+import random
+
+import pytest
+
+import OrgueBot
+from OrgueBot import AutomataPatrones, EscanerMensajes
+
+
+def buscar_ingenuo(patrones, texto):
+    return sorted((inicio, indice) for indice, patron in enumerate(patrones)
+                  for inicio in range(len(texto)) if texto.startswith(patron, inicio))
+
+
+def test_automata_igual_que_la_busqueda_ingenua():
+    aleatorio = random.Random(0)
+    for _ in range(50):
+        patrones = list({"".join(aleatorio.choices("abc", k=aleatorio.randint(1, 4))) for _ in range(8)})
+        texto = "".join(aleatorio.choices("abcd", k=60))
+        assert sorted(AutomataPatrones(patrones).buscar(texto)) == buscar_ingenuo(patrones, texto)
+
+
+def test_automata_con_patrones_solapados():
+    patrones = ["órgano", "gano", "organista", "no"]
+    assert sorted(AutomataPatrones(patrones).buscar("el órgano")) == [(3, 0), (5, 1), (7, 3)]
+
+
+@pytest.fixture(scope="module")
+def base():
+    return OrgueBot.cargar_base_conocimientos(OrgueBot.RUTA_CONOCIMIENTOS)
+
+
+def test_escanear_encuentra_todo_en_una_pasada(base):
+    coincidencias = base.escaner.escanear("ayuda, ¿quién fue bach? adiós")
+    assert coincidencias.despedida and coincidencias.ayuda
+    assert "bach" in [palabra for _, palabra in coincidencias.claves]
+    assert base.escaner.escanear("hola").claves == []
+
+
+def test_primer_huevo_en_el_orden_de_la_base():
+    huevos = {"uno": {"clave": "bach"}, "dos": {"clave": "toca"}}
+    escaner = EscanerMensajes(huevos, [])
+    # Aparece antes "toca" en el texto, pero manda el orden de los easter eggs
+    assert escaner.escanear("toca algo de bach").huevo == "uno"
+    assert escaner.escanear("nada").huevo is None
@@ -0,0 +1,74 @@
+import random
+
+from OrgueBot import IndiceFrecuencias, OrgueBotMemoria, OrgueBotMemoriaSQLite
+
+
+def sugerencias_esperadas(registros, n, categoria=None):
+    """Ordenación de la memoria original: sorted estable por frecuencia sobre el orden de registro"""
+    preguntas = {}
+    for pregunta, cat in registros:
+        datos = preguntas.setdefault(pregunta, {"categoria": cat, "frecuencia": 0})
+        datos["frecuencia"] += 1
+    candidatas = [(p, d) for p, d in preguntas.items() if categoria is None or d["categoria"] == categoria]
+    return [p for p, _ in sorted(candidatas, key=lambda x: x[1]["frecuencia"], reverse=True)[:n]]
+
+
+def registros_aleatorios(semilla, n=400):
+    aleatorio = random.Random(semilla)
+    return [(f"pregunta {aleatorio.randint(0, 40)}", aleatorio.choice(["historia", "compositores"])) for _ in range(n)]
+
+
+def test_indice_igual_que_sorted_estable():
+    for semilla in range(20):
+        registros = registros_aleatorios(semilla)
+        indice = IndiceFrecuencias()
+        for pregunta, _ in registros:
+            indice.incrementar(pregunta)
+        for n in (1, 3, 10, 50):
+            assert indice.mas_frecuentes(n) == sugerencias_esperadas(registros, n)
+
+
+def test_empates_en_orden_de_registro():
+    indice = IndiceFrecuencias()
+    for pregunta in ["a", "b", "c", "c", "b", "a"]:
+        indice.incrementar(pregunta)
+    # Las tres llegan a 2 en orden c, b, a, pero se registraron en orden a, b, c
+    assert indice.mas_frecuentes(3) == ["a", "b", "c"]
+    assert indice.mas_frecuentes(2) == ["a", "b"]
+
+
+def test_memorias_json_y_sqlite_coinciden(tmp_path):
+    registros = [(p, "historia" if p < "pregunta 2" else "compositores") for p, _ in registros_aleatorios(7)]
+    json_ = OrgueBotMemoria(str(tmp_path / "memoria.json"))
+    sqlite = OrgueBotMemoriaSQLite(str(tmp_path / "memoria.db"))
+    with json_.en_lote(), sqlite.en_lote():
+        for pregunta, categoria in registros:
+            json_.registrar_pregunta(pregunta, categoria)
+            sqlite.registrar_pregunta(pregunta, categoria)
+    for n in (3, 10, 50):
+        assert json_.obtener_sugerencias(n) == sqlite.obtener_sugerencias(n) == sugerencias_esperadas(registros, n)
+        for categoria in ("historia", "compositores"):
+            assert (json_.obtener_sugerencias(n, categoria) == sqlite.obtener_sugerencias(n, categoria)
+                    == sugerencias_esperadas(registros, n, categoria))
+    # Tras recargar desde el archivo el orden se mantiene
+    assert OrgueBotMemoria(str(tmp_path / "memoria.json")).obtener_sugerencias(10) == sugerencias_esperadas(registros, 10)
+    sqlite.cerrar()
+
+
+class PreguntasContadas(list):
+    """Lista de preguntas del índice que cuenta cuántas se leen"""
+    leidas = 0
+
+    def __getitem__(self, posicion):
+        self.leidas += 1
+        return super().__getitem__(posicion)
+
+
+def test_leer_no_recorre_la_cubeta_entera():
+    indice = IndiceFrecuencias({f"pregunta {i}": 1 for i in range(100000)})
+    for pregunta in ["pregunta 500", "pregunta 7", "pregunta 99999", "pregunta 7"]:
+        indice.incrementar(pregunta)
+    indice.preguntas = PreguntasContadas(indice.preguntas)
+    assert indice.mas_frecuentes(5) == ["pregunta 7", "pregunta 500", "pregunta 99999", "pregunta 0", "pregunta 1"]
+    # Solo se leen las 5 preguntas devueltas, no las 99.997 empatadas a 1
+    assert indice.preguntas.leidas == 5
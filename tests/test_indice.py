@@ -0,0 +1,89 @@
+import json
+import os
+import random
+
+import pytest
+
+import OrgueBot
+
+
+def puntuar_lineal(categorias_palabras, palabras_alta_relevancia, pregunta):
+    """Puntuación original de categorizar_pregunta: recorre todas las palabras clave de cada categoría"""
+    pregunta_procesada = pregunta.lower()
+    puntuaciones = {categoria: 0 for categoria in categorias_palabras}
+    for categoria, palabras_clave in categorias_palabras.items():
+        for palabra in palabras_clave:
+            if palabra in pregunta_procesada:
+                puntuaciones[categoria] += 0.5
+        for palabra_pregunta in pregunta_procesada.split():
+            for palabra_clave in palabras_clave:
+                if palabra_pregunta in palabra_clave or palabra_clave in palabra_pregunta:
+                    if len(palabra_pregunta) >= 4:
+                        puntuaciones[categoria] += 0.3
+        for palabra in palabras_alta_relevancia.get(categoria, []):
+            if palabra in pregunta_procesada:
+                puntuaciones[categoria] += 1.0
+    return puntuaciones
+
+
+@pytest.fixture(scope="module")
+def base(tmp_path_factory):
+    ruta = tmp_path_factory.mktemp("memoria") / "memoria.json"
+    return OrgueBot.OrgueBot(memoria=OrgueBot.OrgueBotMemoria(str(ruta)))
+
+
+def generar_preguntas(base, n, semilla):
+    """Preguntas sintéticas que mezclan palabras clave de varias categorías con relleno"""
+    aleatorio = random.Random(semilla)
+    palabras = sorted({palabra for palabras in base.categorias_palabras.values() for palabra in palabras})
+    relleno = ["qué", "es", "el", "la", "de", "un", "cómo", "sobre", "órgano", "me", "cuentas"]
+    preguntas = []
+    for _ in range(n):
+        trozos = aleatorio.sample(palabras, aleatorio.randint(1, 3)) + aleatorio.sample(relleno, 3)
+        aleatorio.shuffle(trozos)
+        preguntas.append("¿" + " ".join(trozos) + "?")
+    return preguntas
+
+
+@pytest.fixture(scope="module")
+def preguntas(base):
+    """Preguntas guardadas, las propias respuestas y preguntas sintéticas hechas con palabras de la base"""
+    with open(os.path.join(os.path.dirname(OrgueBot.__file__), "memoria_orguebot.json"), encoding="utf-8") as archivo:
+        memoria = json.load(archivo)
+    guardadas = list(memoria["preguntas_frecuentes"])
+    respuestas = [respuesta for respuestas in base.conocimientos.values() for respuesta in respuestas]
+    return guardadas + respuestas + generar_preguntas(base, 2000, semilla=1)
+
+
+def test_puntuar_igual_que_el_recorrido_lineal(base, preguntas):
+    indice = OrgueBot.IndiceCategorias(base.categorias_palabras, base.palabras_alta_relevancia)
+    for pregunta in preguntas:
+        esperadas = puntuar_lineal(base.categorias_palabras, base.palabras_alta_relevancia, pregunta)
+        assert indice.puntuar(pregunta.lower()) == esperadas, pregunta
+        # Con las palabras clave que ya encontró el escáner de mensajes
+        claves = base.escaner.escanear(pregunta.lower()).claves
+        assert indice.puntuar(pregunta.lower(), claves) == esperadas, pregunta
+
+
+def test_indice_compilado_igual_que_el_construido(base, preguntas):
+    indice = OrgueBot.IndiceCategorias(base.categorias_palabras, base.palabras_alta_relevancia)
+    compilado = OrgueBot.IndiceCategorias.desde_estado(indice.estado())
+    for pregunta in preguntas[:500]:
+        assert compilado.puntuar(pregunta.lower()) == indice.puntuar(pregunta.lower())
+
+
+def test_puntuar_lote_igual_que_puntuar(base, preguntas):
+    pytest.importorskip("numpy")
+    indice = OrgueBot.IndiceCategorias(base.categorias_palabras, base.palabras_alta_relevancia)
+    # Bloques pequeños para que el lote se reparta en varios productos de matrices
+    indice.TAM_BLOQUE_LOTE = 100
+    procesadas = [pregunta.lower() for pregunta in preguntas]
+    puntuaciones = indice.puntuar_lote(procesadas, [base.escaner.escanear(pregunta).claves for pregunta in procesadas])
+    assert puntuaciones.shape == (len(preguntas), len(indice.categorias))
+    for fila, pregunta in zip(puntuaciones.tolist(), procesadas):
+        assert fila == list(indice.puntuar(pregunta).values()), pregunta
+
+
+def test_categorias_del_lote_igual_que_una_a_una(base, preguntas):
+    pytest.importorskip("numpy")
+    assert base._categorias(preguntas) == [base._categoria(pregunta) for pregunta in preguntas]
@@ -0,0 +1,62 @@
+import pytest
+
+import OrgueBot
+from OrgueBot import IndiceDifuso
+
+
+@pytest.fixture(scope="module")
+def bot():
+    return OrgueBot.OrgueBot(memoria=OrgueBot.OrgueBotMemoriaSQLite(":memory:"))
+
+
+def categoria(bot, pregunta):
+    return bot._analizar_sin_cache([pregunta])[0][0]
+
+
+def test_corrige_erratas_de_palabras_clave():
+    indice = IndiceDifuso(["compositor", "mantenimiento", "técnica"])
+    assert indice.corregir("compocitor") == "compositor"
+    assert indice.corregir("mantenimeinto") == "mantenimiento"
+    # Sin tildes no es una errata: se corrige aunque la palabra sea corta
+    assert indice.corregir("tecnica") == "técnica"
+    assert indice.corregir_texto("la tecnica del compocitor", erratas=False) == "la técnica del compocitor"
+    assert indice.corregir_texto("la técnica del compositor") == "la técnica del compositor"
+
+
+def test_no_corrige_palabras_corrientes():
+    indice = IndiceDifuso(["cuando", "autor", "famosos", "músico"], ["música", "cuanto"])
+    # Palabras conocidas, también sin tildes, y palabras demasiado cortas
+    assert indice.corregir("cuanto") is None
+    assert indice.corregir("cuánto") is None
+    assert indice.corregir("musica") is None
+    assert indice.corregir("autos") is None
+
+
+def test_no_corrige_otras_formas_de_la_palabra_clave():
+    indice = IndiceDifuso(["famosos", "restaurar", "estudio", "compositor", "importantes"])
+    # Solo cambia la terminación: es otra palabra bien escrita
+    for palabra in ["famosas", "restaurada", "restauran", "estudia", "compositora"]:
+        assert indice.corregir(palabra) is None
+    # Un error en la terminación que no es una flexión sí es una errata
+    assert indice.corregir("compositro") == "compositor"
+    # "importantes" tiene 11 letras: solo admite un error
+    assert indice.corregir("importantse") == "importantes"
+    assert indice.corregir("impactantes") is None
+
+
+@pytest.mark.parametrize("pregunta", [
+    "cuanto cuesta un organo", "cuanto pesa", "autos", "famosas", "¿me recomiendas autos famosas?",
+])
+def test_sin_categoria_para_preguntas_ajenas(bot, pregunta):
+    assert categoria(bot, pregunta) is None
+
+
+def test_una_errata_sola_no_da_categoria(bot):
+    assert categoria(bot, "¿qué me cuentas del compocitor?") is None
+    assert categoria(bot, "¿qué me cuentas del compocitor Bach?") == "compositores"
+    assert categoria(bot, "¿cómo es el mantenimeinto y el cuidado?") == "mantenimiento"
+
+
+def test_la_errata_no_cambia_la_categoria(bot):
+    # "cuanto" no se corrige a "cuando" (historia): manda la catedral
+    assert categoria(bot, "¿cuanto pesa el organo de la catedral?") == "organos_famosos"
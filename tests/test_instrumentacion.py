@@ -0,0 +1,36 @@
+import time
+
+import OrgueBot
+from OrgueBot import Instrumentacion, PerfiladorMuestreo, SumideroPrometheus
+
+
+def test_cuenta_aciertos_y_fallos_de_la_cache():
+    metricas = SumideroPrometheus()
+    bot = OrgueBot.OrgueBot(memoria=OrgueBot.OrgueBotMemoriaSQLite(":memory:"), instrumentacion=Instrumentacion([metricas]))
+    # Cada vez en una sesión nueva, para que no se resuelva como seguimiento de la anterior
+    for _ in range(3):
+        bot.responder_pregunta("¿Quién fue Bach?", OrgueBot.SesionOrgueBot())
+
+    assert metricas.resumen()["contadores"] == {"cache_fallos": 1, "cache_aciertos": 2}
+    texto = metricas.texto()
+    assert 'orguebot_eventos_total{evento="cache_aciertos"} 2' in texto
+    assert 'orguebot_eventos_total{evento="cache_fallos"} 1' in texto
+    assert 'orguebot_etapa_segundos_count{etapa="responder_pregunta"} 3' in texto
+
+
+def test_el_muestreo_solo_trabaja_mientras_se_responde():
+    perfilador = PerfiladorMuestreo(intervalo=0.001)
+    try:
+        time.sleep(0.05)
+        assert perfilador.total_muestras == 0
+        with perfilador:
+            limite = time.monotonic() + 5
+            while perfilador.total_muestras < 3 and time.monotonic() < limite:
+                sum(range(1000))
+        assert perfilador.total_muestras >= 3
+        total = perfilador.total_muestras
+        time.sleep(0.05)
+        assert perfilador.total_muestras == total
+    finally:
+        perfilador.detener()
+    assert not perfilador._hilo.is_alive()
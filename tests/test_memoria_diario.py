@@ -0,0 +1,109 @@
+import json
+import os
+import time
+
+import OrgueBot
+from OrgueBot import OrgueBotMemoriaDiario
+
+
+def crear_diario(tmp_path, **opciones):
+    return OrgueBotMemoriaDiario(str(tmp_path / "memoria.json"), intervalo_vaciado=3600, **opciones)
+
+
+def test_reproduce_el_diario_tras_una_caida(tmp_path):
+    memoria = crear_diario(tmp_path)
+    memoria.registrar_pregunta("¿Quién fue Bach?", "compositores")
+    memoria.registrar_pregunta("¿Quién fue Bach?", "compositores")
+    memoria.registrar_easter_egg("bach")
+    memoria.vaciar()
+    # Caída a mitad de una escritura: la última línea queda sin terminar
+    with open(memoria.ruta_diario, "a", encoding="utf-8") as diario:
+        diario.write('{"tipo": "pregunta", "pregunta": "a medias"')
+    tam_valido = os.path.getsize(memoria.ruta_diario) - len('{"tipo": "pregunta", "pregunta": "a medias"')
+
+    recuperada = crear_diario(tmp_path)
+    assert recuperada.memoria["preguntas_frecuentes"]["¿quién fue bach?"]["frecuencia"] == 2
+    assert recuperada.huevos_encontrados() == ["bach"]
+    assert "a medias" not in recuperada.memoria["preguntas_frecuentes"]
+    assert os.path.getsize(recuperada.ruta_diario) == tam_valido
+
+
+def test_no_reaplica_eventos_ya_compactados(tmp_path):
+    memoria = crear_diario(tmp_path)
+    memoria.registrar_pregunta("órgano", "instrumentos")
+    memoria.vaciar()
+    memoria.guardar_memoria()
+    # El diario se vació tras la instantánea; volver a escribirlo simula una caída antes de truncarlo
+    with open(memoria.ruta_diario, "w", encoding="utf-8") as diario:
+        diario.write(json.dumps({"tipo": "pregunta", "pregunta": "órgano", "categoria": "instrumentos",
+                                 "secuencia": 1}) + "\n")
+
+    recuperada = crear_diario(tmp_path)
+    assert recuperada.memoria["preguntas_frecuentes"]["órgano"]["frecuencia"] == 1
+
+
+def test_conserva_los_pendientes_si_falla_la_instantanea(tmp_path, monkeypatch):
+    memoria = crear_diario(tmp_path)
+    memoria.registrar_pregunta("órgano", "instrumentos")
+    monkeypatch.setattr(memoria, "_serializar", lambda: 1 / 0)
+    memoria.guardar_memoria()
+    assert len(memoria.pendientes) == 1
+    assert memoria in OrgueBot._diarios_pendientes
+
+    monkeypatch.undo()
+    memoria.cerrar()
+    assert memoria.pendientes == []
+    assert memoria not in OrgueBot._diarios_pendientes
+    assert crear_diario(tmp_path).memoria["preguntas_frecuentes"]["órgano"]["frecuencia"] == 1
+
+
+def test_un_solo_manejador_de_salida(tmp_path):
+    memorias = []
+    for i in range(3):
+        (tmp_path / str(i)).mkdir()
+        memorias.append(crear_diario(tmp_path / str(i)))
+    for memoria in memorias:
+        memoria.registrar_pregunta("órgano", "instrumentos")
+    assert all(memoria in OrgueBot._diarios_pendientes for memoria in memorias)
+
+    OrgueBot._vaciar_diarios_pendientes()
+    assert not any(memoria in OrgueBot._diarios_pendientes for memoria in memorias)
+    assert all(os.path.getsize(memoria.ruta_diario) > 0 for memoria in memorias)
+
+
+def test_vacia_por_tiempo_sin_mas_eventos(tmp_path):
+    memoria = OrgueBotMemoriaDiario(str(tmp_path / "memoria.json"), intervalo_vaciado=0.05)
+    memoria.registrar_pregunta("órgano", "instrumentos")
+    assert memoria.pendientes
+    limite = time.monotonic() + 5
+    while memoria.pendientes and time.monotonic() < limite:
+        time.sleep(0.01)
+    assert memoria.pendientes == []
+    assert memoria not in OrgueBot._diarios_pendientes
+    assert crear_diario(tmp_path).memoria["preguntas_frecuentes"]["órgano"]["frecuencia"] == 1
+
+
+def test_el_temporizador_espera_al_final_del_lote(tmp_path):
+    memoria = OrgueBotMemoriaDiario(str(tmp_path / "memoria.json"), intervalo_vaciado=0.05)
+    memoria.registrar_pregunta("órgano", "instrumentos")
+    with memoria.en_lote():
+        memoria.registrar_pregunta("órgano", "instrumentos")
+        time.sleep(0.2)
+        assert len(memoria.pendientes) == 2
+    assert memoria.pendientes == []
+
+
+def test_salta_las_lineas_danadas(tmp_path, capsys):
+    memoria = crear_diario(tmp_path)
+    memoria.registrar_pregunta("órgano", "instrumentos")
+    memoria.vaciar()
+    with open(memoria.ruta_diario, "a", encoding="utf-8") as diario:
+        diario.write('{"tipo": "pregunta", "preg\n[1, 2]\n')
+    memoria.registrar_pregunta("órgano", "instrumentos")
+    memoria.registrar_easter_egg("bach")
+    memoria.vaciar()
+
+    recuperada = crear_diario(tmp_path)
+    assert recuperada.memoria["preguntas_frecuentes"]["órgano"]["frecuencia"] == 2
+    assert recuperada.huevos_encontrados() == ["bach"]
+    assert capsys.readouterr().out.count("línea dañada") == 2
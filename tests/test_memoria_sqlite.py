@@ -0,0 +1,57 @@
+import json
+
+from OrgueBot import OrgueBotMemoriaSQLite, migrar_json_a_sqlite
+
+
+MEMORIA = {
+    "conversaciones": [
+        {"fecha": "2024-01-01 10:00:00", "intercambios": [
+            {"rol": "usuario", "mensaje": "hola"}, {"rol": "bot", "mensaje": "¡Hola!"}]},
+        {"fecha": "2024-01-01 10:00:00", "intercambios": [
+            {"rol": "usuario", "mensaje": "adiós"}]},
+    ],
+    "preguntas_frecuentes": {
+        "¿quién fue bach?": {"categoria": "compositores", "frecuencia": 215},
+        "órgano": {"categoria": "instrumentos", "frecuencia": 3},
+    },
+    "huevos_pascua_encontrados": ["bach"],
+    "feedback": {},
+}
+
+
+def migrar(tmp_path):
+    ruta_json = tmp_path / "memoria.json"
+    ruta_json.write_text(json.dumps(MEMORIA, ensure_ascii=False), encoding="utf-8")
+    ruta_sqlite = str(tmp_path / "memoria.db")
+    migrar_json_a_sqlite(str(ruta_json), ruta_sqlite)
+    return ruta_sqlite
+
+
+def test_migra_la_memoria_json(tmp_path):
+    memoria = OrgueBotMemoriaSQLite(migrar(tmp_path))
+    assert memoria.obtener_sugerencias(2) == ["¿quién fue bach?", "órgano"]
+    assert memoria.obtener_sugerencias(3, "instrumentos") == ["órgano"]
+    assert memoria.huevos_encontrados() == ["bach"]
+    intercambios = memoria.conexion.execute(
+        "SELECT rol, mensaje FROM intercambios WHERE conversacion_id = 1 ORDER BY orden").fetchall()
+    assert intercambios == [("usuario", "hola"), ("bot", "¡Hola!")]
+    memoria.cerrar()
+
+
+def test_migrar_dos_veces_no_duplica(tmp_path):
+    migrar(tmp_path)
+    memoria = OrgueBotMemoriaSQLite(migrar(tmp_path))
+    frecuencias = dict(memoria.conexion.execute("SELECT pregunta, frecuencia FROM preguntas_frecuentes"))
+    assert frecuencias == {"¿quién fue bach?": 215, "órgano": 3}
+    assert memoria.conexion.execute("SELECT COUNT(*) FROM conversaciones").fetchone()[0] == 2
+    assert memoria.conexion.execute("SELECT COUNT(*) FROM intercambios").fetchone()[0] == 3
+    assert memoria.huevos_encontrados() == ["bach"]
+    memoria.cerrar()
+
+
+def test_registrar_pregunta_suma_frecuencias(tmp_path):
+    memoria = OrgueBotMemoriaSQLite(migrar(tmp_path))
+    memoria.registrar_pregunta("Órgano", "instrumentos")
+    assert memoria.conexion.execute(
+        "SELECT frecuencia FROM preguntas_frecuentes WHERE pregunta = 'órgano'").fetchone()[0] == 4
+    memoria.cerrar()
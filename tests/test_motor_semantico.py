@@ -0,0 +1,68 @@
+import os
+import shutil
+
+import pytest
+
+import OrgueBot
+
+np = pytest.importorskip("numpy")
+
+CONOCIMIENTOS = {
+    "compositores": [
+        "Bach compuso la Tocata y fuga en re menor",
+        "Messiaen escribió La Nativité du Seigneur para órgano",
+        "Franck fue organista en París",
+    ],
+    "mantenimiento": [
+        "Los tubos se limpian con aire a baja presión",
+        "La afinación se revisa cada año",
+    ],
+}
+
+
+def test_ordena_por_similitud():
+    motor = OrgueBot.MotorSemantico(CONOCIMIENTOS, {}, [])
+    assert motor.buscar("¿qué compuso Bach?", "compositores")[0] == CONOCIMIENTOS["compositores"][0]
+    assert motor.buscar("¿quién era organista en París?", "compositores")[0] == CONOCIMIENTOS["compositores"][2]
+    assert motor.buscar("¿cómo se limpian los tubos?", "mantenimiento")[0] == CONOCIMIENTOS["mantenimiento"][0]
+    # La respuesta de su categoría puntúa mucho más que la mejor de otra categoría
+    _, propia = motor.buscar("¿cómo se limpian los tubos?", "mantenimiento")
+    _, ajena = motor.buscar("¿cómo se limpian los tubos?", "compositores")
+    assert propia > motor.umbral and ajena < propia / 2
+    # Buscar de una en una y por lotes da lo mismo
+    preguntas = ["¿qué compuso Bach?", "¿cómo se limpian los tubos?", "¿qué escribió Messiaen?"]
+    categorias = ["compositores", "mantenimiento", "compositores"]
+    assert motor.buscar_lote(preguntas, categorias) == [motor.buscar(p, c) for p, c in zip(preguntas, categorias)]
+
+
+@pytest.fixture
+def ruta_conocimientos(tmp_path):
+    # Copia de la base real: el índice de vectores se guarda junto a ella
+    ruta = str(tmp_path / "conocimientos.json")
+    shutil.copy(OrgueBot.RUTA_CONOCIMIENTOS, ruta)
+    return ruta
+
+
+def crear_bot(ruta_conocimientos):
+    return OrgueBot.OrgueBot(motor_respuestas="semantico", memoria=OrgueBot.OrgueBotMemoriaSQLite(":memory:"),
+                             ruta_conocimientos=ruta_conocimientos)
+
+
+def test_responde_con_la_base_real(ruta_conocimientos):
+    bot = crear_bot(ruta_conocimientos)
+    for pregunta, esperado in [("¿Quién fue Messiaen?", "Messiaen"), ("¿qué obras compuso Messiaen?", "Messiaen"),
+                               ("¿quién era Buxtehude?", "Buxtehude"),
+                               ("¿Cuál es el órgano más grande del mundo?", "más grande")]:
+        assert esperado in bot.responder_pregunta(pregunta, OrgueBot.SesionOrgueBot()), pregunta
+
+
+def test_carga_el_indice_guardado_con_mmap(ruta_conocimientos):
+    primero = crear_bot(ruta_conocimientos).motor
+    indices = [nombre for nombre in os.listdir(os.path.dirname(ruta_conocimientos)) if nombre.endswith(".npy")]
+    assert len(indices) == 1
+
+    segundo = crear_bot(ruta_conocimientos).motor
+    assert isinstance(segundo.vectores, np.memmap)
+    assert os.path.basename(segundo.vectores.filename) == indices[0]
+    assert np.array_equal(primero.vectores, segundo.vectores)
+    assert segundo.umbral == primero.umbral
@@ -0,0 +1,45 @@
+import pytest
+
+import OrgueBot
+
+pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+
+CONOCIMIENTOS = {
+    "compositores": [
+        "El órgano de la catedral tiene miles de tubos de metal",
+        "Bach compuso para órgano la Tocata y fuga en re menor",
+    ],
+}
+PREGUNTA = "¿Qué órgano con tubos tiene una fuga?"
+
+
+def test_sin_refuerzos_gana_la_similitud_tfidf():
+    motor = OrgueBot.MotorTFIDF(CONOCIMIENTOS, {}, [])
+    respuesta, _ = motor.buscar(PREGUNTA, "compositores")
+    assert respuesta == CONOCIMIENTOS["compositores"][0]
+
+
+def test_los_refuerzos_cambian_el_orden():
+    base = OrgueBot.MotorTFIDF(CONOCIMIENTOS, {}, [])
+    _, puntuacion_base = base.buscar("¿quién compuso la fuga?", "compositores")
+
+    # Palabra clave presente en la pregunta y en una sola respuesta: suma 0.15 solo a esa respuesta
+    con_clave = OrgueBot.MotorTFIDF(CONOCIMIENTOS, {"compositores": ["fuga", "bach"]}, [])
+    _, puntuacion = con_clave.buscar("¿quién compuso la fuga?", "compositores")
+    assert puntuacion == pytest.approx(puntuacion_base + 0.15)
+
+    # Con la regla de refuerzo la respuesta sobre Bach pasa delante
+    con_regla = OrgueBot.MotorTFIDF(
+        CONOCIMIENTOS, {"compositores": ["fuga"]}, [("compositores", ["fuga"], ["bach"])]
+    )
+    respuesta, _ = con_regla.buscar(PREGUNTA, "compositores")
+    assert respuesta == CONOCIMIENTOS["compositores"][1]
+
+
+def test_igual_que_el_motor_de_secuencia_en_los_refuerzos():
+    # Ambos motores aplican los mismos refuerzos sobre la misma respuesta
+    reglas = [("compositores", ["fuga"], ["bach"])]
+    tfidf = OrgueBot.MotorTFIDF(CONOCIMIENTOS, {"compositores": ["fuga"]}, reglas)
+    secuencia = OrgueBot.MotorSecuencia(CONOCIMIENTOS, {"compositores": ["fuga"]}, reglas)
+    assert tfidf.buscar(PREGUNTA, "compositores")[0] == secuencia.buscar(PREGUNTA, "compositores")[0]
@@ -0,0 +1,73 @@
+import gzip
+import json
+import os
+
+from OrgueBot import ArchivoConversaciones, OrgueBotMemoria, OrgueBotMemoriaSQLite, PoliticaRetencion
+
+
+def conversacion(fecha, mensaje):
+    return {"fecha": fecha, "intercambios": [{"rol": "usuario", "mensaje": mensaje}]}
+
+
+CONVERSACIONES = [
+    conversacion("2024-01-01 09:00:00", "uno"),
+    conversacion("2024-01-01 18:00:00", "dos"),
+    conversacion("2024-01-02 10:00:00", "tres"),
+    conversacion("2024-01-03 10:00:00", "cuatro"),
+    conversacion("2024-01-03 11:00:00", "cinco"),
+]
+
+
+def mensajes(conversaciones):
+    return [c["intercambios"][0]["mensaje"] for c in conversaciones]
+
+
+def test_rota_a_segmentos_gzip_por_dia(tmp_path):
+    ruta = tmp_path / "memoria.json"
+    ruta.write_text(json.dumps({"conversaciones": CONVERSACIONES, "preguntas_frecuentes": {}, "feedback": {},
+                                "huevos_pascua_encontrados": []}), encoding="utf-8")
+    memoria = OrgueBotMemoria(str(ruta), PoliticaRetencion(max_conversaciones=2))
+    memoria.guardar_memoria()
+
+    assert mensajes(json.loads(ruta.read_text(encoding="utf-8"))["conversaciones"]) == ["cuatro", "cinco"]
+    archivo = ArchivoConversaciones(str(ruta) + ".archivo")
+    assert [os.path.basename(segmento) for segmento in archivo.segmentos()] == [
+        "conversaciones-2024-01-01.jsonl.gz", "conversaciones-2024-01-02.jsonl.gz"]
+    # Cada segmento es un gzip corriente
+    with gzip.open(archivo.segmentos()[0], "rt", encoding="utf-8") as segmento:
+        assert [json.loads(linea) for linea in segmento] == CONVERSACIONES[:2]
+    assert list(archivo.leer()) == CONVERSACIONES[:3]
+
+
+def test_lee_segmentos_con_varios_miembros_y_filtra_fechas(tmp_path):
+    archivo = ArchivoConversaciones(str(tmp_path / "archivo"))
+    archivo.archivar(CONVERSACIONES[:1])
+    archivo.archivar(CONVERSACIONES[1:])
+    assert len(archivo.segmentos()) == 3
+    assert list(archivo.leer()) == CONVERSACIONES
+    assert mensajes(archivo.leer(desde="2024-01-01 12:00:00", hasta="2024-01-02")) == ["dos", "tres"]
+    assert archivo.segmentos(desde="2024-01-03") == archivo.segmentos()[2:]
+    assert list(ArchivoConversaciones(str(tmp_path / "no_existe")).leer()) == []
+
+
+def test_sqlite_archiva_las_mas_antiguas(tmp_path):
+    memoria = OrgueBotMemoriaSQLite(str(tmp_path / "memoria.db"), PoliticaRetencion(max_conversaciones=2))
+    memoria.importar({"conversaciones": CONVERSACIONES, "preguntas_frecuentes": {}, "feedback": {},
+                      "huevos_pascua_encontrados": []})
+    memoria.aplicar_retencion()
+    restantes = memoria.conexion.execute(
+        "SELECT mensaje FROM intercambios JOIN conversaciones ON conversaciones.id = conversacion_id ORDER BY fecha").fetchall()
+    assert restantes == [("cuatro",), ("cinco",)]
+    assert list(memoria.archivo.leer()) == CONVERSACIONES[:3]
+    memoria.cerrar()
+
+
+def test_compactar_une_variantes_y_recorta():
+    politica = PoliticaRetencion(min_frecuencia=2, max_preguntas=1)
+    compactadas = politica.compactar_preguntas({
+        "¿quién fue bach?": {"categoria": "compositores", "frecuencia": 3},
+        "Quién fue Bach": {"categoria": "compositores", "frecuencia": 1},
+        "órgano": {"categoria": "instrumentos", "frecuencia": 2},
+        "rara": {"categoria": "historia", "frecuencia": 1},
+    })
+    assert compactadas == {"¿quién fue bach?": {"categoria": "compositores", "frecuencia": 4}}
@@ -0,0 +1,43 @@
+import pytest
+
+import OrgueBot
+
+
+@pytest.fixture
+def bot():
+    return OrgueBot.OrgueBot(memoria=OrgueBot.OrgueBotMemoriaSQLite(":memory:"))
+
+
+def conversar(bot, mensajes):
+    sesion = OrgueBot.SesionOrgueBot()
+    return [bot.responder_pregunta(mensaje, sesion) for mensaje in mensajes], sesion
+
+
+def sin_informacion(bot, respuesta):
+    return respuesta in bot.mensajes["no_info"]
+
+
+def test_sigue_el_tema_anterior(bot):
+    respuestas, sesion = conversar(bot, ["¿Quién fue Buxtehude?", "¿y quién más?", "¿y Widor?", "¿quién era él?"])
+    assert "Buxtehude" in respuestas[0]
+    # Otro compositor, no la misma respuesta
+    assert "Buxtehude" not in respuestas[1] and not sin_informacion(bot, respuestas[1])
+    assert "Widor" in respuestas[2]
+    assert "Widor" in respuestas[3]
+    assert sesion.ultima_categoria == "compositores"
+
+
+@pytest.mark.parametrize("pregunta", [
+    "¿y el clima de hoy?", "¿esta noche llueve?", "¿me recomiendas otro restaurante?", "¿y tú cómo te llamas?",
+])
+def test_preguntas_ajenas_no_son_seguimientos(bot, pregunta):
+    respuestas, _ = conversar(bot, ["¿Quién fue Buxtehude?", pregunta])
+    assert sin_informacion(bot, respuestas[1])
+    assert pregunta.lower() not in bot.memoria.obtener_sugerencias(10, "compositores")
+
+
+def test_los_seguimientos_no_se_sugieren(bot):
+    conversar(bot, ["¿Quién fue Buxtehude?", "¿y quién más?", "¿y otro?", "¿y Widor?"])
+    sugerencias = bot.memoria.obtener_sugerencias(10)
+    assert "¿quién fue buxtehude?" in sugerencias
+    assert not {"¿y quién más?", "¿y otro?", "¿y widor?"} & set(sugerencias)
@@ -0,0 +1,133 @@
+import asyncio
+import functools
+import multiprocessing
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import OrgueBot
+import orguebot_servidor
+from orguebot_servidor import MemoriaCompartida, MemoriaEnCola, ServidorOrgueBot
+
+
+async def conversar(bot, mensajes):
+    """Abre un servidor en un puerto libre de 127.0.0.1 y mantiene una sesión por TCP"""
+    servidor_bot = ServidorOrgueBot(bot)
+    servidor = await asyncio.start_server(servidor_bot.atender, "127.0.0.1", 0)
+    puerto = servidor.sockets[0].getsockname()[1]
+    async with servidor:
+        lector, escritor = await asyncio.open_connection("127.0.0.1", puerto)
+        saludo = [(await lector.readline()).decode("utf-8") for _ in range(2)]
+        respuestas = []
+        for mensaje in mensajes:
+            escritor.write((mensaje + "\n").encode("utf-8"))
+            await escritor.drain()
+            respuestas.append((await lector.readline()).decode("utf-8").rstrip("\n"))
+        # Tras la despedida el servidor cierra la conexión
+        assert await lector.read() == b""
+        escritor.close()
+        await escritor.wait_closed()
+    return saludo, respuestas, servidor_bot
+
+
+def test_ida_y_vuelta_por_tcp(tmp_path):
+    memoria = OrgueBot.OrgueBotMemoria(str(tmp_path / "memoria.json"))
+    bot = OrgueBot.OrgueBot(memoria=memoria)
+    saludo, respuestas, servidor_bot = asyncio.run(conversar(bot, ["¿Quién fue Bach?", "adiós"]))
+
+    assert all(linea.startswith("Bot: ") for linea in saludo + respuestas)
+    # La misma respuesta que da el bot sin pasar por la red
+    assert respuestas[0] == "Bot: " + bot.responder_pregunta("¿Quién fue Bach?", OrgueBot.SesionOrgueBot())
+    assert respuestas[1][len("Bot: "):] in bot.mensajes["despedidas"]
+    assert servidor_bot.sesiones_activas == 0
+    assert memoria.obtener_sugerencias() == ["¿quién fue bach?"]
+
+
+def test_memoria_en_cola_escribe_todo_al_cerrar(tmp_path):
+    ruta = str(tmp_path / "memoria.json")
+
+    async def escribir():
+        memoria = MemoriaEnCola(OrgueBot.OrgueBotMemoria(ruta))
+        escritor = asyncio.create_task(memoria.escritor())
+        for _ in range(3):
+            memoria.registrar_pregunta("¿Quién fue Bach?", "compositores")
+        memoria.registrar_conversacion([{"rol": "usuario", "mensaje": "hola"}])
+        assert memoria.registrar_easter_egg("bach")
+        assert not memoria.registrar_easter_egg("bach")
+        await memoria.cerrar()
+        escritor.cancel()
+
+    asyncio.run(escribir())
+    guardada = OrgueBot.OrgueBotMemoria(ruta).memoria
+    assert guardada["preguntas_frecuentes"]["¿quién fue bach?"]["frecuencia"] == 3
+    assert guardada["huevos_pascua_encontrados"] == ["bach"]
+    assert [c["intercambios"] for c in guardada["conversaciones"]] == [[{"rol": "usuario", "mensaje": "hola"}]]
+
+
+def test_escritor_unico_aplica_todo_antes_de_terminar(tmp_path):
+    ruta = str(tmp_path / "memoria.json")
+    contexto = multiprocessing.get_context("fork")
+    cola = contexto.Queue()
+    estado = contexto.Array("c", orguebot_servidor.TAM_ESTADO_COMPARTIDO)
+    version = contexto.Value("Q", 0, lock=False)
+    # El diario solo se vacía por tiempo dentro de una hora: lo escrito llega al disco al cerrar
+    crear_memoria = functools.partial(OrgueBot.OrgueBotMemoriaDiario, ruta, intervalo_vaciado=3600)
+    escritor = contexto.Process(target=orguebot_servidor._proceso_escritor, args=(crear_memoria, cola, estado, version))
+    escritor.start()
+
+    memoria = MemoriaCompartida(cola, estado, version)
+    for _ in range(5):
+        memoria.registrar_pregunta("¿Quién fue Bach?", "compositores")
+    assert memoria.registrar_easter_egg("bach")
+    cola.put(None)
+    escritor.join(10)
+    assert escritor.exitcode == 0
+
+    guardada = OrgueBot.OrgueBotMemoriaDiario(ruta)
+    assert guardada.memoria["preguntas_frecuentes"]["¿quién fue bach?"]["frecuencia"] == 5
+    assert guardada.huevos_encontrados() == ["bach"]
+    assert memoria.obtener_sugerencias() == ["¿quién fue bach?"]
+
+
+PROGRAMA_MULTIPROCESO = """
+import functools, sys
+import OrgueBot, orguebot_servidor
+crear_memoria = functools.partial(OrgueBot.OrgueBotMemoriaDiario, sys.argv[1], intervalo_vaciado=3600)
+orguebot_servidor.ejecutar_servidor_multiproceso(puerto=int(sys.argv[2]), trabajadores=2, crear_memoria=crear_memoria)
+"""
+
+
+def test_multiproceso_guarda_la_memoria_al_detenerse(tmp_path):
+    with socket.socket() as libre:
+        libre.bind(("127.0.0.1", 0))
+        puerto = libre.getsockname()[1]
+    ruta = str(tmp_path / "memoria.json")
+    servidor = subprocess.Popen([sys.executable, "-c", PROGRAMA_MULTIPROCESO, ruta, str(puerto)],
+                                cwd=os.path.dirname(os.path.abspath(OrgueBot.__file__)), stdout=subprocess.DEVNULL)
+    try:
+        limite = time.monotonic() + 30
+        while True:
+            try:
+                conexion = socket.create_connection(("127.0.0.1", puerto), timeout=10)
+                break
+            except ConnectionRefusedError:
+                assert time.monotonic() < limite and servidor.poll() is None
+                time.sleep(0.1)
+        with conexion, conexion.makefile("rwb") as canal:
+            for _ in range(2):
+                canal.readline()
+            for _ in range(3):
+                canal.write("¿Quién fue Bach?\n".encode("utf-8"))
+                canal.flush()
+                assert canal.readline().startswith(b"Bot: ")
+        servidor.send_signal(signal.SIGTERM)
+        assert servidor.wait(30) == 0
+    finally:
+        if servidor.poll() is None:
+            servidor.kill()
+
+    guardada = OrgueBot.OrgueBotMemoriaDiario(ruta)
+    assert guardada.memoria["preguntas_frecuentes"]["¿quién fue bach?"]["frecuencia"] == 3